@@ -0,0 +1,95 @@
+"""
+Run Marvin's benchmarks. From the repository root:
+
+    python -m benchmarks --output baseline.json
+    python -m benchmarks --baseline baseline.json
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+
+BENCHMARK_MODULES = [
+    "benchmarks.bench_bots",
+    "benchmarks.bench_ai_functions",
+    "benchmarks.bench_history",
+    "benchmarks.bench_documents",
+    "benchmarks.bench_strings",
+    "benchmarks.bench_types",
+    "benchmarks.bench_chunkers",
+]
+
+
+def configure_environment(home: str):
+    """
+    Isolate the benchmarks from the user's Marvin installation. This must run
+    before Marvin is imported.
+    """
+    os.environ["MARVIN_HOME"] = home
+    os.environ[
+        "MARVIN_DATABASE_CONNECTION_URL"
+    ] = f"sqlite+aiosqlite:///{home}/marvin.sqlite"
+    os.environ["MARVIN_LOG_LEVEL"] = "WARNING"
+    os.environ["MARVIN_BOT_LOAD_DEFAULT_PLUGINS"] = "false"
+    os.environ["MARVIN_BOT_CREATE_PROFILE_PICTURE"] = "false"
+    os.environ["MARVIN_TRACING_ENABLED"] = "false"
+    os.environ.setdefault("MARVIN_OPENAI_API_KEY", "sk-benchmarks")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure Marvin's overhead with a zero-latency fake LLM.",
+    )
+    parser.add_argument("-o", "--output", help="Save the results to this JSON file")
+    parser.add_argument(
+        "-b", "--baseline", help="Compare the results to this JSON file"
+    )
+    parser.add_argument(
+        "-k", "--filter", help="Only run benchmarks whose names contain this"
+    )
+    parser.add_argument("-r", "--rounds", type=int, default=5)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Report benchmarks that are this much slower than the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="marvin-benchmarks-") as home:
+        configure_environment(home)
+
+        from benchmarks.core import compare, load_results, run_benchmarks, save_results
+
+        for module in BENCHMARK_MODULES:
+            importlib.import_module(module)
+
+        results = run_benchmarks(rounds=args.rounds, pattern=args.filter)
+
+        # write any buffered history before the database is deleted
+        from marvin.bots.history import message_buffer
+        from marvin.utilities.async_utils import run_sync
+
+        run_sync(message_buffer.flush())
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        comparisons = compare(
+            results, load_results(args.baseline), threshold=args.threshold
+        )
+        print(f"\nCompared to {args.baseline} (median time per call):")
+        for c in comparisons:
+            flag = "  REGRESSION" if c["regression"] else ""
+            print(f"{c['name']:<40} {c['ratio']:>8.2f}x{flag}")
+        if any(c["regression"] for c in comparisons):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
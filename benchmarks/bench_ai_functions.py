@@ -0,0 +1,75 @@
+import json
+
+from marvin import ai_fn
+from marvin.utilities.tests import FakeLLM
+from pydantic import BaseModel
+
+from benchmarks.core import benchmark
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+
+
+@benchmark("ai_fn.scalar", number=100)
+def ai_fn_scalar():
+    @ai_fn(llm=FakeLLM(["4"]))
+    def double(x: int) -> int:
+        """Doubles x"""
+
+    def run():
+        double(2)
+
+    return run
+
+
+@benchmark("ai_fn.generic", number=100)
+def ai_fn_generic():
+    @ai_fn(llm=FakeLLM(['{"a": [1, 2], "b": [3]}']))
+    def group(numbers: list[int]) -> dict[str, list[int]]:
+        """Groups the numbers"""
+
+    def run():
+        group([1, 2, 3])
+
+    return run
+
+
+@benchmark("ai_fn.pydantic", number=100)
+def ai_fn_pydantic():
+    @ai_fn(llm=FakeLLM(['{"name": "Ford", "age": 42}']))
+    def make_person(description: str) -> Person:
+        """Creates a person from the description"""
+
+    def run():
+        make_person("A hoopy frood")
+
+    return run
+
+
+@benchmark("ai_fn.async", number=100)
+def ai_fn_async():
+    @ai_fn(llm=FakeLLM(["4"]))
+    async def double(x: int) -> int:
+        """Doubles x"""
+
+    async def run():
+        await double(2)
+
+    return run
+
+
+@benchmark("ai_fn.map", number=10)
+def ai_fn_map():
+    def respond(messages):
+        return json.dumps([2] * messages[-1].content.count("# Input"))
+
+    @ai_fn(llm=FakeLLM(respond))
+    def double(x: int) -> int:
+        """Doubles x"""
+
+    def run():
+        double.map(range(100))
+
+    return run
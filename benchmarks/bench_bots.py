@@ -0,0 +1,56 @@
+from marvin import Bot
+from marvin.bots.history import InMemoryHistory
+from marvin.utilities.tests import FakeLLM
+
+from benchmarks.core import benchmark
+
+
+@benchmark("bot.say", number=100)
+def bot_say():
+    bot = Bot(llm=FakeLLM(["Hello!"]), plugins=[], history=InMemoryHistory())
+
+    async def run():
+        await bot.say("Hi")
+
+    return run
+
+
+@benchmark("bot.say.response_format", number=100)
+def bot_say_response_format():
+    bot = Bot(
+        llm=FakeLLM(['[{"x": 1, "y": 2}]']),
+        plugins=[],
+        history=InMemoryHistory(),
+        response_format=list[dict[str, int]],
+    )
+
+    async def run():
+        await bot.say("Format this: x is 1, y is 2")
+
+    return run
+
+
+@benchmark("bot.say.repair", number=100)
+def bot_say_repair():
+    # the response is fenced and uses Python literals, so it must be repaired
+    bot = Bot(
+        llm=FakeLLM(["```json\n{'ok': True}\n```"]),
+        plugins=[],
+        history=InMemoryHistory(),
+        response_format=dict[str, bool],
+    )
+
+    async def run():
+        await bot.say("Is it ok?")
+
+    return run
+
+
+@benchmark("bot.create", number=200)
+def bot_create():
+    llm = FakeLLM(["Hello!"])
+
+    def run():
+        Bot(llm=llm, plugins=[], response_format=list[dict[str, int]])
+
+    return run
@@ -0,0 +1,52 @@
+from marvin.models.chunkers import (
+    CodeChunker,
+    MarkdownChunker,
+    RecursiveChunker,
+    TokenChunker,
+)
+from marvin.utilities.tokenizer import count_tokens_many, token_counts
+
+from benchmarks.core import benchmark
+from benchmarks.corpus import markdown_document, repo_corpus
+
+CHUNKERS = dict(
+    token=TokenChunker,
+    recursive=RecursiveChunker,
+    code=CodeChunker,
+    markdown=MarkdownChunker,
+)
+CORPORA = dict(
+    docs=lambda: repo_corpus("docs/**/*.md"),
+    source=lambda: repo_corpus("src/**/*.py"),
+    generated=lambda: markdown_document(1_000_000),
+)
+
+
+def _chunker_benchmark(chunker_cls, get_corpus):
+    def setup():
+        text = get_corpus()
+        chunker = chunker_cls()
+
+        def run():
+            # token counts are cached, so start cold
+            token_counts.clear()
+            chunker.split(text)
+
+        # the size of the excerpts, and throughput in characters per call
+        tokens = count_tokens_many([chunk for chunk, _ in chunker.split(text)])
+        run.metrics = dict(
+            chunks=len(tokens),
+            mean_tokens=round(sum(tokens) / max(len(tokens), 1)),
+            max_tokens=max(tokens, default=0),
+            chars=len(text),
+        )
+        return run
+
+    return setup
+
+
+for _chunker_name, _chunker_cls in CHUNKERS.items():
+    for _corpus_name, _get_corpus in CORPORA.items():
+        benchmark(f"chunkers.{_chunker_name}.{_corpus_name}", number=1)(
+            _chunker_benchmark(_chunker_cls, _get_corpus)
+        )
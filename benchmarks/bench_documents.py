@@ -0,0 +1,30 @@
+from marvin.models.documents import Document
+
+from benchmarks.core import benchmark
+from benchmarks.corpus import markdown_document
+
+
+@benchmark("document.to_excerpts", number=1)
+def document_to_excerpts():
+    document = Document(
+        text=markdown_document(100_000),
+        metadata=dict(link="https://example.com/docs/page.md"),
+    )
+
+    async def run():
+        await document.to_excerpts()
+
+    return run
+
+
+@benchmark("document.copy_with_updates", number=1000)
+def document_copy_with_updates():
+    document = Document(
+        text=markdown_document(100_000),
+        metadata=dict(link="https://example.com/docs/page.md"),
+    )
+
+    def run():
+        document.copy_with_updates(type="excerpt")
+
+    return run
@@ -0,0 +1,27 @@
+from marvin.bots.history import ThreadHistory, message_buffer
+from marvin.models.threads import Message
+
+from benchmarks.core import benchmark
+
+
+@benchmark("history.sqlite.round_trip", number=50)
+def history_round_trip():
+    async def run():
+        history = ThreadHistory(write_behind=False)
+        for i in range(5):
+            await history.add_message(Message(role="user", content=f"message {i}"))
+        await history.get_messages()
+
+    return run
+
+
+@benchmark("history.sqlite.write_behind", number=50)
+def history_write_behind():
+    async def run():
+        history = ThreadHistory(write_behind=True)
+        for i in range(5):
+            await history.add_message(Message(role="user", content=f"message {i}"))
+        await history.get_messages()
+        await message_buffer.flush()
+
+    return run
@@ -0,0 +1,84 @@
+from marvin.utilities.strings import create_minimap_fn, split_text
+from marvin.utilities.tokenizer import (
+    count_tokens,
+    count_tokens_many,
+    slice_tokens,
+    token_counts,
+)
+
+from benchmarks.core import benchmark
+from benchmarks.corpus import markdown_document
+
+
+@benchmark("strings.count_tokens", number=100)
+def strings_count_tokens():
+    text = markdown_document(10_000)
+
+    def run():
+        token_counts.clear()
+        count_tokens(text)
+
+    return run
+
+
+@benchmark("strings.count_tokens.cached", number=1000)
+def strings_count_tokens_cached():
+    text = markdown_document(10_000)
+
+    def run():
+        count_tokens(text)
+
+    return run
+
+
+@benchmark("strings.count_tokens_many", number=10)
+def strings_count_tokens_many():
+    texts = [f"{i} {markdown_document(2_000)}" for i in range(100)]
+
+    def run():
+        token_counts.clear()
+        count_tokens_many(texts)
+
+    return run
+
+
+@benchmark("strings.slice_tokens", number=100)
+def strings_slice_tokens():
+    # a long page, cut to the size of a plugin result
+    text = markdown_document(1_000_000)
+
+    def run():
+        slice_tokens(text, 1000)
+
+    return run
+
+
+@benchmark("strings.minimap", number=10)
+def strings_minimap():
+    # index a long page and look up the location of every 200-token excerpt
+    text = markdown_document(1_000_000)
+    indices = [i for _, i in split_text(text, chunk_size=200, return_index=True)]
+
+    def run():
+        get_minimap = create_minimap_fn(text)
+        for i in indices:
+            get_minimap(i)
+
+    return run
+
+
+def _split_text_benchmark(n_chars: int):
+    def setup():
+        text = markdown_document(n_chars)
+
+        def run():
+            split_text(text, chunk_size=200, return_index=True)
+
+        return run
+
+    return setup
+
+
+# splitting should scale linearly with the length of the text
+for _n_chars, _name in [(100_000, "100k"), (1_000_000, "1m"), (5_000_000, "5m")]:
+    benchmark(f"strings.split_text.{_name}", number=1)(_split_text_benchmark(_n_chars))
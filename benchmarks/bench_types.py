@@ -0,0 +1,61 @@
+from marvin import Bot
+from marvin.bots.input_transformers import AppendText, PrependText
+from marvin.bots.response_formatters import PydanticFormatter
+from marvin.utilities import types
+from pydantic import BaseModel
+
+from benchmarks.core import benchmark
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+
+
+class Team(BaseModel):
+    name: str
+    members: list[Person]
+
+
+@benchmark("types.schema_to_type.cold", number=100)
+def schema_to_type_cold():
+    schema = types.type_to_schema(list[Team])
+
+    def run():
+        types._SCHEMA_MODELS.clear()
+        types.schema_to_type(schema)
+
+    return run
+
+
+@benchmark("formatter.load", number=1000)
+def formatter_load():
+    # loading a formatter from a bot config
+    data = PydanticFormatter(list[Team]).dict()
+
+    def run():
+        PydanticFormatter(**data).get_model()
+
+    return run
+
+
+@benchmark("formatter.create", number=1000)
+def formatter_create():
+    def run():
+        PydanticFormatter(list[Team])
+
+    return run
+
+
+@benchmark("types.discriminated_union.load", number=1000)
+def discriminated_union_load():
+    # loading a bot config with history, input transformers, and a formatter
+    data = Bot(
+        input_transformers=[PrependText(text="Hi"), AppendText(text="Bye")],
+        response_format=list[int],
+    ).dict()
+
+    def run():
+        Bot(**data)
+
+    return run
@@ -0,0 +1,173 @@
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# benchmarks, by name, in the order they were registered
+BENCHMARKS: dict[str, "Benchmark"] = {}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable
+    number: int
+
+
+def benchmark(name: str = None, number: int = 10):
+    """
+    Register a benchmark.
+
+    The decorated function does any (untimed) setup and returns the callable
+    to time, which may be sync or async. Each round calls it `number` times,
+    and results are reported in seconds per call. To report other numbers
+    with the results (like the size of the output), set them as a dict on the
+    callable's `metrics` attribute.
+
+    Example:
+        ```python
+        @benchmark("bot.say", number=100)
+        def bot_say():
+            bot = Bot(llm=FakeLLM(["Hello!"]))
+
+            async def run():
+                await bot.say("Hi")
+
+            return run
+        ```
+    """
+
+    def decorator(setup: Callable) -> Callable:
+        benchmark_name = name or setup.__name__
+        BENCHMARKS[benchmark_name] = Benchmark(
+            name=benchmark_name, setup=setup, number=number
+        )
+        return setup
+
+    return decorator
+
+
+async def _time_async(fn: Callable, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await fn()
+    return time.perf_counter() - start
+
+
+def _time_sync(fn: Callable, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+
+def run_benchmark(benchmark: Benchmark, rounds: int) -> dict:
+    """
+    Run a benchmark for `rounds` rounds (after one untimed warmup round) and
+    return summary statistics, in seconds per call.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        fn = benchmark.setup()
+        if inspect.iscoroutinefunction(fn):
+
+            def timed(number: int) -> float:
+                return loop.run_until_complete(_time_async(fn, number))
+
+        else:
+
+            def timed(number: int) -> float:
+                return _time_sync(fn, number)
+
+        timed(1)
+        times = [timed(benchmark.number) / benchmark.number for _ in range(rounds)]
+    finally:
+        loop.close()
+
+    result = dict(
+        min=min(times),
+        median=statistics.median(times),
+        mean=statistics.mean(times),
+        stdev=statistics.stdev(times) if len(times) > 1 else 0.0,
+        rounds=rounds,
+        number=benchmark.number,
+    )
+    if metrics := getattr(fn, "metrics", None):
+        result["metrics"] = metrics
+    return result
+
+
+def run_benchmarks(
+    rounds: int = 5, pattern: Optional[str] = None, echo: Callable = print
+) -> dict:
+    """
+    Run all registered benchmarks whose names contain `pattern` and return
+    the results, with metadata about the environment they ran in.
+    """
+    import marvin
+
+    results = {}
+    for name, bm in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = run_benchmark(bm, rounds=rounds)
+        metrics = " ".join(
+            f"{k}={v}" for k, v in results[name].get("metrics", {}).items()
+        )
+        line = f"{name:<40} {_format_time(results[name]['median']):>12}  {metrics}"
+        echo(line.rstrip())
+
+    return dict(
+        metadata=dict(
+            marvin_version=marvin.__version__,
+            python_version=platform.python_version(),
+            platform=platform.platform(),
+            timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        ),
+        benchmarks=results,
+    )
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> list[dict]:
+    """
+    Compare the median time of each benchmark to a baseline. A benchmark is a
+    regression if it is more than `threshold` (as a fraction) slower.
+    """
+    comparisons = []
+    for name, result in results["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name)
+        if baseline_result is None:
+            continue
+        ratio = result["median"] / baseline_result["median"]
+        comparisons.append(
+            dict(
+                name=name,
+                baseline=baseline_result["median"],
+                current=result["median"],
+                ratio=ratio,
+                regression=ratio > 1 + threshold,
+            )
+        )
+    return comparisons
+
+
+def load_results(path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results: dict, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.2f} ns"
@@ -0,0 +1,42 @@
+import random
+from pathlib import Path
+
+# the root of the repository
+ROOT = Path(__file__).parent.parent
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog marvin bot plugin history thread"
+    " message document excerpt token model prompt response format function"
+).split()
+
+
+def markdown_document(n_chars: int, seed: int = 0) -> str:
+    """
+    Returns a deterministic markdown document of about `n_chars` characters,
+    with headers, paragraphs, and fenced code blocks.
+    """
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    section = 0
+    while size < n_chars:
+        section += 1
+        block = [f"{'#' * rng.randint(1, 3)} Section {section}", ""]
+        for _ in range(rng.randint(1, 4)):
+            block.append(" ".join(rng.choices(WORDS, k=rng.randint(20, 80))) + ".")
+            block.append("")
+        if rng.random() < 0.3:
+            block += ["```python", "def f(x):", "    return x * 2", "```", ""]
+        text = "\n".join(block)
+        parts.append(text)
+        size += len(text) + 1
+    return "\n".join(parts)
+
+
+def repo_corpus(pattern: str) -> str:
+    """
+    Returns the repository's files that match a glob pattern (relative to the
+    repository root), joined into one text. For example, `docs/**/*.md` is a
+    corpus of markdown and `src/**/*.py` is a corpus of Python code.
+    """
+    return "\n\n".join(path.read_text() for path in sorted(ROOT.glob(pattern)))
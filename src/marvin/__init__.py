@@ -1,11 +1,5 @@
 from importlib.metadata import version as _get_version
 
-# load nest_asyncio
-import nest_asyncio as _nest_asyncio
-import asyncio as _asyncio
-
-_nest_asyncio.apply()
-
 # load env vars
 from dotenv import load_dotenv as _load_dotenv
 
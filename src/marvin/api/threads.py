@@ -12,10 +12,14 @@ from marvin.models.threads import (
     ThreadRead,
     ThreadUpdate,
 )
+from marvin.utilities.tokenizer import count_tokens
 from marvin.utilities.types import MarvinRouter
 
 router = MarvinRouter(prefix="/threads", tags=["Threads"])
 
+# keeps multi-row inserts below SQLite's limit on bound parameters
+MESSAGE_INSERT_BATCH_SIZE = 100
+
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 @provide_session()
@@ -81,7 +85,27 @@ async def create_message(
     message: MessageCreate = Body(...),
     session: AsyncSession = Depends(fastapi_session),
 ) -> None:
-    session.add(Message(**message.dict(), thread_id=thread_id))
+    message = Message(**message.dict(), thread_id=thread_id)
+    if message.tokens is None:
+        message.tokens = count_tokens(message.content)
+    session.add(message)
+    await session.commit()
+
+
+@provide_session()
+async def create_messages(messages: list[Message], session: AsyncSession) -> None:
+    """
+    Insert messages (which may belong to different threads) with multi-row
+    INSERTs in a single transaction.
+    """
+    for message in messages:
+        if message.tokens is None:
+            message.tokens = count_tokens(message.content)
+    rows = [message.dict() for message in messages]
+    for i in range(0, len(rows), MESSAGE_INSERT_BATCH_SIZE):
+        await session.execute(
+            sa.insert(Message).values(rows[i : i + MESSAGE_INSERT_BATCH_SIZE])
+        )
     await session.commit()
 
 
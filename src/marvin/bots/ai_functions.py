@@ -1,13 +1,22 @@
 import asyncio
 import inspect
+import itertools
+import json
 import re
-from functools import partial, wraps
-from typing import Any, Callable
+from functools import partial, update_wrapper
+from types import MethodType
+from typing import Any, Callable, Iterable, Optional, Union
 
+import marvin
 from marvin.bots import Bot
-from marvin.utilities.strings import jinja_env
+from marvin.bots.history import InMemoryHistory
+from marvin.bots.response_formatters import TypeFormatter
+from marvin.infra.cache import Cache
+from marvin.utilities.async_utils import run_sync
+from marvin.utilities.strings import hash_text, jinja_env, sync_jinja_env
+from marvin.utilities.tokenizer import count_tokens_many
 
-AI_FN_INSTRUCTIONS = jinja_env.from_string(
+AI_FN_INSTRUCTIONS = sync_jinja_env.from_string(
     inspect.cleandoc(
         """
         Your job is to generate outputs for a Python function with the following
@@ -68,85 +77,128 @@ AI_FN_MESSAGE = jinja_env.from_string(
     )
 )
 
+AI_FN_MAP_INPUT = jinja_env.from_string(
+    inspect.cleandoc(
+        """
+        {%for desc in input_binds%}
+        {{ desc }}
+        {% endfor %}
+        {% if return_value %} 
+        Calling the function as-is returned: {{ return_value }} 
+        {% endif %}
+        """
+    )
+)
 
-def ai_fn(
-    fn: Callable = None,
-    *,
-    bot_modifier: Callable = None,
-    call_function: bool = True,
-    **bot_kwargs,
-) -> Callable:
-    """
-    @ai_fn
-    def rhyme(word: str) -> str:
-        "Returns a word that rhymes with the input word."
+AI_FN_MAP_MESSAGE = jinja_env.from_string(
+    inspect.cleandoc(
+        """
+        The user supplied {{ inputs | length }} sets of inputs to the function.
+        
+        {% for input in inputs %}
+        # Input {{ loop.index }}
+        {{ input }}
+        
+        {% endfor %}
+        
+        Respond with a JSON array that contains the result of calling the
+        function on each set of inputs, in the same order. Do not give any
+        additional detail or explanation; respond ONLY with the array.
+        """
+    )
+)
 
-    rhyme("blue") # "glue"
+MISSING = object()
+MAP_FORMAT = (
+    "A JSON array with exactly one result for each set of inputs, in the same"
+    " order as the inputs. Each result must be formatted as follows: {format}"
+)
 
 
-    Args
-        - bot_modifier (Callable):  the `Bot` is passed to this function before
-          the function is processed. The function can either modify the bot
-          inplace or return a modified bot. Useful for customizing behavior in
-          ways that can't easily be passed directly to the bot via kwargs
-        - call_function (bool):  if True, the function will be called and the
-          return value will be included in the message
-        - bot_kwargs (dict):  kwargs to pass to the `Bot` constructor
+class AIFunction:
+    """
+    A function whose outputs are generated by an AI. Create AI functions with
+    the `@ai_fn` decorator.
+
+    Everything that doesn't depend on the function's inputs (its signature,
+    source, instructions, and the bot that runs it) is prepared once and
+    reused for every call. Each call runs on a copy of the bot with its own,
+    empty history, so calls never see each other.
 
+    If `cache` is True, results are stored in the AI function cache (see
+    `marvin.infra.cache.get_ai_fn_cache`), or `cache` can be any `Cache`.
+    Results are keyed on the function's source, the inputs shown to the LLM,
+    and the LLM's settings, so editing the function invalidates its results.
     """
-    # this allows the decorator to be used with or without calling it
-    if fn is None:
-        return partial(
-            ai_fn,
-            bot_modifier=bot_modifier,
-            call_function=call_function,
-            **bot_kwargs,
-        )
 
-    @wraps(fn)
-    def ai_fn_wrapper(*args, **kwargs) -> Any:
-        bot_kwargs = {}
+    def __init__(
+        self,
+        fn: Callable,
+        bot_modifier: Callable = None,
+        call_function: bool = True,
+        cache: Union[bool, Cache] = False,
+        **bot_kwargs,
+    ):
+        self.fn = fn
+        self.bot_modifier = bot_modifier
+        self.call_function = call_function
+        self.cache = cache
+        self.bot_kwargs = bot_kwargs
+        self.signature = inspect.signature(fn)
+        self.is_async = inspect.iscoroutinefunction(fn)
 
-        # Get function signature
-        sig = inspect.signature(fn)
+        # Get the return annotation
+        if self.signature.return_annotation is inspect._empty:
+            self.return_annotation = str
+        else:
+            self.return_annotation = self.signature.return_annotation
 
-        # Bind the provided arguments to the function signature
-        bound_args = sig.bind(*args, **kwargs)
-        bound_args.apply_defaults()
+        # Build the instructions
+        self.instructions = AI_FN_INSTRUCTIONS.render(
+            function_def=_get_function_def(fn), function_name=fn.__name__
+        )
 
-        # Build input binds
-        input_binds = []
-        for k, v in bound_args.arguments.items():
-            input_binds.append(f"{k} = {v}")
+        self._bot = None
+        self._map_bot = None
+        self._cache_prefix = None
+        update_wrapper(self, fn)
 
-        # see if the function preprocesses the inputs
-        if call_function:
-            if inspect.iscoroutinefunction(fn):
-                return_value = asyncio.run(fn(*args, **kwargs))
-            else:
-                return_value = fn(*args, **kwargs)
+    def __call__(self, *args, **kwargs) -> Any:
+        inputs = self._get_inputs(*args, **kwargs)
+        if self.is_async:
+            return self._call(inputs)
         else:
-            return_value = None
+            # the function itself already ran in the caller's thread, so it can
+            # call other AI functions; only the bot runs on the background loop
+            return run_sync(self._call(inputs))
 
-        # Get the return annotation
-        if sig.return_annotation is inspect._empty:
-            return_annotation = str
+    def __get__(self, instance, owner):
+        # support decorating methods
+        if instance is None:
+            return self
+        return MethodType(self, instance)
+
+    def get_bot(self) -> Bot:
+        """
+        Returns a bot for a single call to the function.
+        """
+        base_bot = self._get_base_bot()
+        if "history" in self.bot_kwargs:
+            bot = base_bot.copy()
         else:
-            return_annotation = sig.return_annotation
+            bot = base_bot.copy(update=dict(history=InMemoryHistory()))
+        # the copy only differs in its history, so it can share the compiled
+        # prompt
+        bot._compiled_prompt = base_bot._compiled_prompt
+        return bot
 
-        # get the function source code - it will include the @ai_fn decorator,
-        # which can confuse the AI, so we use regex to only get the function
-        # that is being decorated
-        function_def = inspect.cleandoc(inspect.getsource(fn))
-        function_def = re.search(
-            re.compile(r"(\bdef\b.*)", re.DOTALL), function_def
-        ).group(0)
+    def _get_base_bot(self) -> Bot:
+        if self._bot is None:
+            self._bot = self._create_bot()
+        return self._bot
 
-        # Build the instructions
-        instructions = AI_FN_INSTRUCTIONS.render(
-            function_def=function_def,
-            function_name=fn.__name__,
-        )
+    def _create_bot(self) -> Bot:
+        bot_kwargs = self.bot_kwargs.copy()
 
         # ai_fns have no plugins by default
         if "plugins" not in bot_kwargs:
@@ -154,32 +206,311 @@ def ai_fn(
 
         # create the bot
         bot = Bot(
-            instructions=instructions,
+            instructions=self.instructions,
             personality=AI_FN_PERSONALITY,
-            response_format=return_annotation,
+            response_format=self.return_annotation,
             **bot_kwargs,
         )
 
-        if bot_modifier is not None:
-            modified_bot = bot_modifier(bot)
+        if self.bot_modifier is not None:
+            modified_bot = self.bot_modifier(bot)
             # bot might not be modified inplace
             if modified_bot is not None:
                 bot = modified_bot
+        return bot
 
-        # build the message
-        message = AI_FN_MESSAGE.render(
-            input_binds=input_binds, return_value=return_value
+    def map(
+        self, inputs: Iterable, batch_tokens: int = 1000, concurrency: int = 10
+    ) -> list:
+        """
+        Call the function on each of the inputs and return the results, in
+        order. Each input can be a tuple of positional arguments, a dict of
+        keyword arguments, or a single positional argument.
+
+        Rather than calling the LLM once per input, inputs are packed into
+        prompts of up to about `batch_tokens` tokens that ask for a JSON array
+        of results. Each result is validated against the function's return
+        annotation, and only the inputs whose results fail are retried, one at
+        a time. Up to `concurrency` prompts are sent at once.
+
+        Like calling the function, `map` returns a coroutine if the function
+        is async.
+        """
+        calls = [
+            self._get_inputs(*args, **kwargs)
+            for args, kwargs in map(_get_call_args, inputs)
+        ]
+        coro = self._map(
+            calls=calls, batch_tokens=batch_tokens, concurrency=concurrency
+        )
+        if self.is_async:
+            return coro
+        else:
+            return run_sync(coro)
+
+    async def _map(self, calls: list, batch_tokens: int, concurrency: int):
+        calls = await asyncio.gather(*[_resolve_inputs(inputs) for inputs in calls])
+        rendered_inputs = await asyncio.gather(
+            *[
+                AI_FN_MAP_INPUT.render_async(
+                    input_binds=input_binds, return_value=return_value
+                )
+                for input_binds, return_value in calls
+            ]
         )
+        semaphore = asyncio.Semaphore(concurrency)
+        results = [None] * len(calls)
+        failed = []
+
+        # only inputs without cached results are sent to the LLM
+        cached_results = await asyncio.gather(
+            *[self._get_cached_result(inputs) for inputs in calls]
+        )
+        uncached = []
+        for i, cached_result in enumerate(cached_results):
+            if cached_result is MISSING:
+                uncached.append(i)
+            else:
+                results[i] = cached_result
+
+        async def run_batch(batch: list[int]):
+            async with semaphore:
+                try:
+                    values = await self._call_batch([rendered_inputs[i] for i in batch])
+                except Exception:
+                    values = []
+            if not isinstance(values, list):
+                values = []
+
+            for i, value in itertools.zip_longest(
+                batch, values[: len(batch)], fillvalue=MISSING
+            ):
+                try:
+                    results[i] = self._parse_result(value)
+                except Exception:
+                    failed.append(i)
+                else:
+                    await self._set_cached_result(calls[i], _to_response(value))
 
-        async def get_response():
-            response = await bot.say(message)
-            return response.parsed_content
+        async def retry(i: int):
+            async with semaphore:
+                results[i] = await self._call(calls[i])
 
-        if inspect.iscoroutinefunction(fn):
-            return get_response()
+        tokens = count_tokens_many([rendered_inputs[i] for i in uncached])
+        await asyncio.gather(
+            *[
+                run_batch([uncached[j] for j in batch])
+                for batch in _batch_by_tokens(tokens, batch_tokens)
+            ]
+        )
+        await asyncio.gather(*[retry(i) for i in failed])
+        return results
+
+    async def _call_batch(self, rendered_inputs: list[str]) -> list:
+        if self._map_bot is None:
+            bot = self.get_bot()
+            format = MAP_FORMAT.format(format=bot.response_format.format)
+            self._map_bot = bot.copy(
+                update=dict(
+                    response_format=TypeFormatter(list).copy(update=dict(format=format))
+                )
+            )
+        bot = self._map_bot.copy(update=dict(history=InMemoryHistory()))
+        bot._compiled_prompt = self._map_bot._compiled_prompt
+
+        message = await AI_FN_MAP_MESSAGE.render_async(inputs=rendered_inputs)
+        response = await bot.say(message)
+        return response.parsed_content
+
+    def _parse_result(self, value: Any) -> Any:
+        """
+        Validate a single result from a batch against the function's return
+        annotation.
+        """
+        if value is MISSING:
+            raise ValueError("Missing result")
+        response_format = self._get_base_bot().response_format
+        response = _to_response(value)
+        response_format.validate_response(response)
+        return response_format.parse_response(response)
+
+    def _get_cache(self) -> Optional[Cache]:
+        if self.cache is True:
+            return marvin.infra.cache.get_ai_fn_cache()
+        return self.cache or None
+
+    def _get_cache_key(self, inputs: tuple[list[str], Any]) -> str:
+        if self._cache_prefix is None:
+            bot = self._get_base_bot()
+            self._cache_prefix = hash_text(
+                self.instructions,
+                bot.personality,
+                bot.response_format.format or "",
+                str(getattr(bot.llm, "model_name", None)),
+                str(getattr(bot.llm, "temperature", None)),
+            )
+        input_binds, return_value = inputs
+        return hash_text(
+            self._cache_prefix, json.dumps(input_binds), repr(return_value)
+        )
+
+    async def _get_cached_result(self, inputs: tuple[list[str], Any]) -> Any:
+        """
+        Returns the cached result for these inputs, or `MISSING`.
+        """
+        cache = self._get_cache()
+        if cache is None:
+            return MISSING
+        response = await cache.get(self._get_cache_key(inputs))
+        if response is None:
+            return MISSING
+        try:
+            return self._parse_result(response)
+        except Exception:
+            # the cached response doesn't match the return annotation anymore
+            return MISSING
+
+    async def _set_cached_result(self, inputs: tuple[list[str], Any], response: str):
+        cache = self._get_cache()
+        if cache is not None:
+            await cache.set(self._get_cache_key(inputs), response)
+
+    def _get_inputs(self, *args, **kwargs) -> tuple[list[str], Any]:
+        """
+        Bind the arguments and, if `call_function` is True, call the function.
+        If the function is async, the returned value is a coroutine; see
+        `_resolve_inputs`.
+        """
+        # Bind the provided arguments to the function signature
+        bound_args = self.signature.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+
+        # Build input binds
+        input_binds = []
+        for k, v in bound_args.arguments.items():
+            input_binds.append(f"{k} = {v}")
+
+        # see if the function preprocesses the inputs
+        if self.call_function:
+            return_value = self.fn(*args, **kwargs)
         else:
-            return asyncio.run(get_response())
+            return_value = None
+
+        return input_binds, return_value
+
+    async def _call(self, inputs: tuple[list[str], Any]) -> Any:
+        inputs = await _resolve_inputs(inputs)
+        result = await self._get_cached_result(inputs)
+        if result is not MISSING:
+            return result
+
+        input_binds, return_value = inputs
+        message = await AI_FN_MESSAGE.render_async(
+            input_binds=input_binds, return_value=return_value
+        )
+        response = await self.get_bot().say(message)
+        await self._set_cached_result(inputs, response.content)
+        return response.parsed_content
+
+
+async def _resolve_inputs(inputs: tuple[list[str], Any]) -> tuple[list[str], Any]:
+    input_binds, return_value = inputs
+    if inspect.isawaitable(return_value):
+        return_value = await return_value
+    return input_binds, return_value
+
+
+def _to_response(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value)
 
-    ai_fn_wrapper.fn = fn
 
-    return ai_fn_wrapper
+def _get_call_args(item: Any) -> tuple[tuple, dict]:
+    if isinstance(item, dict):
+        return (), item
+    elif isinstance(item, tuple):
+        return item, {}
+    else:
+        return (item,), {}
+
+
+def _batch_by_tokens(tokens: list[int], max_tokens: int) -> list[list[int]]:
+    """
+    Groups consecutive indices so that each group's tokens add up to at most
+    `max_tokens`. Every group has at least one index.
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for i, n in enumerate(tokens):
+        if batch and batch_tokens + n > max_tokens:
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += n
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _get_function_def(fn: Callable) -> str:
+    """
+    Returns the source code of the function, without any decorators.
+    """
+    try:
+        source = inspect.getsource(fn)
+    except (OSError, TypeError):
+        # the source isn't available (for example, in an interactive session),
+        # so fall back to the signature and docstring
+        return f'def {fn.__name__}{inspect.signature(fn)}:\n    """{fn.__doc__}"""'
+
+    # the source will include the @ai_fn decorator, which can confuse the AI,
+    # so we use regex to only get the function that is being decorated
+    function_def = inspect.cleandoc(source)
+    return re.search(re.compile(r"(\bdef\b.*)", re.DOTALL), function_def).group(0)
+
+
+def ai_fn(
+    fn: Callable = None,
+    *,
+    bot_modifier: Callable = None,
+    call_function: bool = True,
+    cache: Union[bool, Cache] = False,
+    **bot_kwargs,
+) -> AIFunction:
+    """
+    @ai_fn
+    def rhyme(word: str) -> str:
+        "Returns a word that rhymes with the input word."
+
+    rhyme("blue") # "glue"
+
+
+    Args
+        - bot_modifier (Callable):  the `Bot` is passed to this function before
+          the function is first called. The function can either modify the bot
+          inplace or return a modified bot. Useful for customizing behavior in
+          ways that can't easily be passed directly to the bot via kwargs
+        - call_function (bool):  if True, the function will be called and the
+          return value will be included in the message
+        - cache (bool | Cache):  if True, results are stored on disk and reused
+          when the function is called with the same inputs, until its source
+          changes. A `Cache` can also be provided to store results elsewhere.
+        - bot_kwargs (dict):  kwargs to pass to the `Bot` constructor
+
+    """
+    # this allows the decorator to be used with or without calling it
+    if fn is None:
+        return partial(
+            ai_fn,
+            bot_modifier=bot_modifier,
+            call_function=call_function,
+            cache=cache,
+            **bot_kwargs,
+        )
+
+    return AIFunction(
+        fn,
+        bot_modifier=bot_modifier,
+        call_function=call_function,
+        cache=cache,
+        **bot_kwargs,
+    )
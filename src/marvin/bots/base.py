@@ -2,24 +2,41 @@ import asyncio
 import inspect
 import json
 import re
-from typing import TYPE_CHECKING, Any, Callable
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Optional,
+    Union,
+)
 
 import pendulum
+import xxhash
 from fastapi import HTTPException, status
-from openai.error import InvalidRequestError
-from pydantic import Field, validator
+from openai.error import InvalidRequestError, RateLimitError
+from pydantic import Field, PrivateAttr, validator
 
 import marvin
-from marvin.bots.history import History, ThreadHistory
+from marvin.bots.history import History, InMemoryHistory, ThreadHistory
 from marvin.bots.input_transformers import InputTransformer
 from marvin.bots.response_formatters import (
+    PydanticFormatter,
     ResponseFormatter,
     load_formatter_from_shorthand,
 )
+from marvin.bots.streaming import JSONObjectScanner, StreamingJSONParser
+from marvin.infra.llms import OpenAIChat, get_context_window
 from marvin.models.ids import BotID, ThreadID
 from marvin.models.threads import BaseMessage, Message
 from marvin.plugins import Plugin
+from marvin.utilities.async_utils import run_async, run_sync
+from marvin.utilities.rate_limits import RateLimiter, backoff_delay
 from marvin.utilities.strings import jinja_env
+from marvin.utilities.tokenizer import count_tokens
+from marvin.utilities.tracing import span, trace
 from marvin.utilities.types import LoggerMixin, MarvinBaseModel
 
 
@@ -28,6 +45,23 @@ class BotResponse(BaseMessage):
 
 
 MAX_VALIDATION_ATTEMPTS = 3
+# a rough size for responses, used to estimate the cost of requests
+COMPLETION_TOKENS_ESTIMATE = 250
+MAX_ITERATIONS_RESPONSE = 'Error: "Max iterations reached. Please try again."'
+PLUGIN_STOP_SEQUENCES = ["Plugin output:", "Plugin Output:"]
+PLUGIN_REGEX = re.compile(r'({\s*"action":\s*"run-plugin".*})', re.DOTALL)
+
+# fields that are rendered into the bot's system prompt; assigning any of them
+# invalidates the bot's compiled prompt
+PROMPT_FIELDS = {
+    "name",
+    "instructions",
+    "personality",
+    "plugins",
+    "response_format",
+    "include_date_in_prompt",
+}
+DATE_PLACEHOLDER = "__MARVIN_PROMPT_DATE__"
 
 if TYPE_CHECKING:
     from marvin.models.bots import BotConfig
@@ -79,6 +113,33 @@ INSTRUCTIONS_TEMPLATE = jinja_env.from_string(
     )
 )
 
+REFORMAT_INSTRUCTIONS = inspect.cleandoc(
+    """
+    The user will give you a response to their message that could not be parsed
+    into the required format, along with the error that was raised. Extract the
+    answer from the response and reformat it so that it can be parsed correctly.
+    """
+)
+REFORMAT_MESSAGE = jinja_env.from_string(
+    inspect.cleandoc(
+        """
+        # Message
+        {{ user_message }}
+
+        # Response
+        {{ ai_response }}
+
+        # Error
+        {{ error_message }}
+        """
+    )
+)
+
+STREAM_ERROR_MESSAGE = (
+    "Your response was stopped because it can't be parsed into the required"
+    " format ({error}). Respond again with only the formatted response."
+)
+
 DEFAULT_PLUGINS = [
     marvin.plugins.web.VisitURL(),
     marvin.plugins.duckduckgo.DuckDuckGo(),
@@ -141,17 +202,26 @@ class Bot(MarvinBaseModel, LoggerMixin):
         description="Include the date in the prompt. Disable for testing.",
     )
 
+    # the compiled system prompt, cached between turns
+    _compiled_prompt: dict = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name, value):
+        result = super().__setattr__(name, value)
+        # recompile the prompt the next time it's needed
+        if name in PROMPT_FIELDS:
+            self._compiled_prompt = {}
+        return result
+
+    def copy(self, *args, **kwargs) -> "Bot":
+        bot = super().copy(*args, **kwargs)
+        # the copy may have been updated, so it compiles its own prompt
+        bot._compiled_prompt = {}
+        return bot
+
     @validator("llm", always=True)
     def default_llm(cls, v):
         if v is None:
-            # deferred import for performance
-            from langchain.chat_models import ChatOpenAI
-
-            return ChatOpenAI(
-                model_name=marvin.settings.openai_model_name,
-                temperature=marvin.settings.openai_model_temperature,
-                openai_api_key=marvin.settings.openai_api_key.get_secret_value(),
-            )
+            return OpenAIChat()
         return v
 
     @validator("name", always=True)
@@ -258,66 +328,324 @@ class Bot(MarvinBaseModel, LoggerMixin):
     def say_sync(self, *args, **kwargs) -> BotResponse:
         """
         A synchronous version of `say`. This is useful for testing or including
-        a bot in a synchronous framework.
+        a bot in a synchronous framework. It can be called from any thread; the
+        bot runs on Marvin's background event loop.
+        """
+        return run_sync(self.say(*args, **kwargs))
+
+    async def say_many(
+        self,
+        inputs: Iterable[Union[str, tuple, dict]],
+        concurrency: int = 10,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_retries: int = 5,
+    ) -> list[Union[BotResponse, Exception]]:
+        """
+        Send many independent messages to the bot concurrently.
+
+        Each input can be a string, a tuple of positional arguments for `say`,
+        or a dict of keyword arguments for `say`. Inputs don't see each other:
+        each one is answered with an empty in-memory history, and the bot's own
+        history is not modified.
+
+        Requests are scheduled against requests-per-minute and tokens-per-minute
+        budgets (by default, `settings.openai_requests_per_minute` and
+        `settings.openai_tokens_per_minute`; pass 0 to disable either one), using
+        the token count of the prompt to estimate each request's cost before it
+        is sent. Requests that are rate limited anyway are retried with jittered
+        exponential backoff.
+
+        Returns a list with one item per input, in the same order: either the
+        bot's response or the exception that was raised for that input.
         """
-        return asyncio.run(self.say(*args, **kwargs))
+        if requests_per_minute is None:
+            requests_per_minute = marvin.settings.openai_requests_per_minute
+        if tokens_per_minute is None:
+            tokens_per_minute = marvin.settings.openai_tokens_per_minute
+        limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+        _, prompt_tokens = await self._get_prompt()
+
+        async def say_one(item: Union[str, tuple, dict]) -> BotResponse:
+            if isinstance(item, dict):
+                args, kwargs = (), item
+            elif isinstance(item, tuple):
+                args, kwargs = item, {}
+            else:
+                args, kwargs = (item,), {}
 
-    async def say(self, *args, response_format=None, **kwargs) -> BotResponse:
-        # process inputs
-        message = self.input_prompt.format(*args, **kwargs)
+            estimated_tokens = (
+                prompt_tokens
+                + count_tokens(self.input_prompt.format(*args, **kwargs))
+                + COMPLETION_TOKENS_ESTIMATE
+            )
 
-        # get bot instructions
-        bot_instructions = await self._get_bot_instructions(
-            response_format=response_format
+            async with semaphore:
+                for attempt in range(max_retries + 1):
+                    await limiter.acquire(tokens=estimated_tokens)
+                    bot = self.copy(update=dict(history=InMemoryHistory()))
+                    # the copy only differs in its history, so it can share the
+                    # compiled prompt
+                    bot._compiled_prompt = self._compiled_prompt
+                    try:
+                        return await bot.say(*args, **kwargs)
+                    except RateLimitError:
+                        if attempt == max_retries:
+                            raise
+                        delay = backoff_delay(attempt)
+                        self.logger.debug(
+                            f"Rate limited; retrying in {delay:.2f} seconds"
+                        )
+                        await asyncio.sleep(delay)
+
+        return await asyncio.gather(
+            *[say_one(item) for item in inputs], return_exceptions=True
         )
-        plugin_instructions = await self._get_plugin_instructions()
-        if plugin_instructions is not None:
-            bot_instructions = [bot_instructions, plugin_instructions]
-        else:
-            bot_instructions = [bot_instructions]
 
-        # load chat history
-        history = await self._get_history()
+    async def say(self, *args, response_format=None, **kwargs) -> BotResponse:
+        """
+        Send a message to the bot and return its response.
 
-        # apply input transformers
-        for t in self.input_transformers:
-            message = t.run(message)
-            if inspect.iscoroutine(message):
-                message = await message
-        user_message = Message(role="user", content=message)
+        If tracing is enabled, the response's `data["trace"]` holds timing
+        spans for each stage of the turn.
+        """
+        with trace("bot.say", bot=self.name) as root:
+            messages, user_message = await self._prepare_messages(
+                *args, response_format=response_format, **kwargs
+            )
 
-        messages = bot_instructions + history + [user_message]
+            finished = False
+            counter = 1
 
-        self.logger.debug_kv("User message", message, "bold blue")
-        await self.history.add_message(user_message)
+            while not finished:
+                if counter > 1:
+                    messages.append(Message(role="system", content=self.reminder))
+                if counter > marvin.settings.bot_max_iterations:
+                    response = MAX_ITERATIONS_RESPONSE
+                    finished = True
+                else:
+                    counter += 1
+                    if self._get_streaming_parser() is not None:
+                        response = await self._call_llm_with_validation(
+                            messages=messages
+                        )
+                    else:
+                        response = await self._call_llm(messages=messages)
+                if not finished:
+                    plugin_messages = await self._check_for_plugins(response=response)
+
+                if not plugin_messages:
+                    finished = True
+                else:
+                    messages.extend(plugin_messages)
+
+            ai_response = await self._finalize_response(
+                response=response, user_message=user_message
+            )
+
+        if root.recording:
+            ai_response.data["trace"] = root.to_dict()
+        return ai_response
+
+    async def stream(
+        self, *args, response_format=None, **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """
+        Like `say`, but yields the bot's response as it is generated by the LLM.
+
+        The output is scanned for plugin payloads as it arrives, and a plugin
+        runs as soon as its JSON payload is complete rather than when the LLM
+        finishes its response. Any text the bot produces before calling a
+        plugin is streamed as well, but plugin payloads themselves are not.
+
+        The final response is validated and saved to the bot's history once
+        the stream is exhausted; use `say` if you need the parsed response.
+        """
+        messages, user_message = await self._prepare_messages(
+            *args, response_format=response_format, **kwargs
+        )
 
-        finished = False
         counter = 1
 
-        while not finished:
+        while True:
             if counter > 1:
                 messages.append(Message(role="system", content=self.reminder))
             if counter > marvin.settings.bot_max_iterations:
-                response = 'Error: "Max iterations reached. Please try again."'
-                finished = True
+                response = MAX_ITERATIONS_RESPONSE
+                yield response
+                break
+            counter += 1
+
+            scanner = JSONObjectScanner()
+            released = 0
+            # plugins are started as soon as their payloads are complete
+            plugin_runs = []
+            payload_start = None
+            llm_stream = self._stream_llm(messages=messages)
+            try:
+                async for token in llm_stream:
+                    for start, end in scanner.feed(token):
+                        payload = scanner.text[start:end]
+                        if self.plugins and PLUGIN_REGEX.match(payload):
+                            if payload_start is None:
+                                payload_start = start
+                            plugin_runs.append(
+                                asyncio.create_task(self._run_plugin_payload(payload))
+                            )
+
+                    if payload_start is not None:
+                        # nothing after the first plugin payload is streamed
+                        limit = payload_start
+                    elif self.plugins and scanner.open_object_start is not None:
+                        # hold back any JSON object until we know whether it
+                        # is a plugin payload
+                        limit = scanner.open_object_start
+                    else:
+                        limit = len(scanner.text)
+                    if limit > released:
+                        yield scanner.text[released:limit]
+                        released = limit
+            except BaseException:
+                for task in plugin_runs:
+                    task.cancel()
+                raise
+            finally:
+                await llm_stream.aclose()
+
+            response = scanner.text
+            if plugin_runs:
+                plugin_messages = await self._get_plugin_messages(
+                    response=response, plugin_runs=plugin_runs
+                )
             else:
-                counter += 1
-                response = await self._call_llm(messages=messages)
-            if not finished:
+                if len(response) > released:
+                    yield response[released:]
                 plugin_messages = await self._check_for_plugins(response=response)
 
             if not plugin_messages:
-                finished = True
-            else:
-                messages.extend(plugin_messages)
+                break
+            messages.extend(plugin_messages)
+
+        await self._finalize_response(response=response, user_message=user_message)
 
+    async def stream_parsed(
+        self, *args, response_format=None, **kwargs
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Like `stream`, but for bots that respond with JSON: yields the response
+        parsed so far each time it grows, so fields can be used before the
+        response is complete. Partial values are plain JSON data (dicts, lists,
+        strings, and so on); strings may still be incomplete.
+        """
+        parser = StreamingJSONParser()
+        last_partial = None
+        async for token in self.stream(
+            *args, response_format=response_format, **kwargs
+        ):
+            parser.feed(token)
+            partial = parser.partial()
+            if partial is not None and partial != last_partial:
+                last_partial = partial
+                yield partial
+
+    def _repair_response(self, response: str) -> Optional[str]:
+        """
+        Returns the response formatter's deterministic repair of the response if
+        it passes validation, otherwise None.
+        """
+        try:
+            repaired_response = self.response_format.repair_response(response)
+            self.response_format.validate_response(repaired_response)
+        except Exception:
+            return None
+        return repaired_response
+
+    async def _reformat_response(
+        self, user_message: str, ai_response: str, error_message: str
+    ) -> str:
+        """
+        Ask the LLM to reformat a response that failed validation.
+        """
+        # deferred import to avoid circular imports
+        from marvin.bots.utility_bots import UtilityBot
+
+        reformat_bot = UtilityBot(
+            instructions=REFORMAT_INSTRUCTIONS,
+            response_format=ResponseFormatter(
+                format=self.response_format.format, on_error="ignore"
+            ),
+            llm=self.llm,
+        )
+        response = await reformat_bot.say(
+            await REFORMAT_MESSAGE.render_async(
+                user_message=user_message,
+                ai_response=ai_response,
+                error_message=error_message,
+            )
+        )
+        return response.content
+
+    async def _prepare_messages(
+        self, *args, response_format=None, **kwargs
+    ) -> tuple[list[Message], Message]:
+        """
+        Build the list of messages for a new turn and record the user's message
+        in the bot's history.
+        """
+        # process inputs
+        message = self.input_prompt.format(*args, **kwargs)
+
+        # get bot instructions
+        with span("prompt"):
+            bot_instructions, prompt_tokens = await self._get_prompt(
+                response_format=response_format
+            )
+
+        # apply input transformers
+        with span("input_transformers"):
+            for t in self.input_transformers:
+                message = t.run(message)
+                if inspect.iscoroutine(message):
+                    message = await message
+        user_message = Message(role="user", content=message)
+        user_message.tokens = count_tokens(message)
+
+        # load as much chat history as fits in the model's context window
+        with span("history.load") as history_span:
+            history = await self._get_history(
+                max_tokens=self._get_history_budget(
+                    prompt_tokens=prompt_tokens + user_message.tokens
+                )
+            )
+            history_span.set(messages=len(history))
+
+        messages = bot_instructions + history + [user_message]
+
+        self.logger.debug_kv("User message", message, "bold blue")
+        with span("history.write"):
+            await self.history.add_message(user_message)
+
+        return messages, user_message
+
+    async def _finalize_response(
+        self, response: str, user_message: Message
+    ) -> BotResponse:
+        """
+        Validate the LLM's final response and record it in the bot's history.
+        """
         # validate response format
         parsed_response = response
         validated = False
 
         for _ in range(MAX_VALIDATION_ATTEMPTS):
             try:
-                self.response_format.validate_response(response)
+                with span("validate"):
+                    self.response_format.validate_response(response)
+                validated = True
                 break
             except Exception as exc:
                 on_error = self.response_format.on_error
@@ -326,17 +654,26 @@ class Bot(MarvinBaseModel, LoggerMixin):
                 elif on_error == "raise":
                     raise exc
                 elif on_error == "reformat":
+                    # try to fix the response locally before asking the LLM
+                    with span("repair") as repair_span:
+                        repaired_response = self._repair_response(response)
+                        repair_span.set(repaired=repaired_response is not None)
+                    if repaired_response is not None:
+                        self.logger.debug(f"Repaired response: {response}")
+                        response = repaired_response
+                        validated = True
+                        break
+
                     self.logger.debug(
                         "Response did not pass validation. Attempted to reformat:"
                         f" {response}"
                     )
-                    reformatted_response = _reformat_response(
-                        user_message=user_message.content,
-                        ai_response=response,
-                        error_message=repr(exc),
-                        target_return_type=self.response_format.format,
-                    )
-                    response = str(reformatted_response)
+                    with span("reformat"):
+                        response = await self._reformat_response(
+                            user_message=user_message.content,
+                            ai_response=response,
+                            error_message=repr(exc),
+                        )
                 else:
                     raise ValueError(f"Unknown on_error value: {on_error}")
         else:
@@ -348,7 +685,8 @@ class Bot(MarvinBaseModel, LoggerMixin):
         ai_response = BotResponse(
             role="ai", content=response, parsed_content=parsed_response
         )
-        await self.history.add_message(ai_response)
+        with span("history.write"):
+            await self.history.add_message(ai_response)
         self.logger.debug_kv("AI message", ai_response.content, "bold green")
         return ai_response
 
@@ -373,85 +711,186 @@ class Bot(MarvinBaseModel, LoggerMixin):
             self.history = ThreadHistory(thread_id=thread.id)
 
     async def _check_for_plugins(self, response: str) -> list[Message]:
-        messages = []
-
-        # check for plugins json
-        plugin_regex = re.compile(r'({\s*"action":\s*"run-plugin".*})', re.DOTALL)
+        payloads = _find_plugin_payloads(response)
+        # if no complete payload was found, a plugin may have been requested
+        # with invalid JSON; try to run it so the error is reported to the LLM
+        if not payloads and (match := PLUGIN_REGEX.search(response)):
+            payloads = [match.group(1)]
+        if not payloads:
+            return []
+        return await self._get_plugin_messages(
+            response=response,
+            plugin_runs=[self._run_plugin_payload(p) for p in payloads],
+        )
 
-        if match := plugin_regex.search(response):
-            plugin_json = match.group(1)
+    async def _get_plugin_messages(
+        self, response: str, plugin_runs: list[Awaitable]
+    ) -> list[Message]:
+        """
+        Run plugins concurrently and merge their outputs into a single system
+        message.
+        """
+        results = await asyncio.gather(*plugin_runs, return_exceptions=True)
 
-            try:
-                plugin_json = json.loads(plugin_json)
-                plugin_name, plugin_inputs = (
-                    plugin_json["name"],
-                    plugin_json["inputs"],
+        outputs = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error(f"Error running plugin: {response}\n\n{result}")
+                outputs.append(f"Error running plugin: {result}")
+            else:
+                plugin_name, plugin_inputs, plugin_output = result
+                outputs.append(
+                    plugin_output
+                    if len(results) == 1
+                    else f"{plugin_name} {json.dumps(plugin_inputs)}: {plugin_output}"
                 )
 
-                self.logger.debug_kv(
-                    "Plugin input",
-                    f"{plugin_name}: {plugin_inputs}",
-                    "bold blue",
-                )
-                plugin_output = await self._run_plugin(
-                    plugin_name=plugin_name,
-                    plugin_inputs=plugin_inputs,
-                )
+        if len(outputs) == 1:
+            content = f"Plugin output: {outputs[0]}"
+        else:
+            content = "Plugin outputs:\n\n" + "\n\n".join(outputs)
 
-                self.logger.debug_kv("Plugin output", plugin_output, "bold blue")
+        return [
+            Message(role="ai", content=response),
+            Message(role="system", content=content),
+        ]
 
-                messages.append(Message(role="ai", content=response))
-                messages.append(
-                    Message(role="system", content=f"Plugin output: {plugin_output}")
-                )
+    async def _run_plugin_payload(self, payload: str) -> tuple[str, dict, Any]:
+        """
+        Run the plugin described by a `run-plugin` JSON payload and return the
+        plugin's name, inputs, and output.
+        """
+        plugin_json = json.loads(payload)
+        plugin_name, plugin_inputs = (
+            plugin_json["name"],
+            plugin_json["inputs"],
+        )
 
-            except Exception as exc:
-                self.logger.error(f"Error running plugin: {response}\n\n{exc}")
-                messages.append(
-                    Message(
-                        role="system",
-                        name="plugin",
-                        content=f"Error running plugin: {response}\n\n{exc}",
-                    )
-                )
+        self.logger.debug_kv(
+            "Plugin input",
+            f"{plugin_name}: {plugin_inputs}",
+            "bold blue",
+        )
+        plugin_output = await self._run_plugin(
+            plugin_name=plugin_name,
+            plugin_inputs=plugin_inputs,
+        )
+        self.logger.debug_kv("Plugin output", plugin_output, "bold blue")
 
-        return messages
+        return plugin_name, plugin_inputs, plugin_output
 
     async def _run_plugin(self, plugin_name: str, plugin_inputs: dict) -> str:
         plugin = next((p for p in self.plugins if p.name == plugin_name.strip()), None)
         if plugin is None:
             return f'Plugin "{plugin_name}" not found.'
-        try:
-            plugin_output = plugin.run(**plugin_inputs)
-            if inspect.iscoroutine(plugin_output):
-                plugin_output = await plugin_output
-
-            # # send plugin output to
-            # self.publish()
-            return plugin_output
-        except Exception as exc:
-            self.logger.error(
-                f"Error running plugin {plugin_name} with inputs"
-                f" {plugin_inputs}:\n\n{exc}"
-            )
-            return f"Plugin encountered an error. Try again? Error message: {exc}"
+        timeout = plugin.timeout or marvin.settings.bot_plugin_timeout
+        with span("plugin", plugin=plugin.name):
+            try:
+                # one timeout covers the whole run, including any coroutine a
+                # synchronous plugin returns
+                plugin_output = await asyncio.wait_for(
+                    _call_plugin(plugin, plugin_inputs), timeout=timeout
+                )
+
+                # # send plugin output to
+                # self.publish()
+                return plugin_output
+            except asyncio.TimeoutError:
+                self.logger.error(
+                    f"Plugin {plugin_name} with inputs {plugin_inputs} timed out after"
+                    f" {timeout} seconds"
+                )
+                return f"Plugin timed out after {timeout} seconds."
+            except Exception as exc:
+                self.logger.error(
+                    f"Error running plugin {plugin_name} with inputs"
+                    f" {plugin_inputs}:\n\n{exc}"
+                )
+                return f"Plugin encountered an error. Try again? Error message: {exc}"
+
+    async def _get_prompt(self, response_format=None) -> tuple[list[Message], int]:
+        """
+        Returns the system messages that start every conversation with the bot,
+        along with their total number of tokens.
+        """
+        bot_instructions = await self._get_bot_instructions(
+            response_format=response_format
+        )
+        plugin_instructions = await self._get_plugin_instructions()
 
-    async def _get_bot_instructions(self, response_format=None) -> Message:
         if response_format is not None:
-            response_format = load_formatter_from_shorthand(response_format)
+            tokens = count_tokens(bot_instructions.content)
         else:
-            response_format = self.response_format
-        date = pendulum.now().format("dddd, MMMM D, YYYY")
-        bot_instructions = await INSTRUCTIONS_TEMPLATE.render_async(
+            tokens = self._compiled_prompt["instructions_tokens"]
+
+        if plugin_instructions is None:
+            return [bot_instructions], tokens
+        tokens += self._compiled_prompt["plugin_tokens"]
+        return [bot_instructions, plugin_instructions], tokens
+
+    async def _get_bot_instructions(self, response_format=None) -> Message:
+        """
+        The bot's instructions are compiled once and cached until one of the
+        fields that they depend on is assigned; after that, only the date is
+        updated when it changes. Note that in-place modifications (for example,
+        appending to `bot.plugins`) are not detected.
+
+        Providing a `response_format` bypasses the cache.
+        """
+        date = (
+            pendulum.now().format("dddd, MMMM D, YYYY")
+            if self.include_date_in_prompt
+            else None
+        )
+
+        if response_format is not None:
+            bot_instructions = await self._render_bot_instructions(
+                response_format=load_formatter_from_shorthand(response_format),
+                date=date,
+            )
+            return Message(role="system", content=bot_instructions)
+
+        compiled = self._compiled_prompt
+        if "instructions_template" not in compiled:
+            compiled["instructions_template"] = await self._render_bot_instructions(
+                response_format=self.response_format,
+                date=DATE_PLACEHOLDER if date else None,
+            )
+        if "instructions" not in compiled or compiled.get("date") != date:
+            bot_instructions = compiled["instructions_template"]
+            if date:
+                bot_instructions = bot_instructions.replace(DATE_PLACEHOLDER, date)
+            compiled["instructions"] = Message(role="system", content=bot_instructions)
+            compiled["instructions_tokens"] = count_tokens(bot_instructions)
+            compiled["date"] = date
+        return compiled["instructions"]
+
+    async def _render_bot_instructions(
+        self, response_format: ResponseFormatter, date: str = None
+    ) -> str:
+        return await INSTRUCTIONS_TEMPLATE.render_async(
             name=self.name,
             instructions=self.instructions,
             response_format=response_format,
             personality=self.personality,
-            date=date if self.include_date_in_prompt else None,
+            date=date,
         )
-        return Message(role="system", content=bot_instructions)
 
     async def _get_plugin_instructions(self) -> Message:
+        compiled = self._compiled_prompt
+        if "plugins" not in compiled:
+            plugin_instructions = self._render_plugin_instructions()
+            compiled["plugins"] = (
+                Message(role="system", content=plugin_instructions)
+                if plugin_instructions is not None
+                else None
+            )
+            compiled["plugin_tokens"] = (
+                count_tokens(plugin_instructions) if plugin_instructions else 0
+            )
+        return compiled["plugins"]
+
+    def _render_plugin_instructions(self) -> str:
         if self.plugins:
             plugin_descriptions = "\n\n".join(
                 [p.get_full_description() for p in self.plugins]
@@ -474,7 +913,10 @@ class Bot(MarvinBaseModel, LoggerMixin):
                 `{{"action": "run-plugin", "name": <MUST be one of
                 [{plugin_names}]>, "inputs": {{<any plugin arguments>}}}}`. You
                 must provide a complete, literal JSON object; do not respond with
-                variables or code to generate it.
+                variables or code to generate it. If you need several plugins
+                whose inputs don't depend on each other's outputs, provide all
+                of their payloads in the same response, one after another, and
+                they will be run at the same time.
                 
                 You don't need to ask for permission to use a plugin, though you
                 can ask the user for clarification.  Do not speculate about
@@ -490,48 +932,188 @@ class Bot(MarvinBaseModel, LoggerMixin):
                 """
             ).format(plugin_names=plugin_names, plugin_descriptions=plugin_descriptions)
 
-            return Message(role="system", content=plugin_overview)
+            return plugin_overview
+
+    async def _get_history(self, max_tokens: int) -> list[Message]:
+        return await self.history.get_messages(max_tokens=max_tokens)
+
+    def _get_streaming_parser(self) -> Optional[StreamingJSONParser]:
+        """
+        Returns a parser that validates the LLM's response as it streams, or
+        None if the response can't be validated incrementally. Only Pydantic
+        responses that are JSON objects or arrays, from bots without plugins,
+        are validated, and only when the LLM can stream. Other JSON responses
+        may be strings or scalars, so they are validated once complete.
+        """
+        response_format = self.response_format
+        if (
+            self.plugins
+            or not isinstance(self.llm, OpenAIChat)
+            or response_format.on_error != "reformat"
+        ):
+            return None
+        if isinstance(response_format, PydanticFormatter):
+            expected_type = response_format.type_schema.get("type")
+            if expected_type in ("object", "array"):
+                return StreamingJSONParser(expected_type=expected_type)
+        return None
+
+    async def _call_llm_with_validation(self, messages: list[Message]) -> str:
+        """
+        Stream the LLM's response, checking it as it arrives. If the response
+        can no longer be parsed into the response format (for example, if it
+        has the wrong type or starts with prose), the generation is stopped and
+        the LLM is asked to respond again. The last response is returned after
+        `MAX_VALIDATION_ATTEMPTS` attempts, to be repaired or reformatted.
+        """
+        messages = list(messages)
+        for _ in range(MAX_VALIDATION_ATTEMPTS):
+            parser = self._get_streaming_parser()
+            with span("llm", streamed=True) as llm_span:
+                llm_stream = self._stream_llm(messages=messages)
+                try:
+                    async for token in llm_stream:
+                        parser.feed(token)
+                        if parser.error is not None:
+                            break
+                finally:
+                    await llm_stream.aclose()
+                if parser.error is not None:
+                    llm_span.set(aborted=parser.error)
+
+            if parser.error is None:
+                break
+            self.logger.debug(f"Stopped invalid response: {parser.error}")
+            messages.extend(
+                [
+                    Message(role="ai", content=parser.text),
+                    Message(
+                        role="system",
+                        content=STREAM_ERROR_MESSAGE.format(error=parser.error),
+                    ),
+                ]
+            )
+        return parser.text
 
-    async def _get_history(self) -> list[Message]:
-        return await self.history.get_messages(max_tokens=2500)
+    def _get_history_budget(self, prompt_tokens: int) -> int:
+        """
+        The number of tokens available for history: the model's context window,
+        minus the prompt and the space reserved for the response.
+        """
+        context_window = get_context_window(getattr(self.llm, "model_name", None))
+        return max(
+            context_window - prompt_tokens - marvin.settings.bot_completion_tokens, 0
+        )
 
     async def _call_llm(self, messages: list[Message]) -> str:
         """
-        Format and send messages via langchain
+        Send messages to the LLM and return its response. Bots use Marvin's
+        OpenAI client by default; any other LLM is called via its langchain-style
+        `agenerate` method.
         """
-        # deferred import for performance
-        from langchain.schema import AIMessage, HumanMessage, SystemMessage
+        with span("llm") as llm_span:
+            if llm_span.recording:
+                llm_span.set(
+                    prompt_tokens=sum(
+                        m.tokens if m.tokens is not None else count_tokens(m.content)
+                        for m in messages
+                    )
+                )
 
-        langchain_messages = []
+            cache_key = self._get_llm_cache_key(messages=messages)
+            if cache_key is not None:
+                cached_response = await marvin.infra.cache.get_llm_cache().get(
+                    cache_key
+                )
+                if cached_response is not None:
+                    self.logger.debug("Using cached LLM response")
+                    llm_span.set(cached=True)
+                    return cached_response
+
+            if marvin.settings.verbose:
+                messages_repr = "\n".join(repr(m) for m in messages)
+                self.logger.debug(f"Sending messages to LLM: {messages_repr}")
+            try:
+                if isinstance(self.llm, OpenAIChat):
+                    response = await self.llm.acomplete(
+                        messages=messages, stop=PLUGIN_STOP_SEQUENCES
+                    )
+                else:
+                    result = await self.llm.agenerate(
+                        messages=[_to_langchain_messages(messages)],
+                        stop=PLUGIN_STOP_SEQUENCES,
+                    )
+                    response = result.generations[0][0].text
+            except InvalidRequestError as exc:
+                _raise_for_missing_model(exc)
+                raise exc
 
-        for msg in messages:
-            if msg.role == "system":
-                langchain_messages.append(SystemMessage(content=msg.content))
-            elif msg.role == "ai":
-                langchain_messages.append(AIMessage(content=msg.content))
-            elif msg.role == "user":
-                langchain_messages.append(HumanMessage(content=msg.content))
-            else:
-                raise ValueError(f"Unrecognized role: {msg.role}")
+            if llm_span.recording:
+                llm_span.set(completion_tokens=count_tokens(response))
+
+            if cache_key is not None:
+                await marvin.infra.cache.get_llm_cache().set(cache_key, response)
+            return response
+
+    async def _stream_llm(self, messages: list[Message]) -> AsyncGenerator[str, None]:
+        """
+        Send messages to the LLM and yield its response as it is generated. If
+        the bot's LLM does not support streaming, the complete response is
+        yielded at once.
+        """
+        if not isinstance(self.llm, OpenAIChat):
+            yield await self._call_llm(messages=messages)
+            return
+
+        cache_key = self._get_llm_cache_key(messages=messages)
+        if cache_key is not None:
+            cached_response = await marvin.infra.cache.get_llm_cache().get(cache_key)
+            if cached_response is not None:
+                self.logger.debug("Using cached LLM response")
+                yield cached_response
+                return
 
         if marvin.settings.verbose:
-            messages_repr = "\n".join(repr(m) for m in langchain_messages)
-            self.logger.debug(f"Sending messages to LLM: {messages_repr}")
+            messages_repr = "\n".join(repr(m) for m in messages)
+            self.logger.debug(f"Streaming messages from LLM: {messages_repr}")
+
+        response = ""
         try:
-            result = await self.llm.agenerate(
-                messages=[langchain_messages], stop=["Plugin output:", "Plugin Output:"]
-            )
+            async for token in self.llm.astream(
+                messages=messages, stop=PLUGIN_STOP_SEQUENCES
+            ):
+                response += token
+                yield token
         except InvalidRequestError as exc:
-            if "does not exist" in str(exc):
-                raise ValueError(
-                    "Please check your `openai_model_name` and that your OpenAI account"
-                    " has access to this model. You can select an OpenAI model by"
-                    " setting the `MARVIN_OPENAI_MODEL_NAME` env var."
-                    " Read more about settings in the docs: https://www.askmarvin.ai/guide/introduction/configuration/#settings"  # noqa: E501
-                )
+            _raise_for_missing_model(exc)
             raise exc
 
-        return result.generations[0][0].text
+        # only complete responses are cached
+        if cache_key is not None:
+            await marvin.infra.cache.get_llm_cache().set(cache_key, response)
+
+    def _get_llm_cache_key(self, messages: list[Message]) -> Optional[str]:
+        """
+        Returns the key for caching the LLM's response to these messages, or
+        None if the response should not be cached. Only deterministic LLMs (with
+        a temperature of 0) are cached.
+        """
+        if not marvin.settings.llm_cache_enabled:
+            return None
+        temperature = getattr(self.llm, "temperature", None)
+        if temperature != 0:
+            return None
+        # hashed directly rather than with the memoized `hash_text`, which
+        # would keep every prompt in memory
+        key = json.dumps(
+            [
+                [[m.role, m.name, m.content] for m in messages],
+                str(getattr(self.llm, "model_name", None)),
+                str(temperature),
+                PLUGIN_STOP_SEQUENCES,
+            ]
+        )
+        return xxhash.xxh3_128_hexdigest(key.encode())
 
     async def interactive_chat(self, first_message: str = None):
         """
@@ -540,32 +1122,53 @@ class Bot(MarvinBaseModel, LoggerMixin):
         await marvin.bots.interactive_chat.chat(bot=self, first_message=first_message)
 
 
-def _reformat_response(
-    user_message: str,
-    ai_response: str,
-    target_return_type: Any,
-    error_message: str,
-) -> str:
-    @marvin.ai_fn(
-        plugins=[],
-        bot_modifier=lambda bot: setattr(bot.response_format, "on_error", "ignore"),
-    )
-    def reformat_response(
-        response: str, user_message: str, target_return_type: str, error_message: str
-    ) -> target_return_type:
-        """
-        The `response` contains an answer to the `user_prompt`.
-        However it could not be parsed into the correct return format
-        (`target_return_type`). The associated error message was
-        `error_message`.
-
-        Extract the answer from the `response` and format it to be parsed
-        correctly.
-        """
-
-    return reformat_response(
-        response=ai_response,
-        user_message=user_message,
-        target_return_type=target_return_type,
-        error_message=error_message,
-    )
+def _find_plugin_payloads(response: str) -> list[str]:
+    """
+    Returns every `run-plugin` JSON payload in the response, in order.
+    """
+    scanner = JSONObjectScanner()
+    return [
+        scanner.text[start:end]
+        for start, end in scanner.feed(response)
+        if PLUGIN_REGEX.match(scanner.text[start:end])
+    ]
+
+
+def _to_langchain_messages(messages: list[Message]) -> list:
+    # deferred import for performance
+    from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+    langchain_messages = []
+    for msg in messages:
+        if msg.role == "system":
+            langchain_messages.append(SystemMessage(content=msg.content))
+        elif msg.role == "ai":
+            langchain_messages.append(AIMessage(content=msg.content))
+        elif msg.role == "user":
+            langchain_messages.append(HumanMessage(content=msg.content))
+        else:
+            raise ValueError(f"Unrecognized role: {msg.role}")
+    return langchain_messages
+
+
+async def _call_plugin(plugin: Plugin, plugin_inputs: dict) -> Any:
+    # synchronous plugins run in a thread so that they don't block other
+    # plugins; the thread can't be cancelled, so it keeps running if the plugin
+    # times out
+    if inspect.iscoroutinefunction(plugin.run):
+        plugin_output = await plugin.run(**plugin_inputs)
+    else:
+        plugin_output = await run_async(plugin.run, **plugin_inputs)
+    if inspect.iscoroutine(plugin_output):
+        plugin_output = await plugin_output
+    return plugin_output
+
+
+def _raise_for_missing_model(exc: InvalidRequestError):
+    if "does not exist" in str(exc):
+        raise ValueError(
+            "Please check your `openai_model_name` and that your OpenAI account"
+            " has access to this model. You can select an OpenAI model by"
+            " setting the `MARVIN_OPENAI_MODEL_NAME` env var."
+            " Read more about settings in the docs: https://www.askmarvin.ai/guide/introduction/configuration/#settings"  # noqa: E501
+        )
@@ -1,14 +1,29 @@
 import abc
+import asyncio
+import atexit
+import datetime
+import threading
+import time
+import weakref
+from collections import defaultdict
 
 from pydantic import Field
 
 import marvin
 from marvin.models.ids import ThreadID
 from marvin.models.threads import Message, MessageCreate
-from marvin.utilities.strings import count_tokens
+from marvin.utilities.async_utils import run_sync
+from marvin.utilities.tokenizer import count_tokens
 from marvin.utilities.types import DiscriminatedUnionType
 
 
+def _timestamp(message: Message) -> datetime.datetime:
+    # SQLite drops timezones, so naive timestamps are assumed to be UTC
+    if message.timestamp.tzinfo is None:
+        return message.timestamp.replace(tzinfo=datetime.timezone.utc)
+    return message.timestamp
+
+
 class History(DiscriminatedUnionType, abc.ABC):
     @abc.abstractmethod
     async def add_message(self, message: Message):
@@ -24,7 +39,7 @@ class History(DiscriminatedUnionType, abc.ABC):
         messages = await self._load_messages(n=n)
 
         # sort in reverse timestamp order
-        messages = sorted(messages, key=lambda m: m.timestamp, reverse=True)
+        messages = sorted(messages, key=_timestamp, reverse=True)
 
         if max_tokens is None:
             final_messages = messages
@@ -32,7 +47,9 @@ class History(DiscriminatedUnionType, abc.ABC):
             total_tokens = 0
             final_messages = []
             for msg in messages:
-                msg_tokens = count_tokens(msg.content)
+                msg_tokens = msg.tokens
+                if msg_tokens is None:
+                    msg_tokens = count_tokens(msg.content)
                 if total_tokens + msg_tokens > max_tokens:
                     break
                 else:
@@ -46,16 +63,174 @@ class History(DiscriminatedUnionType, abc.ABC):
         raise NotImplementedError()
 
 
+class MessageBuffer:
+    """
+    Buffers thread messages in memory and writes them to the database in the
+    background, in batches.
+
+    Buffered messages are visible to `get_messages` until they are written.
+    Every event loop that adds messages runs a flush task, which writes all
+    buffered messages `flush_interval` seconds after they arrive and exits once
+    the buffer is empty. Failed writes are logged and retried, waiting twice as
+    long after each consecutive failure (up to `max_retry_interval` seconds).
+    If the task is cancelled (for example, when `asyncio.run` finishes), it
+    flushes before exiting. Anything left over when the interpreter exits,
+    including writes that are still in progress, is flushed by an `atexit`
+    handler.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.5,
+        max_retry_interval: float = 30,
+        exit_timeout: float = 10,
+    ):
+        self.flush_interval = flush_interval
+        self.max_retry_interval = max_retry_interval
+        self.exit_timeout = exit_timeout
+        # messages waiting to be written
+        self._pending: dict[ThreadID, list[Message]] = defaultdict(list)
+        # messages that are being written
+        self._writing: dict[ThreadID, list[Message]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        # the event loops of the writes in progress
+        self._writing_loops: list[asyncio.AbstractEventLoop] = []
+        self._flush_tasks = weakref.WeakKeyDictionary()
+
+    def add(self, message: Message):
+        with self._lock:
+            self._pending[message.thread_id].append(message)
+
+        loop = asyncio.get_running_loop()
+        task = self._flush_tasks.get(loop)
+        if task is None or task.done():
+            self._flush_tasks[loop] = loop.create_task(self._flush_periodically())
+
+    def get_messages(self, thread_id: ThreadID) -> list[Message]:
+        with self._lock:
+            return self._writing.get(thread_id, []) + self._pending.get(thread_id, [])
+
+    async def flush(self):
+        """
+        Write all buffered messages to the database.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, defaultdict(list)
+            for thread_id, messages in batch.items():
+                self._writing[thread_id].extend(messages)
+            loop = asyncio.get_running_loop()
+            self._writing_loops.append(loop)
+
+        try:
+            await marvin.api.threads.create_messages(
+                messages=[m for messages in batch.values() for m in messages]
+            )
+        except BaseException:
+            # put the messages back so they are retried by the next flush
+            with self._lock:
+                for thread_id, messages in batch.items():
+                    self._pending[thread_id][:0] = messages
+            raise
+        finally:
+            with self._lock:
+                for thread_id, messages in batch.items():
+                    writing = self._writing[thread_id]
+                    del writing[: len(messages)]
+                    if not writing:
+                        del self._writing[thread_id]
+                self._writing_loops.remove(loop)
+                self._written.notify_all()
+
+    async def _flush_periodically(self):
+        failures = 0
+        try:
+            while self._pending:
+                await asyncio.sleep(
+                    min(self.flush_interval * 2**failures, self.max_retry_interval)
+                )
+                if await self._try_flush():
+                    failures = 0
+                else:
+                    failures += 1
+        finally:
+            await self._try_flush()
+
+    async def _try_flush(self) -> bool:
+        """
+        Flush the buffer, logging any error instead of raising it. Returns
+        whether the flush succeeded.
+        """
+        try:
+            await self.flush()
+        except Exception as exc:
+            with self._lock:
+                n_messages = sum(len(m) for m in self._pending.values())
+            marvin.get_logger("history").warning(
+                f"Failed to write {n_messages} buffered messages to the database:"
+                f" {exc!r}"
+            )
+            return False
+        return True
+
+    def _flush_at_exit(self):
+        deadline = time.monotonic() + self.exit_timeout
+        with self._lock:
+            # wait for writes in progress, as long as their event loops are
+            # still running (like the background loop used by `run_sync`)
+            while any(loop.is_running() for loop in self._writing_loops):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._written.wait(min(remaining, 0.1))
+
+            # writes that couldn't finish are retried with the pending messages
+            for thread_id, messages in self._writing.items():
+                self._pending[thread_id][:0] = messages
+            self._writing.clear()
+
+        if self._pending:
+            run_sync(self._try_flush())
+
+
+message_buffer = MessageBuffer()
+atexit.register(message_buffer._flush_at_exit)
+
+
 class ThreadHistory(History):
     thread_id: ThreadID = Field(default_factory=ThreadID.new)
+    write_behind: bool = Field(
+        default_factory=lambda: marvin.settings.history_write_behind,
+        description=(
+            "If True, messages are buffered in memory and written to the database"
+            " in the background, instead of before `add_message` returns."
+        ),
+    )
 
     async def add_message(self, message: MessageCreate):
-        await marvin.api.threads.create_message(
-            message=message, thread_id=self.thread_id
-        )
+        if self.write_behind:
+            message = Message(**message.dict(), thread_id=self.thread_id)
+            if message.tokens is None:
+                message.tokens = count_tokens(message.content)
+            message_buffer.add(message)
+        else:
+            await marvin.api.threads.create_message(
+                message=message, thread_id=self.thread_id
+            )
 
     async def _load_messages(self, n: int = None):
-        return await marvin.api.threads.get_messages(thread_id=self.thread_id, n=n)
+        messages = await marvin.api.threads.get_messages(thread_id=self.thread_id, n=n)
+        buffered = message_buffer.get_messages(self.thread_id)
+        if buffered:
+            # a message that was written since the query ran is in both lists
+            ids = {m.id for m in messages}
+            messages = messages + [m for m in buffered if m.id not in ids]
+            messages = sorted(messages, key=_timestamp)
+            if n is not None:
+                messages = messages[-n:]
+        return messages
 
     async def clear(self):
         self.thread_id = ThreadID.new()
@@ -83,9 +258,12 @@ class InMemoryHistory(History):
     )
 
     async def add_message(self, message: Message):
+        if message.tokens is None:
+            message.tokens = count_tokens(message.content)
         self.messages.append(message)
         if self.max_messages is not None:
-            self.messages = self.messages[-self.max_messages :]
+            # trim in place; reassigning would re-validate every message
+            del self.messages[: max(len(self.messages) - self.max_messages, 0)]
 
     async def _load_messages(self, n: int = None) -> list[Message]:
         if n is None:
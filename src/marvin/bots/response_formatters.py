@@ -1,8 +1,10 @@
+import ast
 import json
 import re
 import warnings
+from functools import lru_cache
 from types import GenericAlias
-from typing import Any, Literal, Union
+from typing import Any, Literal, NamedTuple, Union
 
 import pydantic
 from pydantic import BaseModel, Field, PrivateAttr
@@ -17,6 +19,39 @@ from marvin.utilities.types import (
 )
 
 SENTINEL = "__SENTINEL__"
+CODE_FENCE_REGEX = re.compile(r"```[\w-]*[ \t]*\n?(.*?)```", re.DOTALL)
+THOUSANDS_REGEX = re.compile(r"^-?\d{1,3}(,\d{3})+(\.\d+)?$")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# the number of types whose schemas and formats are remembered
+TYPE_FORMAT_CACHE_SIZE = 1024
+
+
+class TypeFormat(NamedTuple):
+    schema: dict
+    format: str
+
+
+def get_type_format(formatter_cls: type["ResponseFormatter"], type_) -> TypeFormat:
+    """
+    Returns the schema and format for a type, which are computed once per
+    formatter class and type (for the most recently used types). Each call
+    returns a new copy of the schema. Types that can't be hashed (for example,
+    generic aliases with unhashable arguments) aren't cached.
+    """
+    try:
+        schema_json, format = _get_cached_type_format(formatter_cls, type_)
+    except TypeError:
+        return formatter_cls._get_type_format(type_)
+    return TypeFormat(schema=json.loads(schema_json), format=format)
+
+
+@lru_cache(maxsize=TYPE_FORMAT_CACHE_SIZE)
+def _get_cached_type_format(
+    formatter_cls: type["ResponseFormatter"], type_
+) -> tuple[str, str]:
+    # the schema is stored as JSON so that callers can't modify the cached copy
+    type_format = formatter_cls._get_type_format(type_)
+    return json.dumps(type_format.schema), type_format.format
 
 
 class ResponseFormatter(DiscriminatedUnionType, LoggerMixin):
@@ -30,6 +65,13 @@ class ResponseFormatter(DiscriminatedUnionType, LoggerMixin):
     def parse_response(self, response):
         return response
 
+    def repair_response(self, response: str) -> str:
+        """
+        Deterministically fix common formatting mistakes in a response that
+        failed validation. The result is validated again before it is used.
+        """
+        return response
+
 
 class JSONFormatter(ResponseFormatter):
     format: str = "A valid JSON string."
@@ -40,6 +82,9 @@ class JSONFormatter(ResponseFormatter):
         except json.JSONDecodeError:
             raise ValueError(f'Expected a valid JSON string, got "{response}"')
 
+    def repair_response(self, response: str) -> str:
+        return repair_json(response)
+
 
 class BooleanFormatter(ResponseFormatter):
     format: str = (
@@ -54,6 +99,9 @@ class BooleanFormatter(ResponseFormatter):
     def parse_response(self, response):
         return response.lower() == "true"
 
+    def repair_response(self, response: str) -> str:
+        return strip_code_fences(response).strip().strip("\"'`.!").lower()
+
 
 class TypeFormatter(ResponseFormatter):
     _cached_type: Union[type, GenericAlias] = PrivateAttr(SENTINEL)
@@ -82,25 +130,27 @@ class TypeFormatter(ResponseFormatter):
                         UserWarning,
                     )
 
-            schema = marvin.utilities.types.type_to_schema(type_)
-
-            kwargs.update(
-                type_schema=schema,
-                format=(
-                    "A valid JSON object that satisfies this OpenAPI schema:"
-                    f" ```{json.dumps(schema)}```. The JSON object will be coerced to"
-                    f" the following type signature: ```{format_type_str(type_)}```."
-                    " Make sure your response is valid JSON, which means you must use"
-                    " lists instead of tuples or sets; literal `true` and `false`"
-                    " instead of `True` and `False`; literal `null` instead of `None`;"
-                    " and double quotes instead of single quotes."
-                ),
-            )
+            type_format = get_type_format(type(self), type_)
+            kwargs.update(type_schema=type_format.schema, format=type_format.format)
         super().__init__(**kwargs)
 
         if type_ is not SENTINEL:
             self._cached_type = type_
 
+    @classmethod
+    def _get_type_format(cls, type_) -> TypeFormat:
+        schema = marvin.utilities.types.type_to_schema(type_)
+        format = (
+            "A valid JSON object that satisfies this OpenAPI schema:"
+            f" ```{json.dumps(schema)}```. The JSON object will be coerced to"
+            f" the following type signature: ```{format_type_str(type_)}```."
+            " Make sure your response is valid JSON, which means you must use"
+            " lists instead of tuples or sets; literal `true` and `false`"
+            " instead of `True` and `False`; literal `null` instead of `None`;"
+            " and double quotes instead of single quotes."
+        )
+        return TypeFormat(schema=schema, format=format)
+
     def get_type(self) -> Union[type, GenericAlias]:
         if self._cached_type is not SENTINEL:
             return self._cached_type
@@ -123,6 +173,14 @@ class TypeFormatter(ResponseFormatter):
         else:
             return type_(response)
 
+    def repair_response(self, response: str) -> str:
+        type_ = self.get_type()
+        if isinstance(type_, GenericAlias) or safe_issubclass(
+            type_, (list, dict, set, tuple)
+        ):
+            return repair_json(response)
+        return repair_scalar(response)
+
 
 class PydanticFormatter(ResponseFormatter):
     # store the model as a private attribute so that we don't have to parse the
@@ -145,21 +203,23 @@ class PydanticFormatter(ResponseFormatter):
                     f"Expected a BaseModel or nested BaseModel, got {model}"
                 )
 
-            schema = marvin.utilities.types.type_to_schema(model)
-
-            kwargs.update(
-                type_schema=schema,
-                format=(
-                    "A JSON object that satisfies the following OpenAPI schema:"
-                    f" ```{json.dumps(schema)}```"
-                ),
-            )
+            type_format = get_type_format(type(self), model)
+            kwargs.update(type_schema=type_format.schema, format=type_format.format)
 
         super().__init__(**kwargs)
 
         if model is not None:
             self._cached_model = model
 
+    @classmethod
+    def _get_type_format(cls, model) -> TypeFormat:
+        schema = marvin.utilities.types.type_to_schema(model)
+        format = (
+            "A JSON object that satisfies the following OpenAPI schema:"
+            f" ```{json.dumps(schema)}```"
+        )
+        return TypeFormat(schema=schema, format=format)
+
     def get_model(self) -> pydantic.BaseModel:
         if self._cached_model != SENTINEL:
             return self._cached_model
@@ -170,6 +230,9 @@ class PydanticFormatter(ResponseFormatter):
     def parse_response(self, response):
         return pydantic.parse_raw_as(self.get_model(), response)
 
+    def repair_response(self, response: str) -> str:
+        return repair_json(response)
+
 
 def load_formatter_from_shorthand(shorthand_response_format) -> ResponseFormatter:
     if shorthand_response_format is None:
@@ -189,3 +252,151 @@ def load_formatter_from_shorthand(shorthand_response_format) -> ResponseFormatte
         return TypeFormatter(type_=shorthand_response_format)
     else:
         raise ValueError("Invalid output format")
+
+
+def strip_code_fences(text: str) -> str:
+    """
+    Returns the contents of the first markdown code block in the text, or the
+    text itself if it doesn't have one.
+    """
+    match = CODE_FENCE_REGEX.search(text)
+    return match.group(1) if match else text
+
+
+def extract_json(text: str) -> str:
+    """
+    Returns the outermost JSON object or array in the text, ignoring any text
+    around it. Brackets inside (single- or double-quoted) strings are ignored.
+    If the text doesn't contain a complete object or array, it is returned
+    unchanged.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    start = min(starts)
+
+    depth = 0
+    quote = None
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+    return text
+
+
+def repair_json(text: str) -> str:
+    """
+    Repairs common mistakes in JSON written by an LLM and returns a valid JSON
+    string, or raises a `ValueError`. In order, this:
+        - strips markdown code fences
+        - extracts the outermost JSON object or array from any surrounding text
+        - converts Python literals (`True`, `None`, single-quoted strings,
+          tuples, and so on) to JSON
+        - drops trailing commas
+    """
+    candidate = extract_json(strip_code_fences(text).strip())
+
+    try:
+        json.loads(candidate)
+        return candidate
+    except ValueError:
+        pass
+
+    # the candidate may be a Python literal
+    try:
+        return json.dumps(ast.literal_eval(candidate), default=_json_default)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        pass
+
+    # otherwise, fix the candidate token by token
+    fixed = _fix_json_tokens(candidate)
+    json.loads(fixed)
+    return fixed
+
+
+def repair_scalar(text: str) -> str:
+    """
+    Repairs a response that should contain a single scalar value, such as a
+    number or a string, by removing code fences, surrounding quotes, and
+    thousands separators from numbers.
+    """
+    text = strip_code_fences(text).strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, str):
+            text = value.strip()
+    except ValueError:
+        pass
+    if THOUSANDS_REGEX.match(text):
+        text = text.replace(",", "")
+    return text
+
+
+def _json_default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _fix_json_tokens(text: str) -> str:
+    """
+    Rewrites a JSON-like string outside of its string literals: single-quoted
+    strings become double-quoted, Python constants become JSON constants,
+    parentheses become brackets, and trailing commas are dropped.
+    """
+    result = []
+    quote = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote is not None:
+            if char == "\\" and i + 1 < len(text):
+                next_char = text[i + 1]
+                # \' is not a valid JSON escape
+                result.append("'" if next_char == "'" else char + next_char)
+                i += 2
+                continue
+            elif char == quote:
+                result.append('"')
+                quote = None
+            elif char == '"':
+                result.append('\\"')
+            else:
+                result.append(char)
+        elif char in "\"'":
+            result.append('"')
+            quote = char
+        elif char.isalpha() or char == "_":
+            j = i
+            while j < len(text) and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            result.append(PYTHON_LITERALS.get(word, word))
+            i = j
+            continue
+        elif char == "(":
+            result.append("[")
+        elif char == ")":
+            result.append("]")
+        elif char == ",":
+            rest = text[i + 1 :].lstrip()
+            if not rest or rest[0] not in "}])":
+                result.append(char)
+        else:
+            result.append(char)
+        i += 1
+    return "".join(result)
@@ -0,0 +1,196 @@
+import json
+from typing import Any, Optional
+
+# the longest text that may precede a JSON response; shorter preambles (like
+# code fences) are removed when the response is repaired
+MAX_PREAMBLE_LENGTH = 200
+JSON_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONObjectScanner:
+    """
+    Incrementally scans streamed text for top-level JSON objects.
+
+    Text is fed to the scanner as it arrives. Every call to `feed` returns the
+    (start, end) character spans of any top-level `{...}` objects that were
+    completed by the new text. Braces that appear inside JSON strings are
+    ignored, as is any text (including quotes) outside of an object.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start: Optional[int] = None
+
+    @property
+    def open_object_start(self) -> Optional[int]:
+        """
+        The character index of the top-level object that is currently open, if
+        any.
+        """
+        return self._start
+
+    def feed(self, chunk: str) -> list[tuple[int, int]]:
+        offset = len(self.text)
+        self.text += chunk
+        completed = []
+
+        for i, char in enumerate(chunk, start=offset):
+            if self._start is None:
+                if char == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append((self._start, i + 1))
+                    self._start = None
+
+        return completed
+
+
+class StreamingJSONParser:
+    """
+    Incrementally parses a JSON object or array from streamed text, so that a
+    response can be checked (and partially used) before it is complete.
+
+    Text before the value starts is skipped. `error` is set as soon as the text
+    can no longer produce a value of the `expected_type` ("object" or "array",
+    or None for either): if the value has the wrong type or its brackets don't
+    match. If a type is expected, the value must also start within
+    `max_preamble` characters; otherwise the response may be a JSON string or
+    scalar, which is left to the formatter to validate. `partial()` returns the
+    value parsed so far.
+    """
+
+    def __init__(
+        self,
+        expected_type: Optional[str] = None,
+        max_preamble: int = MAX_PREAMBLE_LENGTH,
+    ):
+        self.expected_type = expected_type
+        self.max_preamble = max_preamble
+        self.text = ""
+        self.error: Optional[str] = None
+        # the span of the value in the text
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = False
+        self._string_is_key = False
+        # the end of the last complete element, and the brackets that close
+        # the value at that point
+        self._safe_end: Optional[int] = None
+        self._safe_closers = ""
+        self._partial = None
+        self._partial_text = None
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str):
+        offset = len(self.text)
+        self.text += chunk
+        if self.error is not None or self.end is not None:
+            return
+
+        for i, char in enumerate(chunk, start=offset):
+            if self.start is None:
+                self._find_start(i, char)
+                if self.error is not None:
+                    return
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._mark_safe(i + 1)
+            elif char == '"':
+                self._in_string = True
+                self._string_is_key = self._expect_key
+            elif char in JSON_CLOSERS:
+                self._stack.append(char)
+                self._expect_key = char == "{"
+                self._mark_safe(i + 1)
+            elif char in "}]":
+                if JSON_CLOSERS[self._stack.pop()] != char:
+                    self.error = f"Unexpected {char!r} at position {i}"
+                    return
+                self._expect_key = False
+                self._mark_safe(i + 1)
+                if not self._stack:
+                    self.end = i + 1
+                    return
+            elif char == ",":
+                self._mark_safe(i)
+                self._expect_key = self._stack[-1] == "{"
+            elif char == ":":
+                self._expect_key = False
+
+    def _find_start(self, i: int, char: str):
+        if char in JSON_CLOSERS:
+            found_type = "object" if char == "{" else "array"
+            if self.expected_type not in (None, found_type):
+                self.error = (
+                    f"Expected a JSON {self.expected_type}, got an {found_type}"
+                )
+                return
+            self.start = i
+            self._stack.append(char)
+            self._expect_key = char == "{"
+            self._mark_safe(i + 1)
+        elif self.expected_type is not None and i >= self.max_preamble:
+            self.error = (
+                f"Expected a JSON {self.expected_type or 'value'}, got text:"
+                f" {self.text[:20]!r}..."
+            )
+
+    def _mark_safe(self, end: int):
+        self._safe_end = end
+        self._safe_closers = "".join(JSON_CLOSERS[c] for c in reversed(self._stack))
+
+    def partial(self) -> Any:
+        """
+        Returns the value parsed so far, with any open strings, arrays, and
+        objects closed, or None if the value hasn't started. Incomplete numbers
+        and keywords are left out until they are complete.
+        """
+        if self.start is None:
+            return None
+        if self.end is not None:
+            text = self.text[self.start : self.end]
+        elif self._in_string and not self._string_is_key and not self._escaped:
+            closers = "".join(JSON_CLOSERS[c] for c in reversed(self._stack))
+            text = self.text[self.start :] + '"' + closers
+        else:
+            text = self.text[self.start : self._safe_end] + self._safe_closers
+
+        if text != self._partial_text:
+            try:
+                self._partial = json.loads(text)
+                self._partial_text = text
+            except json.JSONDecodeError:
+                # keep the last value that could be parsed
+                pass
+        return self._partial
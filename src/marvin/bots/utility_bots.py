@@ -3,20 +3,14 @@ from typing import Callable
 
 from pydantic import Field
 
-import marvin
 from marvin import Bot
 from marvin.bots.history import History, InMemoryHistory
+from marvin.infra.llms import OpenAIChat
 from marvin.plugins.base import Plugin
 
 
 def utility_llm():
-    from langchain.chat_models import ChatOpenAI
-
-    return ChatOpenAI(
-        model_name="gpt-3.5-turbo",
-        temperature=0,
-        openai_api_key=marvin.settings.openai_api_key.get_secret_value(),
-    )
+    return OpenAIChat(model_name="gpt-3.5-turbo", temperature=0)
 
 
 class UtilityBot(Bot):
@@ -151,13 +145,7 @@ condition_met_bot = UtilityBot(
 
 
 def creative_llm():
-    from langchain.chat_models import ChatOpenAI
-
-    return ChatOpenAI(
-        model_name=marvin.settings.openai_model_name,
-        temperature=0.8,
-        openai_api_key=marvin.settings.openai_api_key.get_secret_value(),
-    )
+    return OpenAIChat(temperature=0.8)
 
 
 mattgpt = Bot(
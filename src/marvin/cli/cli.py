@@ -10,6 +10,7 @@ from rich.prompt import Prompt
 
 import marvin
 from marvin.bots.utility_bots import get_utility_bot
+from marvin.infra.llms import OpenAIChat
 
 from .db import database_app
 from .server import server_app
@@ -96,8 +97,6 @@ def chat(
     if not marvin.settings.openai_api_key.get_secret_value():
         setup_openai()
 
-    from langchain.chat_models import ChatOpenAI
-
     if utility_bot and any([bot_to_load, name, personality, instructions, model]):
         raise ValueError(
             "You can't specify both `--utility-bot` and any of "
@@ -121,11 +120,7 @@ def chat(
             name=name,
             personality=personality,
             instructions=instructions,
-            llm=ChatOpenAI(
-                model_name=model or marvin.settings.openai_model_name,
-                temperature=marvin.settings.openai_model_temperature,
-                openai_api_key=marvin.settings.openai_api_key.get_secret_value(),
-            ),
+            llm=OpenAIChat(model_name=model),
         )
 
     asyncio.run(bot.interactive_chat(first_message=" ".join(message)))
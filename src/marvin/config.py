@@ -74,17 +74,92 @@ class Settings(BaseSettings):
     )
     rich_tracebacks: bool = Field(False, description="Enable rich traceback formatting")
 
+    # TRACING
+    tracing_enabled: bool = Field(
+        False,
+        description=(
+            "If True, bots record timing spans for each turn, which are attached to"
+            " their responses and sent to any trace sinks."
+        ),
+    )
+    # specify the path to a JSON lines file for traces, relative to the home dir
+    tracing_path: Optional[Path] = None
+
     # EMBEDDINGS
     # specify the path to the embeddings cache, relative to the home dir
     embeddings_cache_path: Path = Path("cache/embeddings.sqlite")
     embeddings_cache_warn_size: int = 4000000000  # 4GB
 
+    # LLM CACHE
+    llm_cache_enabled: bool = Field(
+        True,
+        description=(
+            "If True, LLM completions are cached when the LLM's temperature is 0."
+            " Completions with any other temperature are never cached."
+        ),
+    )
+    llm_cache_backend: Literal["memory", "sqlite", "redis"] = "memory"
+    # specify the path to the LLM cache, relative to the home dir
+    llm_cache_path: Path = Path("cache/llm.sqlite")
+    llm_cache_ttl: Optional[int] = Field(
+        60 * 60 * 24 * 7, description="Seconds before a cached completion expires."
+    )
+    llm_cache_max_size: Optional[int] = Field(
+        10000,
+        description=(
+            "The maximum number of completions to cache. Ignored by the redis backend."
+        ),
+    )
+
+    # RESPONSE FORMATS
+    # specify a directory for caching models generated from JSON schemas,
+    # relative to the home dir, or None to disable the cache
+    schema_cache_path: Optional[Path] = Path("cache/schemas")
+
+    # AI FUNCTION CACHE
+    # specify the path to the cache for `@ai_fn(cache=True)`, relative to the home dir
+    ai_fn_cache_path: Path = Path("cache/ai_fn.sqlite")
+    ai_fn_cache_ttl: Optional[int] = Field(
+        60 * 60 * 24 * 30,
+        description="Seconds before a cached AI function result expires.",
+    )
+    ai_fn_cache_max_size: Optional[int] = Field(
+        100000, description="The maximum number of AI function results to cache."
+    )
+
     # OPENAI
     openai_model_name: str = "gpt-3.5-turbo"
     openai_model_temperature: float = 0.8
     openai_api_key: SecretStr = Field(
         "", env=["MARVIN_OPENAI_API_KEY", "OPENAI_API_KEY"]
     )
+    openai_api_base: str = Field(
+        "https://api.openai.com/v1",
+        env=["MARVIN_OPENAI_API_BASE", "OPENAI_API_BASE"],
+        description="The base URL of the OpenAI API, or a compatible API.",
+    )
+    openai_timeout: float = Field(
+        600, description="The timeout for OpenAI requests, in seconds."
+    )
+    openai_http2: bool = Field(True, description="Use HTTP/2 for OpenAI requests.")
+    openai_max_connections: int = Field(
+        100,
+        description="The maximum number of pooled connections to the OpenAI API.",
+    )
+    openai_requests_per_minute: Optional[int] = Field(
+        3500,
+        description=(
+            "The OpenAI request rate limit to respect when sending batches of"
+            " requests. Set to None to disable."
+        ),
+    )
+    openai_tokens_per_minute: Optional[int] = Field(
+        90000,
+        description=(
+            "The OpenAI token rate limit to respect when sending batches of"
+            " requests. Set to None to disable."
+        ),
+    )
 
     # CHROMA
     chroma: ChromaSettings = Field(default_factory=ChromaSettings)
@@ -100,6 +175,24 @@ class Settings(BaseSettings):
     # DOCUMENTS
     default_topic = "marvin"
     default_n_keywords: int = 15
+    keyword_extraction_concurrency: Optional[int] = Field(
+        None,
+        description=(
+            "The maximum number of keyword extraction jobs to run in worker"
+            " processes at once. Defaults to the number of CPUs."
+        ),
+    )
+    keyword_extraction_batch_size: int = Field(
+        32, description="The number of texts sent to a worker in each job."
+    )
+    keyword_extraction_min_process_length: int = Field(
+        200,
+        description=(
+            "Keywords are extracted from texts shorter than this many characters"
+            " in the current process, which is faster than sending them to a"
+            " worker."
+        ),
+    )
 
     # DATABASE
     database_echo: bool = False
@@ -107,6 +200,14 @@ class Settings(BaseSettings):
         "sqlite+aiosqlite:////$MARVIN_HOME/marvin.sqlite"
     )
 
+    history_write_behind: bool = Field(
+        False,
+        description=(
+            "If True, thread messages are buffered in memory and written to the"
+            " database in batches in the background."
+        ),
+    )
+
     # GITHUB
     GITHUB_TOKEN: SecretStr = Field("", env=["MARVIN_GITHUB_TOKEN", "GITHUB_TOKEN"])
 
@@ -122,6 +223,20 @@ class Settings(BaseSettings):
         ),
     )
     bot_max_iterations: int = 10
+    bot_completion_tokens: int = Field(
+        1000,
+        description=(
+            "The number of tokens of each model's context window to reserve for the"
+            " bot's response. The rest is shared by the prompt and the history."
+        ),
+    )
+    bot_plugin_timeout: float = Field(
+        60,
+        description=(
+            "The default number of seconds to wait for a plugin to finish. Plugins"
+            " can override this with their own `timeout`."
+        ),
+    )
     bot_load_default_plugins: bool = Field(
         True,
         description=(
@@ -150,6 +265,19 @@ class Settings(BaseSettings):
             )
         values["embeddings_cache_path"].parent.mkdir(parents=True, exist_ok=True)
 
+        # prefix HOME to LLM cache path
+        if not values["llm_cache_path"].is_absolute():
+            values["llm_cache_path"] = values["home"] / values["llm_cache_path"]
+        if not values["ai_fn_cache_path"].is_absolute():
+            values["ai_fn_cache_path"] = values["home"] / values["ai_fn_cache_path"]
+        if (
+            values["schema_cache_path"]
+            and not values["schema_cache_path"].is_absolute()
+        ):
+            values["schema_cache_path"] = values["home"] / values["schema_cache_path"]
+        if values["tracing_path"] and not values["tracing_path"].is_absolute():
+            values["tracing_path"] = values["home"] / values["tracing_path"]
+
         if CHROMA_INSTALLED:
             # prefix HOME to chroma path
             chroma_persist_directory = Path(values["chroma"]["persist_directory"])
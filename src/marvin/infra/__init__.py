@@ -1 +1 @@
-from . import db, chroma
+from . import db, chroma, cache, llms
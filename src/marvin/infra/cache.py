@@ -0,0 +1,254 @@
+import abc
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+
+import marvin
+from marvin.utilities.async_utils import run_async
+
+
+class Cache(abc.ABC):
+    """
+    A key-value store for cached string values (for example, LLM completions).
+
+    Entries expire `ttl` seconds after they are written, and the least
+    recently used entries are evicted once the cache holds more than
+    `max_size` entries. Either limit can be disabled by setting it to `None`.
+
+    Every cache keeps hit and miss counters, which are reported by `stats()`.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        await self._set(key, value)
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses)
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl is not None else None
+
+    @abc.abstractmethod
+    async def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def _set(self, key: str, value: str):
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def clear(self):
+        raise NotImplementedError()
+
+
+class InMemoryCache(Cache):
+    """
+    An LRU cache that lives in the current process.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self._data: OrderedDict[str, tuple[str, Optional[float]]] = OrderedDict()
+
+    async def _get(self, key: str) -> Optional[str]:
+        if key not in self._data:
+            return None
+        value, expires_at = self._data[key]
+        if expires_at is not None and expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value: str):
+        self._data[key] = (value, self._expires_at())
+        self._data.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    async def clear(self):
+        self._data.clear()
+
+
+class SQLiteCache(Cache):
+    """
+    A cache that persists entries in a SQLite database, so they can be shared
+    between processes and survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: Optional[float] = None,
+        max_size: Optional[int] = None,
+    ):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT"
+                " NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache__accessed_at ON cache"
+                " (accessed_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # commits on success and rolls back on error
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def _set_sync(self, key: str, value: str):
+        with self._connect() as conn:
+            conn.execute(
+                (
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)"
+                ),
+                (key, value, self._expires_at(), time.time()),
+            )
+            conn.execute(
+                "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+                (time.time(),),
+            )
+            if self.max_size is not None:
+                conn.execute(
+                    (
+                        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY"
+                        " accessed_at DESC LIMIT -1 OFFSET ?)"
+                    ),
+                    (self.max_size,),
+                )
+
+    def _clear_sync(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await run_async(self._get_sync, key)
+
+    async def _set(self, key: str, value: str):
+        await run_async(self._set_sync, key, value)
+
+    async def clear(self):
+        await run_async(self._clear_sync)
+
+
+class RedisCache(Cache):
+    """
+    A cache backed by Redis. Entries expire via Redis TTLs; size-based eviction
+    is left to the server's `maxmemory-policy`, so `max_size` is ignored.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl: Optional[float] = None,
+        max_size: Optional[int] = None,
+        prefix: str = "marvin:cache:",
+    ):
+        try:
+            import redis.asyncio as redis
+        except ModuleNotFoundError:
+            raise ImportError(
+                "Marvin tried to import redis, but it is not installed. Please"
+                " install it with `pip install marvin[redis]`"
+            )
+        super().__init__(ttl=ttl, max_size=max_size)
+        self.prefix = prefix
+        self.client = redis.from_url(url, decode_responses=True)
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await self.client.get(f"{self.prefix}{key}")
+
+    async def _set(self, key: str, value: str):
+        ttl = int(self.ttl) if self.ttl is not None else None
+        await self.client.set(f"{self.prefix}{key}", value, ex=ttl)
+
+    async def clear(self):
+        async for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            await self.client.delete(key)
+
+
+@lru_cache
+def get_llm_cache() -> Cache:
+    """
+    Returns the cache for LLM completions, as configured by the `llm_cache_*`
+    settings. The cache is created on first use.
+    """
+    settings = marvin.settings
+    if settings.llm_cache_backend == "memory":
+        return InMemoryCache(
+            ttl=settings.llm_cache_ttl, max_size=settings.llm_cache_max_size
+        )
+    elif settings.llm_cache_backend == "sqlite":
+        return SQLiteCache(
+            path=settings.llm_cache_path,
+            ttl=settings.llm_cache_ttl,
+            max_size=settings.llm_cache_max_size,
+        )
+    elif settings.llm_cache_backend == "redis":
+        if not settings.redis_connection_url.get_secret_value():
+            raise ValueError(
+                "The redis LLM cache requires `MARVIN_REDIS_CONNECTION_URL` to be set."
+            )
+        return RedisCache(
+            url=settings.redis_connection_url.get_secret_value(),
+            ttl=settings.llm_cache_ttl,
+        )
+    else:
+        raise ValueError(f"Unknown LLM cache backend: {settings.llm_cache_backend}")
+
+
+@lru_cache
+def get_ai_fn_cache() -> Cache:
+    """
+    Returns the on-disk cache for AI functions created with
+    `@ai_fn(cache=True)`, as configured by the `ai_fn_cache_*` settings.
+    """
+    settings = marvin.settings
+    return SQLiteCache(
+        path=settings.ai_fn_cache_path,
+        ttl=settings.ai_fn_cache_ttl,
+        max_size=settings.ai_fn_cache_max_size,
+    )
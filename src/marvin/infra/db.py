@@ -1,9 +1,9 @@
-import asyncio
 import inspect
 from contextlib import asynccontextmanager
 from functools import wraps
 from typing import AsyncGenerator, Callable, Literal
 
+import sqlalchemy as sa
 import sqlmodel
 from sqlalchemy.dialects.postgresql import JSONB as postgres_JSONB
 from sqlalchemy.dialects.sqlite import JSON as sqlite_JSON
@@ -12,6 +12,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 import marvin
+from marvin.utilities.async_utils import run_sync
 
 engine_kwargs = {}
 # sqlite doesn't support pool configuration
@@ -135,17 +136,43 @@ async def reset_db(confirm: bool = False):
     await create_db()
 
 
+def add_missing_columns(conn: sa.engine.Connection):
+    """
+    Add nullable columns that are missing from existing tables, so databases
+    created before the columns were added to the models can still be used.
+    """
+    inspector = sa.inspect(conn)
+    for table in sqlmodel.SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(
+                sa.text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}"'
+                    f" {column_type}"
+                )
+            )
+            marvin.get_logger("db").debug(
+                f"Column {column.name!r} added to table {table.name!r}."
+            )
+
+
 def create_sqlite_db_if_doesnt_exist():
     async def _create_sqlite_db_if_doesnt_exist():
         def has_table(conn):
-            import sqlalchemy as _sa
-
-            inspector = _sa.inspect(conn)
+            inspector = sa.inspect(conn)
             return inspector.has_table("bot_config")
 
         if get_dialect() == "sqlite":
-            async with engine.connect() as conn:
-                if not await conn.run_sync(has_table):
-                    await create_db()
-
-    asyncio.run(_create_sqlite_db_if_doesnt_exist())
+            async with engine.begin() as conn:
+                exists = await conn.run_sync(has_table)
+                if exists:
+                    await conn.run_sync(add_missing_columns)
+            if not exists:
+                await create_db()
+
+    run_sync(_create_sqlite_db_if_doesnt_exist())
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import weakref
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+import httpx
+from openai.error import (
+    APIError,
+    AuthenticationError,
+    InvalidRequestError,
+    RateLimitError,
+    ServiceUnavailableError,
+)
+from openai.error import PermissionError as OpenAIPermissionError
+
+import marvin
+
+if TYPE_CHECKING:
+    from marvin.models.threads import Message
+
+OPENAI_ROLES = {"system": "system", "ai": "assistant", "user": "user"}
+
+# context window sizes, in tokens, by model name prefix (longest prefix wins)
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-3.5-turbo-16k": 16384,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# shared HTTP clients, keyed by event loop
+_http_clients = weakref.WeakKeyDictionary()
+
+
+def get_context_window(model_name: Optional[str]) -> int:
+    """
+    Returns the size of a model's context window, in tokens. Unknown models are
+    assumed to have a window of `DEFAULT_CONTEXT_WINDOW` tokens.
+    """
+    if model_name:
+        matches = [
+            prefix for prefix in CONTEXT_WINDOWS if model_name.startswith(prefix)
+        ]
+        if matches:
+            return CONTEXT_WINDOWS[max(matches, key=len)]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the HTTP client shared by all LLMs in the running event loop.
+
+    httpx clients can't be shared between event loops, so each loop gets its
+    own keep-alive connection pool, which is created on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=marvin.settings.openai_http2,
+            limits=httpx.Limits(
+                max_connections=marvin.settings.openai_max_connections,
+                max_keepalive_connections=marvin.settings.openai_max_connections,
+            ),
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """
+    Closes the HTTP client for the running event loop, if it was created.
+    """
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class OpenAIChat:
+    """
+    An async client for OpenAI's chat completions API, or any API that is
+    compatible with it.
+
+    All clients share a pooled HTTP client (see `get_http_client`), so creating
+    one is cheap. Unless they are provided, the model, temperature, API key,
+    base URL, and timeout are loaded from settings.
+    """
+
+    def __init__(
+        self,
+        model_name: str = None,
+        temperature: float = None,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: float = None,
+        http_client: httpx.AsyncClient = None,
+    ):
+        settings = marvin.settings
+        self.model_name = model_name or settings.openai_model_name
+        self.temperature = (
+            temperature
+            if temperature is not None
+            else settings.openai_model_temperature
+        )
+        self.api_key = api_key or settings.openai_api_key.get_secret_value()
+        self.base_url = (base_url or settings.openai_api_base).rstrip("/")
+        self.timeout = timeout if timeout is not None else settings.openai_timeout
+        self.http_client = http_client
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(model_name={self.model_name!r},"
+            f" temperature={self.temperature!r}, base_url={self.base_url!r})"
+        )
+
+    async def __call__(self, messages: list["Message"], stop: list[str] = None) -> str:
+        return await self.acomplete(messages=messages, stop=stop)
+
+    def _build_request(
+        self, messages: list["Message"], stop: Optional[list[str]], stream: bool
+    ) -> httpx.Request:
+        client = self.http_client or get_http_client()
+        body = dict(
+            model=self.model_name,
+            temperature=self.temperature,
+            messages=[
+                {"role": OPENAI_ROLES[msg.role], "content": msg.content}
+                for msg in messages
+            ],
+        )
+        if stop:
+            body["stop"] = stop
+        if stream:
+            body["stream"] = True
+        return client.build_request(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json=body,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=self.timeout,
+        )
+
+    async def acomplete(self, messages: list["Message"], stop: list[str] = None) -> str:
+        """
+        Send messages to the LLM and return its response.
+        """
+        client = self.http_client or get_http_client()
+        response = await client.send(
+            self._build_request(messages=messages, stop=stop, stream=False)
+        )
+        _raise_for_status(response)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def astream(
+        self, messages: list["Message"], stop: list[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Send messages to the LLM and yield its response as it is generated.
+        """
+        client = self.http_client or get_http_client()
+        response = await client.send(
+            self._build_request(messages=messages, stop=stop, stream=True),
+            stream=True,
+        )
+        try:
+            if not response.is_success:
+                await response.aread()
+                _raise_for_status(response)
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if token := chunk["choices"][0]["delta"].get("content"):
+                    yield token
+        finally:
+            await response.aclose()
+
+
+def _raise_for_status(response: httpx.Response):
+    """
+    Raise the `openai` error that corresponds to an unsuccessful response, so
+    errors are the same whichever client is used.
+    """
+    if response.is_success:
+        return
+
+    try:
+        json_body = response.json()
+        error = json_body["error"]
+        message = error["message"]
+    except Exception:
+        json_body, error, message = None, {}, response.text
+
+    kwargs = dict(
+        http_body=response.text,
+        http_status=response.status_code,
+        json_body=json_body,
+        headers=dict(response.headers),
+    )
+    status = response.status_code
+    if status == 429:
+        raise RateLimitError(message, **kwargs)
+    elif status in (400, 404, 409, 422):
+        raise InvalidRequestError(message, error.get("param"), **kwargs)
+    elif status == 401:
+        raise AuthenticationError(message, **kwargs)
+    elif status == 403:
+        raise OpenAIPermissionError(message, **kwargs)
+    elif status == 503:
+        raise ServiceUnavailableError(message, **kwargs)
+    else:
+        raise APIError(message, **kwargs)
@@ -1,7 +1,10 @@
 import asyncio
 from abc import ABC, abstractmethod
 
+from pydantic import Field
+
 import marvin
+from marvin.models.chunkers import Chunker, TokenChunker
 from marvin.models.documents import Document
 from marvin.utilities.collections import batched
 from marvin.utilities.types import LoggerMixin, MarvinBaseModel
@@ -10,6 +13,11 @@ from marvin.utilities.types import LoggerMixin, MarvinBaseModel
 class Loader(MarvinBaseModel, LoggerMixin, ABC):
     """A base class for loaders."""
 
+    chunker: Chunker = Field(
+        default_factory=TokenChunker,
+        description="The strategy for splitting loaded documents into excerpts.",
+    )
+
     @abstractmethod
     async def load(self) -> list[Document]:
         pass
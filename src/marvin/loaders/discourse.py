@@ -73,7 +73,7 @@ class DiscourseLoader(Loader):
                         link=post.url,
                         created_at=post.created_at.timestamp(),
                     ),
-                ).to_excerpts()
+                ).to_excerpts(chunker=self.chunker)
             )
         return documents
 
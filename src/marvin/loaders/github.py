@@ -13,6 +13,7 @@ from pydantic import BaseModel, Field, validator
 
 import marvin
 from marvin.loaders.base import Loader
+from marvin.models.chunkers import Chunker, CodeChunker
 from marvin.models.documents import Document
 from marvin.models.metadata import Metadata
 from marvin.utilities.collections import multi_glob
@@ -192,7 +193,7 @@ class GitHubIssueLoader(Loader):
                 await Document(
                     text=text,
                     metadata=metadata,
-                ).to_excerpts()
+                ).to_excerpts(chunker=self.chunker)
             )
         return documents
 
@@ -203,6 +204,7 @@ class GitHubRepoLoader(Loader):
     source_type: str = "github source code"
 
     repo: str = Field(...)
+    chunker: Chunker = Field(default_factory=CodeChunker)
     include_globs: list[str] = Field(default=None)
     exclude_globs: list[str] = Field(default=None)
 
@@ -253,6 +255,6 @@ class GitHubRepoLoader(Loader):
                     await Document(
                         text=await read_file_with_chardet(Path(tmp_dir) / file),
                         metadata=metadata,
-                    ).to_excerpts()
+                    ).to_excerpts(chunker=self.chunker)
                 )
             return documents
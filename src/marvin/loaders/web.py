@@ -49,7 +49,7 @@ class URLLoader(WebLoader):
             if isinstance(d, Exception):
                 self.logger.error(d)
             elif d is not None:
-                final_documents.extend(await d.to_excerpts())
+                final_documents.extend(await d.to_excerpts(chunker=self.chunker))
         return final_documents
 
     async def load_url(self, url, client) -> Optional[Document]:
@@ -107,6 +107,7 @@ class SitemapLoader(URLLoader):
                     urls=url_batch,
                     headers=await self.get_headers(),
                     document_type=self.document_type,
+                    chunker=self.chunker,
                 )
                 for url_batch in marvin.utilities.collections.batched(urls, 10)
             ]
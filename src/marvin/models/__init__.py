@@ -1,4 +1,4 @@
 from marvin.utilities.types import MarvinBaseModel
 from .base import BaseSQLModel, DBModel
 
-from . import ids, threads, topics, bots, documents
+from . import ids, threads, topics, bots, chunkers, documents
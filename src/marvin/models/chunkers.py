@@ -0,0 +1,261 @@
+import abc
+import bisect
+import re
+
+from pydantic import Field, confloat
+
+from marvin.utilities.strings import CODE_FENCE, index_headers, split_text
+from marvin.utilities.tokenizer import count_tokens
+from marvin.utilities.types import DiscriminatedUnionType
+
+# a blank line followed by a line that starts a new top-level block; blank
+# lines inside indented code (like function bodies) don't match
+BLOCK_BOUNDARY = re.compile(r"\n[ \t]*\n(?=[^\s)\]}])")
+
+# a span of text: its start and end character indices, and its tokens
+Span = tuple[int, int, int]
+
+
+class Chunker(DiscriminatedUnionType, abc.ABC):
+    """
+    Splits a document's text into chunks, which become its excerpts.
+    """
+
+    chunk_tokens: int = Field(
+        200, description="The target number of tokens in each chunk."
+    )
+
+    @abc.abstractmethod
+    def split(self, text: str) -> list[tuple[str, int]]:
+        """
+        Returns each chunk of the text and the character index where it starts.
+        """
+        pass
+
+
+class TokenChunker(Chunker):
+    """
+    Splits text into fixed-size, overlapping windows of tokens.
+    """
+
+    overlap: confloat(ge=0, le=1) = Field(
+        0.1, description="The fraction of overlap between chunks."
+    )
+
+    def split(self, text: str) -> list[tuple[str, int]]:
+        return split_text(
+            text,
+            chunk_size=self.chunk_tokens,
+            chunk_overlap=self.overlap,
+            return_index=True,
+        )
+
+
+class RecursiveChunker(Chunker):
+    """
+    Splits text at the first separator that makes its pieces small enough
+    (paragraphs, then lines, sentences, and words), and packs consecutive
+    pieces into chunks of up to `chunk_tokens` tokens. Text with none of the
+    separators is split into token windows.
+    """
+
+    separators: list[str] = Field(
+        default_factory=lambda: ["\n\n", "\n", ". ", " "],
+        description="Separators to split at, from most to least preferred.",
+    )
+
+    def split(self, text: str) -> list[tuple[str, int]]:
+        return _pack(text, self._split_span(text, 0, len(text)), self.chunk_tokens)
+
+    def _split_span(
+        self, text: str, start: int, end: int, level: int = 0
+    ) -> list[Span]:
+        """
+        Split a span of the text into spans of at most `chunk_tokens` tokens.
+        """
+        tokens = count_tokens(text[start:end])
+        if tokens <= self.chunk_tokens:
+            return [(start, end, tokens)]
+        elif level == len(self.separators):
+            return _token_windows(text, start, end, self.chunk_tokens)
+
+        pieces = _split_after(text, start, end, self.separators[level])
+        spans = []
+        for piece_start, piece_end in pieces:
+            spans.extend(self._split_span(text, piece_start, piece_end, level + 1))
+        return spans
+
+
+class CodeChunker(RecursiveChunker):
+    """
+    Splits text at blank lines between top-level blocks, so fenced code blocks
+    and indented code, like function and class bodies, are never split. Each
+    block that contains code is kept whole, up to `max_chunk_tokens`; other
+    blocks are split like `RecursiveChunker`.
+    """
+
+    max_chunk_tokens: int = Field(
+        2000,
+        description=(
+            "Code blocks with more tokens than this are split at line boundaries,"
+            " so that excerpts can still be embedded."
+        ),
+    )
+
+    def split(self, text: str) -> list[tuple[str, int]]:
+        return _pack(text, self._split_blocks(text, 0, len(text)), self.chunk_tokens)
+
+    def _split_blocks(self, text: str, start: int, end: int) -> list[Span]:
+        spans = []
+        for block_start, block_end in _code_blocks(text, start, end):
+            block = text[block_start:block_end]
+            if not _contains_code(block):
+                spans.extend(self._split_span(text, block_start, block_end))
+                continue
+
+            tokens = count_tokens(block)
+            if tokens <= self.max_chunk_tokens:
+                spans.append((block_start, block_end, tokens))
+            else:
+                for line_start, line_end in _split_after(
+                    text, block_start, block_end, "\n"
+                ):
+                    spans.extend(self._split_span(text, line_start, line_end))
+        return spans
+
+
+class MarkdownChunker(CodeChunker):
+    """
+    Splits markdown into sections at its headers. Consecutive sections are
+    packed into chunks of up to `chunk_tokens` tokens, so each chunk starts at
+    a header; longer sections are split like `CodeChunker`.
+    """
+
+    def split(self, text: str) -> list[tuple[str, int]]:
+        offsets, _ = index_headers(text)
+        boundaries = sorted({0, *offsets, len(text)})
+        chunks = []
+        sections = []
+        for start, end in zip(boundaries, boundaries[1:]):
+            tokens = count_tokens(text[start:end])
+            if tokens <= self.chunk_tokens:
+                sections.append((start, end, tokens))
+            else:
+                chunks.extend(_pack(text, sections, self.chunk_tokens))
+                chunks.extend(
+                    _pack(text, self._split_blocks(text, start, end), self.chunk_tokens)
+                )
+                sections = []
+        chunks.extend(_pack(text, sections, self.chunk_tokens))
+        return chunks
+
+
+def _split_after(
+    text: str, start: int, end: int, separator: str
+) -> list[tuple[int, int]]:
+    """
+    Split a span of the text after each occurrence of a separator, so the
+    pieces cover the span exactly.
+    """
+    pieces = []
+    i = text.find(separator, start, end)
+    while i != -1:
+        pieces.append((start, i + len(separator)))
+        start = i + len(separator)
+        i = text.find(separator, start, end)
+    if start < end:
+        pieces.append((start, end))
+    return pieces
+
+
+def _token_windows(text: str, start: int, end: int, max_tokens: int) -> list[Span]:
+    """
+    Split a span of the text into consecutive windows of `max_tokens` tokens.
+    """
+    indices = [
+        start + index
+        for _, index in split_text(
+            text[start:end],
+            chunk_size=max_tokens,
+            chunk_overlap=0,
+            last_chunk_threshold=0,
+            return_index=True,
+        )
+    ]
+    bounds = list(zip(indices, indices[1:] + [end]))
+    return [(s, e, count_tokens(text[s:e])) for s, e in bounds if s < e]
+
+
+def _code_blocks(text: str, start: int, end: int) -> list[tuple[int, int]]:
+    """
+    Split a span of the text at blank lines that are followed by a top-level
+    line and aren't in a fenced code block.
+    """
+    fences = _fenced_blocks(text, start, end)
+    fence_starts = [s for s, _ in fences]
+    blocks = []
+    for match in BLOCK_BOUNDARY.finditer(text, start, end):
+        boundary = match.end()
+        # the last fence that starts before the boundary
+        i = bisect.bisect_left(fence_starts, boundary) - 1
+        if i < 0 or boundary >= fences[i][1]:
+            blocks.append((start, boundary))
+            start = boundary
+    if start < end:
+        blocks.append((start, end))
+    return blocks
+
+
+def _fenced_blocks(text: str, start: int, end: int) -> list[tuple[int, int]]:
+    """
+    Returns the spans of the fenced code blocks in a span of the text. A fence
+    that is never closed extends to the end of the span.
+    """
+    blocks = []
+    fence = fence_start = None
+    position = start
+    for line in text[start:end].splitlines(keepends=True):
+        match = CODE_FENCE.match(line)
+        if fence is None and match:
+            fence, fence_start = match.group(1), position
+        elif (
+            fence is not None
+            and match
+            and match.group(1)[0] == fence[0]
+            and len(match.group(1)) >= len(fence)
+            and not line[match.end() :].strip()
+        ):
+            blocks.append((fence_start, position + len(line)))
+            fence = None
+        position += len(line)
+    if fence is not None:
+        blocks.append((fence_start, end))
+    return blocks
+
+
+def _contains_code(block: str) -> bool:
+    return any(
+        CODE_FENCE.match(line) or (line[:1] in (" ", "\t") and line.strip())
+        for line in block.splitlines()
+    )
+
+
+def _pack(text: str, spans: list[Span], max_tokens: int) -> list[tuple[str, int]]:
+    """
+    Pack consecutive spans into chunks of up to `max_tokens` tokens. Spans with
+    more tokens become chunks of their own.
+    """
+    chunks = []
+    chunk_start = chunk_end = None
+    chunk_tokens = 0
+    for start, end, tokens in spans:
+        if chunk_start is not None and chunk_tokens + tokens > max_tokens:
+            chunks.append((text[chunk_start:chunk_end], chunk_start))
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start, chunk_tokens = start, 0
+        chunk_end = end
+        chunk_tokens += tokens
+    if chunk_start is not None:
+        chunks.append((text[chunk_start:chunk_end], chunk_start))
+    return chunks
@@ -7,15 +7,15 @@ from pydantic import Field, confloat, validator
 from typing_extensions import Literal
 
 import marvin
+from marvin.models.chunkers import Chunker, TokenChunker
 from marvin.models.ids import DocumentID
 from marvin.models.metadata import Metadata
 from marvin.utilities.strings import (
-    count_tokens,
     create_minimap_fn,
-    extract_keywords,
+    extract_keywords_many,
     jinja_env,
-    split_text,
 )
+from marvin.utilities.tokenizer import count_tokens
 from marvin.utilities.types import MarvinBaseModel
 
 DocumentType = Literal["original", "excerpt", "summary"]
@@ -45,23 +45,21 @@ async def _create_excerpt(
     text: str,
     index: int,
     excerpt_template: Template,
+    keywords: list[str],
+    minimap: Optional[str] = None,
     **extra_template_kwargs,
 ) -> "Document":
-    keywords = await extract_keywords(text)
-
-    minimap = (
-        create_minimap_fn(document.text)(index)
-        if document.metadata.link and document.metadata.link.endswith(".md")
-        else None
-    )
-
-    excerpt_text = excerpt_template.render(
+    template_kwargs = dict(
         document=document.copy_with_updates(type="excerpt"),
         excerpt_text=text,
         keywords=", ".join(keywords),
         minimap=minimap,
         **extra_template_kwargs,
     )
+    if excerpt_template.environment.is_async:
+        excerpt_text = await excerpt_template.render_async(**template_kwargs)
+    else:
+        excerpt_text = excerpt_template.render(**template_kwargs)
     excerpt_metadata = (
         document.metadata.copy_with_updates(document_type="excerpt")
         if document.metadata
@@ -122,6 +120,7 @@ class Document(MarvinBaseModel):
         excerpt_template: Template = None,
         chunk_tokens: int = 200,
         overlap: confloat(ge=0, le=1) = 0.1,
+        chunker: Chunker = None,
         **extra_template_kwargs,
     ) -> list["Document"]:
         """
@@ -132,17 +131,25 @@ class Document(MarvinBaseModel):
             excerpt_template: A jinja2 template to use for rendering the excerpt.
             chunk_tokens: The number of tokens to include in each excerpt.
             overlap: The fraction of overlap between each excerpt.
+            chunker: The strategy for splitting the text into excerpts. If
+                provided, `chunk_tokens` and `overlap` are ignored in favor of
+                the chunker's settings. Defaults to a `TokenChunker`.
 
         """
         if not excerpt_template:
             excerpt_template = EXCERPT_TEMPLATE
+        if chunker is None:
+            chunker = TokenChunker(chunk_tokens=chunk_tokens, overlap=overlap)
 
-        text_chunks = split_text(
-            text=self.text,
-            chunk_size=chunk_tokens,
-            chunk_overlap=overlap,
-            return_index=True,
-        )
+        text_chunks = chunker.split(self.text)
+
+        keywords = await extract_keywords_many([text for text, _ in text_chunks])
+
+        # the document's headers are indexed once for all excerpts
+        if self.metadata.link and self.metadata.link.endswith(".md"):
+            get_minimap = create_minimap_fn(self.text)
+        else:
+            get_minimap = None
 
         return await asyncio.gather(
             *[
@@ -151,6 +158,8 @@ class Document(MarvinBaseModel):
                     text=text,
                     index=i,
                     excerpt_template=excerpt_template,
+                    keywords=keywords[i],
+                    minimap=get_minimap(chr) if get_minimap else None,
                     **extra_template_kwargs,
                 )
                 for i, (text, chr) in enumerate(text_chunks)
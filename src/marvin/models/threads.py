@@ -23,6 +23,9 @@ class BaseMessage(MarvinBaseModel):
     timestamp: datetime.datetime = Field(default_factory=lambda: pendulum.now("utc"))
     bot_id: BotID = None
     data: dict = Field(default_factory=dict)
+    tokens: int = Field(
+        None, description="The number of tokens in the message's content."
+    )
 
 
 class Message(MarvinSQLModel, BaseMessage, table=True):
@@ -58,6 +61,9 @@ class MessageCreate(MarvinBaseModel):
     name: str = None
     bot_id: BotID = None
     data: dict = Field(default_factory=dict)
+    tokens: int = Field(
+        None, description="The number of tokens in the message's content."
+    )
 
 
 class MessageRead(MarvinBaseModel):
@@ -68,6 +74,9 @@ class MessageRead(MarvinBaseModel):
     timestamp: datetime.datetime
     bot_id: BotID = None
     data: dict = Field(default_factory=dict)
+    tokens: int = Field(
+        None, description="The number of tokens in the message's content."
+    )
 
 
 class UserMessageCreate(MessageCreate):
@@ -20,6 +20,14 @@ class Plugin(DiscriminatedUnionType):
             " to the docstring for the run() method."
         ),
     )
+    timeout: float = Field(
+        None,
+        description=(
+            "The number of seconds to wait for the plugin to finish before giving up."
+            " Defaults to `settings.bot_plugin_timeout`. Synchronous plugins run in"
+            " a thread, which is not cancelled when the plugin times out."
+        ),
+    )
     _signature: str = PrivateAttr()
 
     def __init__(self, **kwargs):
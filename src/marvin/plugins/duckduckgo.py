@@ -5,7 +5,8 @@ from duckduckgo_search import ddg, ddg_answers
 
 import marvin
 from marvin.plugins import Plugin
-from marvin.utilities.strings import html_to_content, slice_tokens
+from marvin.utilities.strings import html_to_content
+from marvin.utilities.tokenizer import slice_tokens
 
 
 async def safe_get(client, url):
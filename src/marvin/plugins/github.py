@@ -3,7 +3,7 @@ import httpx
 import marvin
 from marvin.loaders.github import GitHubIssue
 from marvin.plugins import plugin
-from marvin.utilities.strings import slice_tokens
+from marvin.utilities.tokenizer import slice_tokens
 
 
 @plugin
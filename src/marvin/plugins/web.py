@@ -2,7 +2,8 @@ import httpx
 from fastapi import status
 
 from marvin.plugins import Plugin
-from marvin.utilities.strings import html_to_content, slice_tokens
+from marvin.utilities.strings import html_to_content
+from marvin.utilities.tokenizer import slice_tokens
 
 
 class VisitURL(Plugin):
@@ -26,6 +26,11 @@ for router in routers:
     app.include_router(router)
 
 
+@app.on_event("shutdown")
+async def flush_history():
+    await marvin.bots.history.message_buffer.flush()
+
+
 @app.exception_handler(sa.exc.IntegrityError)
 async def integrity_error_handler(request: Request, exc: sa.exc.IntegrityError):
     logger.warning(exc)
@@ -1 +1,11 @@
-from . import logging, async_utils, types, strings, collections, models
+from . import (
+    logging,
+    async_utils,
+    types,
+    tokenizer,
+    strings,
+    collections,
+    models,
+    rate_limits,
+    tracing,
+)
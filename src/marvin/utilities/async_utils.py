@@ -2,13 +2,21 @@ import asyncio
 import concurrent.futures
 import functools
 import multiprocessing as mp
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
 
 import cloudpickle
 
 import marvin
 
+T = TypeVar("T")
+
 process_pool = concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context("fork"))
 
+# the event loop that runs coroutines for synchronous callers
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
 
 async def run_async(func, *args, **kwargs):
     loop = asyncio.get_event_loop()
@@ -27,3 +35,49 @@ async def run_async_process(func, *args, **kwargs):
     pickled_func = cloudpickle.dumps(functools.partial(func, *args, **kwargs))
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(process_pool, _cloudpickle_wrapper, pickled_func)
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns Marvin's background event loop, which runs forever in a daemon
+    thread. The loop is started on first use.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="marvin-event-loop", daemon=True
+            ).start()
+            _background_loop = loop
+    return _background_loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine from synchronous code and return its result.
+
+    The coroutine runs on Marvin's background event loop rather than a new one,
+    so it can be called from any thread, even one that is running its own event
+    loop (which is blocked until the coroutine finishes), and resources that
+    belong to an event loop, like HTTP connections, are reused between calls.
+    The caller's context variables are copied to the coroutine.
+    """
+    loop = get_background_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coro.close()
+        raise RuntimeError(
+            "run_sync() can't be called from Marvin's background event loop,"
+            " because it would wait for itself. Await the coroutine instead."
+        )
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    finally:
+        # if the caller was interrupted, stop the coroutine too
+        future.cancel()
@@ -0,0 +1,75 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously at `per_minute` tokens per minute,
+    holding at most one minute's worth of tokens.
+
+    Waiters are served in the order they arrive. A request for more tokens than
+    the bucket can hold waits for a full bucket instead of waiting forever.
+    """
+
+    def __init__(self, per_minute: float):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+
+class RateLimiter:
+    """
+    Schedules requests against requests-per-minute and tokens-per-minute
+    budgets. Either budget can be disabled by setting it to `None`.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int = 0):
+        """
+        Wait until a request that is expected to use `tokens` tokens can be sent.
+        """
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+
+def backoff_delay(
+    attempt: int, base_delay: float = 1.0, max_delay: float = 60.0
+) -> float:
+    """
+    Exponential backoff with full jitter: a random delay between 0 and
+    `base_delay * 2 ** attempt`, capped at `max_delay`.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
@@ -1,16 +1,28 @@
 import asyncio
+import bisect
+import os
 import re
 from functools import lru_cache
 from string import Formatter
-from typing import Any, Callable, Mapping, Sequence, Union
+from typing import Any, Callable, Iterator, Mapping, Sequence, Union
 
 import pendulum
-import tiktoken
 import xxhash
 from jinja2 import ChoiceLoader, Environment, StrictUndefined, select_autoescape
 
 import marvin
+from marvin.utilities.tokenizer import (  # noqa: F401
+    count_tokens,
+    detokenize,
+    get_encoding,
+    slice_tokens,
+    tokenize,
+)
 
+# markdown headers and code fences may be indented by up to three spaces
+ATX_HEADER = re.compile(r" {0,3}(#{1,6})(?:[ \t]|$)")
+SETEXT_UNDERLINE = re.compile(r" {0,3}(=+|-+)[ \t]*$")
+CODE_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
 MULTIPLE_NEWLINES = re.compile(r"\n{2,}")
 MULTIPLE_WHITESPACE = re.compile(r"[\t ]+")
 LINKS = re.compile(
@@ -36,10 +48,12 @@ jinja_env.globals.update(
     zip=zip,
     str=str,
     len=len,
-    arun=asyncio.run,
     pendulum=pendulum,
     dt=lambda: pendulum.now("UTC").to_day_datetime_string(),
 )
+# for templates that are rendered outside of async code, because
+# `Template.render` on `jinja_env` calls `asyncio.run`
+sync_jinja_env = jinja_env.overlay(enable_async=False)
 
 
 class StrictFormatter(Formatter):
@@ -64,25 +78,8 @@ def hash_text(*text: str) -> str:
 
 
 VERSION_NUMBERS = re.compile(r"\b\d+\.\d+(?:\.\d+)?\w*\b")
-
-
-def tokenize(text: str) -> list[int]:
-    tokenizer = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    return tokenizer.encode(text)
-
-
-def detokenize(tokens: list[int]) -> str:
-    tokenizer = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    return tokenizer.decode(tokens)
-
-
-def count_tokens(text: str) -> int:
-    return len(tokenize(text))
-
-
-def slice_tokens(text: str, n_tokens: int) -> str:
-    tokens = tokenize(text)
-    return detokenize(tokens[:n_tokens])
+# bytes that continue a multi-byte UTF-8 character
+UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
 
 
 def split_text(
@@ -91,7 +88,7 @@ def split_text(
     chunk_overlap: float = None,
     last_chunk_threshold: float = None,
     return_index: bool = False,
-) -> Union[str, tuple[str, int]]:
+) -> Union[list[str], list[tuple[str, int]]]:
     """
     Split a text into a list of strings. Chunks are split by tokens.
 
@@ -104,6 +101,31 @@ def split_text(
         return_index (bool): If True, return a tuple of (chunk, index) where
             index is the character index of the start of the chunk in the original text.
     """
+    return list(
+        iter_split_text(
+            text=text,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            last_chunk_threshold=last_chunk_threshold,
+            return_index=return_index,
+        )
+    )
+
+
+def iter_split_text(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: float = None,
+    last_chunk_threshold: float = None,
+    return_index: bool = False,
+) -> Iterator[Union[str, tuple[str, int]]]:
+    """
+    Like `split_text`, but yields each chunk as it is decoded, so very large
+    texts don't need to be held in memory as chunks all at once.
+
+    Character indices are computed in a single pass over the tokens' bytes, so
+    splitting takes linear time in the length of the text.
+    """
     if chunk_overlap is None:
         chunk_overlap = 0.1
     if chunk_overlap < 0 or chunk_overlap > 1:
@@ -111,99 +133,219 @@ def split_text(
     if last_chunk_threshold is None:
         last_chunk_threshold = 0.25
 
-    tokens = tokenize(text)
-
-    chunks = []
-    for i in range(0, len(tokens), chunk_size - int(chunk_overlap * chunk_size)):
-        chunks.append((tokens[i : i + chunk_size], len(detokenize(tokens[:i]))))
+    tokenizer = get_encoding()
+    tokens = tokenizer.encode(text)
+    starts = list(range(0, len(tokens), chunk_size - int(chunk_overlap * chunk_size)))
 
     # if the last chunk is too small, merge it with the previous chunk
-    if len(chunks) > 1 and len(chunks[-1][0]) < chunk_size * last_chunk_threshold:
-        chunks[-2][0].extend(chunks.pop(-1)[0])
-
-    if return_index:
-        return [(detokenize(chunk), index) for chunk, index in chunks]
-    else:
-        return [detokenize(chunk) for chunk, _ in chunks]
+    merged_start = None
+    if len(starts) > 1 and len(tokens) - starts[-1] < chunk_size * last_chunk_threshold:
+        merged_start = starts.pop()
+
+    n_chars = 0
+    previous_start = 0
+    for i, start in enumerate(starts):
+        chunk = tokens[start : start + chunk_size]
+        if merged_start is not None and i == len(starts) - 1:
+            chunk += tokens[merged_start : merged_start + chunk_size]
+        if return_index:
+            # count the characters that start in the tokens since the last
+            # chunk; a token that starts mid-character belongs to that character
+            n_chars += len(
+                tokenizer.decode_bytes(tokens[previous_start:start]).translate(
+                    None, UTF8_CONTINUATION_BYTES
+                )
+            )
+            previous_start = start
+            first_byte = tokenizer.decode_single_token_bytes(tokens[start])[0]
+            index = n_chars - 1 if first_byte in UTF8_CONTINUATION_BYTES else n_chars
+            yield tokenizer.decode(chunk), max(index, 0)
+        else:
+            yield tokenizer.decode(chunk)
 
 
-def _extract_keywords(text: str, n_keywords: int = None) -> list[str]:
+@lru_cache
+def _get_keyword_extractor(n_keywords: int):
     # deferred import
     import yake
 
-    kw = yake.KeywordExtractor(
+    # extractors are built once per process and reused by every job
+    return yake.KeywordExtractor(
         lan="en",
         n=1,
         dedupLim=0.9,
         dedupFunc="seqm",
         windowsSize=1,
-        top=n_keywords or marvin.settings.default_n_keywords,
+        top=n_keywords,
         features=None,
     )
+
+
+def _extract_keywords(text: str, n_keywords: int = None) -> list[str]:
+    kw = _get_keyword_extractor(n_keywords or marvin.settings.default_n_keywords)
     keywords = kw.extract_keywords(text)
     # return only keyword, not score
     return [k[0] for k in keywords]
 
 
+def _extract_keywords_batch(texts: list[str], n_keywords: int) -> list[list[str]]:
+    return [_extract_keywords(text, n_keywords=n_keywords) for text in texts]
+
+
 async def extract_keywords(text: str, n_keywords: int = None) -> list[str]:
-    # keyword extraction can take a while and is blocking
-    return await marvin.utilities.async_utils.run_async_process(
-        _extract_keywords, text=text, n_keywords=n_keywords
+    return (await extract_keywords_many([text], n_keywords=n_keywords))[0]
+
+
+async def extract_keywords_many(
+    texts: list[str],
+    n_keywords: int = None,
+    batch_size: int = None,
+    concurrency: int = None,
+) -> list[list[str]]:
+    """
+    Extract keywords from many texts, returning a list of keywords for each.
+
+    Keyword extraction can take a while and is blocking, so texts are sent in
+    batches to worker processes, which keep their keyword extractors between
+    jobs. At most `concurrency` batches are processed at once. Texts shorter
+    than `MARVIN_KEYWORD_EXTRACTION_MIN_PROCESS_LENGTH` characters are
+    processed in a thread of the current process instead.
+
+    Args:
+        texts: The texts to extract keywords from.
+        n_keywords: The number of keywords to extract from each text.
+        batch_size: The number of texts sent to a worker in each job (defaults
+            to `MARVIN_KEYWORD_EXTRACTION_BATCH_SIZE`).
+        concurrency: The maximum number of jobs to run at once (defaults to
+            `MARVIN_KEYWORD_EXTRACTION_CONCURRENCY`, or the number of CPUs).
+    """
+    settings = marvin.settings
+    n_keywords = n_keywords or settings.default_n_keywords
+    batch_size = batch_size or settings.keyword_extraction_batch_size
+    concurrency = (
+        concurrency or settings.keyword_extraction_concurrency or os.cpu_count() or 1
     )
+    semaphore = asyncio.Semaphore(concurrency)
+    results: list[list[str]] = [None] * len(texts)
+
+    async def run_batch(indices: list[int], in_process: bool):
+        batch = [texts[i] for i in indices]
+        if in_process:
+            keywords = await marvin.utilities.async_utils.run_async(
+                _extract_keywords_batch, batch, n_keywords
+            )
+        else:
+            async with semaphore:
+                keywords = await marvin.utilities.async_utils.run_async_process(
+                    _extract_keywords_batch, batch, n_keywords
+                )
+        for i, kw in zip(indices, keywords):
+            results[i] = kw
+
+    short = []
+    long = []
+    for i, text in enumerate(texts):
+        if len(text) < settings.keyword_extraction_min_process_length:
+            short.append(i)
+        else:
+            long.append(i)
+
+    jobs = [
+        run_batch(list(batch), in_process=False)
+        for batch in marvin.utilities.collections.batched(long, batch_size)
+    ]
+    if short:
+        jobs.append(run_batch(short, in_process=True))
+    await asyncio.gather(*jobs)
+    return results
 
 
 def extract_links_from_text(text: str) -> list[str]:
     return LINKS.findall(text)
 
 
-def create_minimap_fn(content: str) -> Callable[[int], str]:
+def index_headers(content: str) -> tuple[list[int], list[tuple[str, ...]]]:
     """
-    Given a document with markdown headers, returns a function that outputs the
-    current headers for any character position in the document.
+    Given a document with markdown headers, returns the sorted character offsets
+    of its headers and, for each one, the headers in effect from that offset on
+    (the header and its parents, outermost first).
+
+    Both ATX (`# Header`) and setext (underlined) headers are indexed. Headers
+    in fenced code blocks and YAML front matter are ignored.
     """
-    minimap: dict[int, str] = {}
-    in_code_block = False
-    current_stack = {}
-    characters = 0
-    for line in content.splitlines():
-        characters += len(line)
-        if line.startswith("```"):
-            in_code_block = not in_code_block
-        if in_code_block:
+    offsets: list[int] = []
+    stacks: list[tuple[str, ...]] = []
+    # (level, header) pairs, outermost first
+    stack: tuple[tuple[int, str], ...] = ()
+    fence = None
+    # the offset and text of the previous line, if it could be a setext header
+    paragraph = None
+    lines = content.splitlines(keepends=True)
+
+    position = 0
+    start = 0
+    if lines and lines[0].rstrip() == "---":
+        for i, line in enumerate(lines[1:], start=1):
+            if line.rstrip() in ("---", "..."):
+                start = i + 1
+                position = sum(len(line) for line in lines[:start])
+                break
+
+    for line in lines[start:]:
+        offset = position
+        position += len(line)
+        line = line.rstrip("\r\n")
+
+        if fence is not None:
+            match = CODE_FENCE.match(line)
+            if (
+                match
+                and match.group(1)[0] == fence[0]
+                and len(match.group(1)) >= len(fence)
+                and not line[match.end() :].strip()
+            ):
+                fence = None
+            continue
+        elif match := CODE_FENCE.match(line):
+            fence = match.group(1)
+            paragraph = None
             continue
 
-        if line.startswith("# "):
-            current_stack = {1: line}
-        elif line.startswith("## "):
-            for i in range(2, 6):
-                current_stack.pop(i, None)
-            current_stack[2] = line
-        elif line.startswith("### "):
-            for i in range(3, 6):
-                current_stack.pop(i, None)
-            current_stack[3] = line
-        elif line.startswith("#### "):
-            for i in range(4, 6):
-                current_stack.pop(i, None)
-            current_stack[4] = line
-        elif line.startswith("##### "):
-            for i in range(5, 6):
-                current_stack.pop(i, None)
-            current_stack[5] = line
+        if match := ATX_HEADER.match(line):
+            level = len(match.group(1))
+            header, header_offset = line.strip(), offset
+        elif paragraph is not None and (match := SETEXT_UNDERLINE.match(line)):
+            level = 1 if match.group(1)[0] == "=" else 2
+            header_offset, text = paragraph
+            header = f"{'#' * level} {text.strip()}"
         else:
+            paragraph = (offset, line) if line.strip() else None
             continue
 
-        minimap[characters - len(line)] = current_stack
+        paragraph = None
+        stack = tuple(h for h in stack if h[0] < level) + ((level, header),)
+        offsets.append(header_offset)
+        stacks.append(tuple(h for _, h in stack))
+
+    return offsets, stacks
+
+
+def create_minimap_fn(content: str) -> Callable[[int], str]:
+    """
+    Given a document with markdown headers, returns a function that outputs the
+    current headers for any character position in the document.
+
+    The document is indexed once, so each lookup is a binary search.
+    """
+    offsets, stacks = index_headers(content)
 
     def get_location_fn(n: int) -> str:
         if n < 0:
             raise ValueError("n must be >= 0")
         # get the stack of headers that is closest to - but before - the current
         # position
-        stack = minimap.get(max((k for k in minimap if k <= n), default=0), {})
-
-        ordered_stack = [stack.get(i) for i in range(1, 6)]
-        return "\n".join([s for s in ordered_stack if s is not None])
+        i = bisect.bisect_right(offsets, n)
+        return "\n".join(stacks[i - 1]) if i else ""
 
     return get_location_fn
 
@@ -1,12 +1,14 @@
 import asyncio
 from contextlib import asynccontextmanager
 from functools import wraps
-from typing import Any
+from types import SimpleNamespace
+from typing import Any, Callable, Union
 
 import httpx
 
 from marvin import ai_fn, get_logger
 from marvin.programs.utilities import ApproximatelyEquivalent
+from marvin.utilities.async_utils import run_sync
 
 
 def assert_status_code(response: httpx.Response, status_code: int):
@@ -22,7 +24,7 @@ def assert_status_code(response: httpx.Response, status_code: int):
 
 
 def assert_approx_equal(statement_1: str, statement_2: str):
-    assert asyncio.run(ApproximatelyEquivalent().run(statement_1, statement_2))
+    assert run_sync(ApproximatelyEquivalent().run(statement_1, statement_2))
 
 
 @ai_fn()
@@ -69,3 +71,42 @@ def time_it(func):
         return result
 
     return wrapper
+
+
+class FakeLLM:
+    """
+    A stand-in for an LLM that returns canned responses without making any
+    network calls. Useful for testing bots.
+
+    `responses` can be a list of strings, which are returned in order (the
+    last one is repeated once the list is exhausted), or a function that
+    receives the list of messages and returns a string.
+
+    Fake LLMs have no temperature by default, so their responses are never
+    cached.
+    """
+
+    def __init__(
+        self,
+        responses: Union[list[str], Callable[[list], str]],
+        model_name: str = "fake-llm",
+        temperature: float = None,
+    ):
+        self.responses = responses
+        self.model_name = model_name
+        self.temperature = temperature
+        self.calls = []
+
+    def __call__(self, messages: list, stop: list[str] = None) -> str:
+        return self.generate([messages], stop=stop).generations[0][0].text
+
+    def generate(self, messages: list[list], stop: list[str] = None):
+        self.calls.append(messages[0])
+        if callable(self.responses):
+            text = self.responses(messages[0])
+        else:
+            text = self.responses[min(len(self.calls), len(self.responses)) - 1]
+        return SimpleNamespace(generations=[[SimpleNamespace(text=text)]])
+
+    async def agenerate(self, messages: list[list], stop: list[str] = None):
+        return self.generate(messages, stop=stop)
@@ -0,0 +1,138 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+import xxhash
+
+import marvin
+
+# the encoding used for models that tiktoken doesn't know
+DEFAULT_ENCODING = "cl100k_base"
+# the number of token counts to remember
+TOKEN_COUNT_CACHE_SIZE = 10_000
+# texts shorter than this are counted directly, which is as fast as a lookup
+MIN_CACHED_LENGTH = 200
+# the last non-whitespace character that is followed by a space or tab; tokens
+# never span this boundary, so a text can be cut after it without changing the
+# tokens before it (a newline can be part of the preceding token)
+LAST_WORD_BOUNDARY = re.compile(r".*\S(?=[ \t])", re.DOTALL)
+
+
+def get_encoding(model_name: Optional[str] = None) -> tiktoken.Encoding:
+    """
+    Returns the tiktoken encoding for a model, or for the configured OpenAI
+    model if none is given. Encodings are loaded once per model.
+    """
+    return _get_encoding(model_name or marvin.settings.openai_model_name)
+
+
+@lru_cache
+def _get_encoding(model_name: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def tokenize(text: str, model_name: str = None) -> list[int]:
+    return get_encoding(model_name).encode(text)
+
+
+def detokenize(tokens: list[int], model_name: str = None) -> str:
+    return get_encoding(model_name).decode(tokens)
+
+
+class TokenCountCache:
+    """
+    A bounded, thread-safe LRU of token counts, keyed by the encoding and a
+    hash of the text, so cached texts aren't kept in memory.
+    """
+
+    def __init__(self, max_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.max_size = max_size
+        self._counts: OrderedDict[tuple[str, int], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(encoding: tiktoken.Encoding, text: str) -> tuple[str, int]:
+        return (encoding.name, xxhash.xxh3_64_intdigest(text))
+
+    def get(self, key: tuple[str, int]) -> Optional[int]:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def set(self, key: tuple[str, int], count: int):
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+token_counts = TokenCountCache()
+
+
+def count_tokens(text: str, model_name: str = None) -> int:
+    encoding = get_encoding(model_name)
+    if len(text) < MIN_CACHED_LENGTH:
+        return len(encoding.encode(text))
+
+    key = token_counts.key(encoding, text)
+    count = token_counts.get(key)
+    if count is None:
+        count = len(encoding.encode(text))
+        token_counts.set(key, count)
+    return count
+
+
+def count_tokens_many(texts: list[str], model_name: str = None) -> list[int]:
+    """
+    Count the tokens in many texts at once. Texts that haven't been counted
+    before are encoded in parallel threads.
+    """
+    encoding = get_encoding(model_name)
+    counts: list[Optional[int]] = [None] * len(texts)
+    keys = {}
+    for i, text in enumerate(texts):
+        if len(text) >= MIN_CACHED_LENGTH:
+            keys[i] = token_counts.key(encoding, text)
+            counts[i] = token_counts.get(keys[i])
+
+    uncounted = [i for i, count in enumerate(counts) if count is None]
+    if uncounted:
+        encoded = encoding.encode_batch([texts[i] for i in uncounted])
+        for i, tokens in zip(uncounted, encoded):
+            counts[i] = len(tokens)
+            if i in keys:
+                token_counts.set(keys[i], counts[i])
+    return counts
+
+
+def slice_tokens(text: str, n_tokens: int, model_name: str = None) -> str:
+    """
+    Returns the first `n_tokens` tokens of a text.
+
+    Rather than encoding the whole text, growing prefixes of it are encoded
+    until one has enough tokens. Prefixes are cut at word boundaries, so their
+    tokens are the same as the start of the whole text's tokens.
+    """
+    encoding = get_encoding(model_name)
+    # most tokens are shorter than 8 characters
+    prefix_length = 8 * max(n_tokens, 1)
+    while prefix_length < len(text):
+        if match := LAST_WORD_BOUNDARY.match(text, 0, prefix_length):
+            tokens = encoding.encode(text[: match.end()])
+            if len(tokens) >= n_tokens:
+                return encoding.decode(tokens[:n_tokens])
+        prefix_length *= 2
+    return encoding.decode(encoding.encode(text)[:n_tokens])
@@ -0,0 +1,170 @@
+import datetime
+import json
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import marvin
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+_sinks: list[Callable[[dict], None]] = []
+
+
+class Span:
+    __slots__ = ("name", "attributes", "children", "start_time", "duration", "_start")
+
+    # real spans record their attributes; see `NullSpan`
+    recording = True
+
+    def __init__(self, name: str, attributes: dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.children: list[Span] = []
+        self.start_time = datetime.datetime.now(datetime.timezone.utc)
+        self.duration: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return dict(
+            name=self.name,
+            start_time=self.start_time.isoformat(),
+            duration=self.duration,
+            attributes=self.attributes,
+            children=[child.to_dict() for child in self.children],
+        )
+
+
+class NullSpan:
+    """
+    A span that records nothing, used when there is no active trace.
+    """
+
+    recording = False
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class _SpanContext:
+    __slots__ = ("_parent", "_span", "_token")
+
+    def __init__(self, parent: Optional[Span], span: Span):
+        self._parent = parent
+        self._span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        if self._parent is not None:
+            self._parent.children.append(self._span)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        span = self._span
+        span.duration = time.perf_counter() - span._start
+        if exc_type is not None:
+            span.attributes["error"] = repr(exc_value)
+        _current_span.reset(self._token)
+        if self._parent is None:
+            export(span)
+
+
+def span(name: str, **attributes):
+    """
+    Returns a context manager for a timed span nested in the current one. If
+    there is no active trace, the shared no-op span is returned, so spans cost
+    almost nothing when tracing is disabled.
+
+    Example:
+        ```python
+        with trace("work"):
+            with span("step", size=3) as s:
+                ...
+                s.set(result="ok")
+        ```
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NULL_SPAN
+    return _SpanContext(parent, Span(name, attributes))
+
+
+def trace(name: str, **attributes):
+    """
+    Returns a context manager that starts a new trace if tracing is enabled, or
+    a span in the current trace if one is active. The finished trace is sent to
+    all sinks.
+    """
+    parent = _current_span.get()
+    if parent is None and not marvin.settings.tracing_enabled:
+        return NULL_SPAN
+    return _SpanContext(parent, Span(name, attributes))
+
+
+def current_span():
+    """
+    Returns the active span, or a no-op span if there is no active trace.
+    """
+    return _current_span.get() or NULL_SPAN
+
+
+def add_sink(sink: Callable[[dict], None]):
+    """
+    Register a callable that receives every finished trace, as a dict.
+    """
+    _sinks.append(sink)
+
+
+def remove_sink(sink: Callable[[dict], None]):
+    _sinks.remove(sink)
+
+
+class JSONLinesSink:
+    """
+    A sink that appends each trace to a file as a line of JSON.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock, self.path.open("a") as f:
+            f.write(line + "\n")
+
+
+@lru_cache
+def _get_file_sink(path: Path) -> JSONLinesSink:
+    return JSONLinesSink(path)
+
+
+def export(root: Span):
+    sinks = list(_sinks)
+    if marvin.settings.tracing_path is not None:
+        sinks.append(_get_file_sink(marvin.settings.tracing_path))
+    if not sinks:
+        return
+
+    record = root.to_dict()
+    for sink in sinks:
+        try:
+            sink(record)
+        except Exception as exc:
+            marvin.get_logger("tracing").warning(f"Failed to export trace: {exc!r}")
@@ -2,12 +2,22 @@ import importlib.util
 import json
 import logging
 import re
+import sys
 import typing
 from functools import lru_cache
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from types import GenericAlias
-from typing import Any, Callable, Generic, Literal, TypeVar, Union, _SpecialForm
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Literal,
+    Optional,
+    TypeVar,
+    Union,
+    _SpecialForm,
+)
 
 import pydantic
 import ulid
@@ -36,6 +46,8 @@ ANY_ULID_REGEX = r"\b(?:[^\W0-9_][^\W_]+_)?[0-9A-HJ-NP-TV-Z]{26}\b"
 
 
 DISCRIMINATED_UNION_REGISTRY = {}
+# registered subclasses of each discriminated union, by discriminator value
+DISCRIMINATORS: dict[type, dict[str, type]] = {}
 
 
 @lru_cache()
@@ -59,39 +71,49 @@ class MarvinBaseModel(BaseModel):
         extra = "forbid"
         json_encoders = {}
 
-    def __init__(self, **data):
-        # check for any fields annotated as DiscriminatedUnionType classes and
-        # properly instantiate their subclasses from the registry
-        for field_name, field in self.__fields__.items():
-            # first extract the type of the field
+    # the fields annotated with DiscriminatedUnionType classes, computed once
+    # per class; see `_get_discriminated_fields`
+    __discriminated_fields__ = ()
+
+    # whether `copy_with_updates` can share unchanged values with the original
+    __shares_copies__ = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__discriminated_fields__ = cls._get_discriminated_fields()
+        cls.__shares_copies__ = (
+            cls.__init__ is MarvinBaseModel.__init__
+            and not cls.__pre_root_validators__
+            and not cls.__post_root_validators__
+        )
+
+    @classmethod
+    def _get_discriminated_fields(cls) -> tuple[tuple[str, Any, type], ...]:
+        """
+        Returns the (name, outer type, union type) of every field annotated with
+        a DiscriminatedUnionType class, including inside lists, sets, tuples,
+        and dict values.
+        """
+        fields = []
+        for field_name, field in cls.__fields__.items():
             model = extract_class(field.type_)
-            # check if the type is a DiscriminatedUnionType, and the data
-            # contains a value for this field
-            if (
-                isinstance(model, type)
-                and issubclass(model, DiscriminatedUnionType)
-                and data.get(field_name)
-            ):
-                # load the registered subclasses for this model, as a union if necessary
-                if subclasses := DISCRIMINATED_UNION_REGISTRY.get(model, []):
-                    if len(subclasses) > 1:
-                        new_model = Union[tuple(subclasses)]
-                    else:
-                        new_model == subclasses[0]
-
-                # parse the input objects into the appropriate subclass, first
-                # by creating a structure that replaces the generic
-                # DiscriminatedUnionType with the new subclass type
-                structure = replace_class(field.outer_type_, model, new_model)
-                try:
-                    data[field_name] = pydantic.parse_obj_as(
-                        structure, data[field_name]
-                    )
-                except Exception:
-                    # ignore this field; it likely means that the input data
-                    # needs to be run through a validator in which case the
-                    # validator will raise an error
-                    pass
+            if isinstance(model, type) and issubclass(model, DiscriminatedUnionType):
+                fields.append((field_name, field.outer_type_, model))
+        return tuple(fields)
+
+    @classmethod
+    def update_forward_refs(cls, **localns: Any) -> None:
+        super().update_forward_refs(**localns)
+        cls.__discriminated_fields__ = cls._get_discriminated_fields()
+
+    def __init__(self, **data):
+        # properly instantiate the registered subclasses of any fields
+        # annotated as DiscriminatedUnionType classes
+        for field_name, outer_type, model in self.__discriminated_fields__:
+            if data.get(field_name):
+                data[field_name] = _load_discriminated(
+                    outer_type, model, data[field_name]
+                )
 
         # instantiate the object
         super().__init__(**data)
@@ -108,22 +130,79 @@ class MarvinBaseModel(BaseModel):
 
         Unlike `copy(update=updates)`, this method will properly validate
         updates and apply nested updates.
+
+        Only the updated fields are validated; all other field values are
+        shared with the original, so copying a model with large fields (like a
+        document's text) is cheap. Models that customize `__init__` or have
+        root validators are rebuilt and fully validated instead.
         """
-        updated = self.dict(exclude=exclude)
+        if self.__shares_copies__:
+            copied = self._copy_updated_fields(exclude=exclude, updates=updates)
+            if copied is not None:
+                return copied
 
-        stack = [(updated, k, v) for k, v in updates.items()]
-        while stack:
-            m, k, v = stack.pop()
-            mv = m.get(k)
-            if isinstance(mv, dict) and isinstance(v, dict):
-                stack.extend([(mv, vk, vv) for vk, vv in v.items()])
-            else:
-                m[k] = v
+        updated = self.dict(exclude=exclude)
+        _merge_updates(updated, updates)
 
         excluded = set(self.__exclude_fields__ or []).union(exclude or [])
         excluded_kwargs = {e: getattr(self, e) for e in excluded if e not in updated}
         return type(self)(**updated, **excluded_kwargs)
 
+    def _copy_updated_fields(
+        self, exclude: Optional[set[str]], updates: "dict[str, Any]"
+    ) -> Optional["MarvinBaseModel"]:
+        """
+        Copy the model, validating only the updated fields. Returns None if an
+        update isn't for a known field, so it can be handled by `__init__`.
+        """
+        cls = type(self)
+        values = dict(self.__dict__)
+        new_values = {}
+        for name, value in updates.items():
+            field = self.__fields__.get(name)
+            if field is None:
+                if self.__config__.extra != pydantic.Extra.allow:
+                    return None
+                # extra fields are stored without validation
+                new_values[name] = value
+                continue
+            elif field.alias != name:
+                return None
+
+            if isinstance(value, dict) and not (exclude and name in exclude):
+                # nested updates are merged into the current value
+                current = self.dict(include={name}).get(name)
+                if isinstance(current, dict):
+                    value = _merge_updates(current, value)
+            for field_name, outer_type, model in self.__discriminated_fields__:
+                if field_name == name and value:
+                    value = _load_discriminated(outer_type, model, value)
+
+            value, errors = field.validate(value, values, loc=name, cls=cls)
+            if errors:
+                raise pydantic.ValidationError([errors], cls)
+            new_values[name] = value
+
+        values.update(new_values)
+        return self._copy_and_set_values(
+            values, self.__fields_set__ | set(updates), deep=False
+        )
+
+
+def _merge_updates(target: dict, updates: dict) -> dict:
+    """
+    Apply partial nested updates to a dict, in place.
+    """
+    stack = [(target, k, v) for k, v in updates.items()]
+    while stack:
+        m, k, v = stack.pop()
+        mv = m.get(k)
+        if isinstance(mv, dict) and isinstance(v, dict):
+            stack.extend([(mv, vk, vv) for vk, vv in v.items()])
+        else:
+            m[k] = v
+    return target
+
 
 class LoggerMixin(BaseModel):
     _logger: logging.Logger = PrivateAttr()
@@ -167,6 +246,50 @@ class DiscriminatedUnionType(MarvinBaseModel):
                 and parent_cls is not DiscriminatedUnionType
             ):
                 DISCRIMINATED_UNION_REGISTRY.setdefault(parent_cls, []).append(cls)
+                # a redefined subclass replaces the previous definition
+                DISCRIMINATORS.setdefault(parent_cls, {})[value] = cls
+
+        super().__init_subclass__(**kwargs)
+
+
+def _load_discriminated(structure, model: type, value: Any) -> Any:
+    """
+    Instantiate the registered subclasses of a DiscriminatedUnionType `model`
+    in a value matching `structure` (the model, or lists, sets, tuples, and
+    dicts of it), dispatching on each object's `discriminator`.
+
+    Values that can't be loaded are returned unchanged, so that the field's
+    validators can handle them or raise an error.
+    """
+    origin = getattr(structure, "__origin__", None)
+    if origin in (list, set, tuple) and isinstance(value, (list, set, tuple)):
+        args = structure.__args__
+        if origin is tuple and not (len(args) == 2 and args[1] is Ellipsis):
+            if len(args) != len(value):
+                return value
+            items = [_load_discriminated(a, model, v) for a, v in zip(args, value)]
+        else:
+            items = [_load_discriminated(args[0], model, v) for v in value]
+        return type(value)(items) if isinstance(value, (set, tuple)) else items
+    elif origin is dict and isinstance(value, dict):
+        value_type = structure.__args__[-1]
+        return {k: _load_discriminated(value_type, model, v) for k, v in value.items()}
+    elif structure is not model or not isinstance(value, dict):
+        return value
+
+    subclass = DISCRIMINATORS.get(model, {}).get(value.get("discriminator"))
+    try:
+        if subclass is not None:
+            return subclass.parse_obj(value)
+        # without a known discriminator, try each subclass in turn
+        subclasses = DISCRIMINATED_UNION_REGISTRY.get(model, [])
+        if subclasses:
+            return pydantic.parse_obj_as(Union[tuple(subclasses)], value)
+    except Exception:
+        # it likely means that the input data needs to be run through a
+        # validator, in which case the validator will raise an error
+        pass
+    return value
 
 
 class MarvinRouter(APIRouter):
@@ -295,35 +418,220 @@ def type_to_schema(type_) -> dict:
         return Model.schema()
 
 
-def schema_to_type(schema: dict):
-    # defer for performance
-    import datamodel_code_generator
+class UnsupportedSchemaError(ValueError):
+    """
+    Raised when a JSON schema can't be converted directly to a pydantic model.
+    """
 
-    with TemporaryDirectory() as temporary_directory_name:
-        temporary_directory = Path(temporary_directory_name)
-        output = Path(temporary_directory / "model.py")
-
-        # write schema to a file
-        datamodel_code_generator.generate(
-            json.dumps(schema),
-            input_file_type=datamodel_code_generator.InputFileType.JsonSchema,
-            input_filename="example.json",
-            output=output,
-            validation=True,
-        )
 
-        # import the file
-        module_name = "marvin_tmp_models"
+# pydantic models for JSON schemas, keyed by `schema_hash`
+_SCHEMA_MODELS: dict[str, type[pydantic.BaseModel]] = {}
+
+# JSON schema keywords that `_SchemaModelBuilder` understands; any other keyword
+# (for example, a string `format` or numeric bounds) falls back to codegen
+SUPPORTED_SCHEMA_KEYWORDS = {
+    "$ref",
+    "additionalProperties",
+    "allOf",
+    "anyOf",
+    "default",
+    "definitions",
+    "description",
+    "enum",
+    "items",
+    "properties",
+    "required",
+    "title",
+    "type",
+    "uniqueItems",
+}
+JSON_SCHEMA_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def schema_hash(schema: dict) -> str:
+    """
+    Returns a hash of the canonical JSON form of a schema.
+    """
+    # deferred import to avoid a circular import
+    from marvin.utilities.strings import hash_text
+
+    return hash_text(json.dumps(schema, sort_keys=True, separators=(",", ":")))
+
+
+def schema_to_type(schema: dict) -> type[pydantic.BaseModel]:
+    """
+    Returns a pydantic model for a JSON schema, like those produced by
+    `type_to_schema`. Schemas that describe anything other than an object
+    with properties produce a model with a `__root__` field.
+
+    Models are cached for the life of the process, keyed by the schema's
+    canonical hash. Most schemas are converted directly; anything else is
+    passed to `datamodel-code-generator`, whose output is also cached on disk
+    in `settings.schema_cache_path` (if set).
+    """
+    key = schema_hash(schema)
+    model = _SCHEMA_MODELS.get(key)
+    if model is None:
+        try:
+            model = _SchemaModelBuilder(schema).build()
+        except UnsupportedSchemaError as exc:
+            logger.debug(f"Generating code for schema: {exc}")
+            model = _generate_model(schema, key=key)
+        _SCHEMA_MODELS[key] = model
+    return model
+
+
+class _SchemaModelBuilder:
+    """
+    Converts a JSON schema to a pydantic model without generating code.
+    """
+
+    def __init__(self, schema: dict):
+        self.schema = schema
+        self.definitions = schema.get("definitions", {})
+        self._models: dict[str, type[pydantic.BaseModel]] = {}
+        self._building: set[str] = set()
+
+    def build(self) -> type[pydantic.BaseModel]:
+        name = self.schema.get("title", "Model")
+        if self.schema.get("type") == "object" and "properties" in self.schema:
+            return self._object_model(self.schema, name=name)
+        return pydantic.create_model(name, __root__=(self._type(self.schema), ...))
+
+    def _type(self, schema: dict) -> Any:
+        unsupported = set(schema) - SUPPORTED_SCHEMA_KEYWORDS
+        if isinstance(schema.get("items"), list):
+            # tuples have a fixed length
+            unsupported -= {"minItems", "maxItems"}
+        if unsupported:
+            raise UnsupportedSchemaError(f"unsupported keywords {unsupported}")
+
+        if "$ref" in schema:
+            return self._ref(schema["$ref"])
+        if "allOf" in schema:
+            if len(schema["allOf"]) != 1:
+                raise UnsupportedSchemaError("allOf with more than one schema")
+            return self._type(schema["allOf"][0])
+        if "anyOf" in schema:
+            return Union[tuple(self._type(s) for s in schema["anyOf"])]
+        if "enum" in schema:
+            return Literal[tuple(schema["enum"])]
+
+        type_ = schema.get("type")
+        if isinstance(type_, list):
+            return Union[tuple(self._type({**schema, "type": t}) for t in type_)]
+        if type_ in JSON_SCHEMA_TYPES:
+            return JSON_SCHEMA_TYPES[type_]
+        if type_ == "array":
+            items = schema.get("items", {})
+            if isinstance(items, list):
+                return tuple[tuple(self._type(s) for s in items)]
+            item_type = self._type(items) if items else Any
+            return set[item_type] if schema.get("uniqueItems") else list[item_type]
+        if type_ == "object":
+            if "properties" in schema:
+                return self._object_model(schema, name=schema.get("title", "Model"))
+            additional = schema.get("additionalProperties")
+            if isinstance(additional, dict):
+                return dict[str, self._type(additional)]
+            return dict[str, Any]
+        if type_ is None and set(schema) <= {"title", "description", "default"}:
+            return Any
+        raise UnsupportedSchemaError(f"unsupported type {type_!r}")
+
+    def _ref(self, ref: str) -> type[pydantic.BaseModel]:
+        prefix = "#/definitions/"
+        if not ref.startswith(prefix) or ref[len(prefix) :] not in self.definitions:
+            raise UnsupportedSchemaError(f"unresolvable reference {ref!r}")
+        name = ref[len(prefix) :]
+        if name not in self._models:
+            if name in self._building:
+                raise UnsupportedSchemaError(f"recursive reference {ref!r}")
+            self._building.add(name)
+            definition = self.definitions[name]
+            if definition.get("type") == "object" and "properties" in definition:
+                self._models[name] = self._object_model(definition, name=name)
+            else:
+                self._models[name] = self._type(definition)
+            self._building.discard(name)
+        return self._models[name]
+
+    def _object_model(self, schema: dict, name: str) -> type[pydantic.BaseModel]:
+        unsupported = set(schema) - SUPPORTED_SCHEMA_KEYWORDS
+        if unsupported:
+            raise UnsupportedSchemaError(f"unsupported keywords {unsupported}")
+        if schema.get("additionalProperties") not in (None, False):
+            raise UnsupportedSchemaError("object with additional properties")
+
+        required = set(schema.get("required", []))
+        fields = {}
+        for field_name, field_schema in schema["properties"].items():
+            if (
+                not field_name.isidentifier()
+                or field_name.startswith("_")
+                or hasattr(pydantic.BaseModel, field_name)
+            ):
+                raise UnsupportedSchemaError(f"unsupported field name {field_name!r}")
+            type_ = self._type(field_schema)
+            if field_name in required:
+                default = ...
+            else:
+                default = field_schema.get("default")
+                if default is None:
+                    type_ = Optional[type_]
+            fields[field_name] = (
+                type_,
+                pydantic.Field(default, description=field_schema.get("description")),
+            )
+        return pydantic.create_model(name, **fields)
+
+
+def _generate_model(schema: dict, key: str) -> type[pydantic.BaseModel]:
+    """
+    Generate a module with `datamodel-code-generator` and import the model from
+    it. Generated modules are cached in `settings.schema_cache_path`, if set.
+    """
+    # deferred import to avoid a circular import
+    import marvin
+
+    cache_path = marvin.settings.schema_cache_path
+    module_name = f"marvin_schema_{key}"
+
+    with TemporaryDirectory() as temporary_directory_name:
+        if cache_path is not None:
+            output = Path(cache_path) / f"{module_name}.py"
+        else:
+            output = Path(temporary_directory_name) / "model.py"
+
+        if not output.exists():
+            # defer for performance
+            import datamodel_code_generator
+
+            output.parent.mkdir(parents=True, exist_ok=True)
+            datamodel_code_generator.generate(
+                json.dumps(schema),
+                input_file_type=datamodel_code_generator.InputFileType.JsonSchema,
+                input_filename="example.json",
+                output=output,
+                validation=True,
+            )
+
+        # import the file; it is registered so forward references resolve
         spec = importlib.util.spec_from_file_location(module_name, str(output))
         module = importlib.util.module_from_spec(spec)
-        # sys.modules[module_name] = module
+        sys.modules[module_name] = module
         spec.loader.exec_module(module)
 
-        model_name = schema.get("title", "Model")
-        model = getattr(module, model_name)
-        model.update_forward_refs(**typing.__dict__)
-
-        return model
+    model_name = schema.get("title", "Model")
+    model = getattr(module, model_name)
+    model.update_forward_refs(**typing.__dict__)
+    return model
 
 
 def format_type_str(type_) -> str:
@@ -0,0 +1,303 @@
+import concurrent.futures
+import json
+
+import marvin
+import pytest
+from marvin import ai_fn
+from marvin.bots.ai_functions import AIFunction
+from marvin.infra.cache import SQLiteCache, get_ai_fn_cache
+from marvin.utilities.async_utils import run_sync
+from marvin.utilities.tests import FakeLLM
+
+
+class TestAIFunction:
+    def test_decorator_returns_ai_function(self):
+        @ai_fn
+        def f(x: int) -> int:
+            """Doubles x"""
+
+        assert isinstance(f, AIFunction)
+        assert f.__name__ == "f"
+        assert f.__doc__ == "Doubles x"
+        assert "def f(x: int) -> int:" in f.instructions
+        assert "@ai_fn" not in f.instructions
+
+    def test_decorate_on_background_loop(self):
+        async def decorate():
+            @ai_fn
+            def f(x: int) -> int:
+                """Doubles x"""
+
+            return f
+
+        f = run_sync(decorate())
+        assert "def f(x: int) -> int:" in f.instructions
+
+    def test_call(self):
+        llm = FakeLLM(["4"])
+
+        @ai_fn(llm=llm)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        assert double(2) == 4
+        assert "x = 2" in llm.calls[0][-1].content
+
+    async def test_async_call(self):
+        llm = FakeLLM(["4"])
+
+        @ai_fn(llm=llm)
+        async def double(x: int) -> int:
+            """Doubles x"""
+            return x * 2
+
+        assert await double(2) == 4
+        # the function is called and its return value is shown to the LLM
+        assert "4" in llm.calls[0][-1].content
+
+    def test_bot_is_created_once(self, monkeypatch):
+        created = []
+        original_create_bot = AIFunction._create_bot
+
+        def create_bot(self):
+            created.append(self)
+            return original_create_bot(self)
+
+        monkeypatch.setattr(AIFunction, "_create_bot", create_bot)
+
+        @ai_fn(llm=FakeLLM(["a"]))
+        def f() -> str:
+            """Returns a"""
+
+        assert f() == "a"
+        assert f() == "a"
+        assert len(created) == 1
+
+    def test_calls_have_isolated_history(self):
+        llm = FakeLLM(lambda messages: str(len(messages)))
+
+        @ai_fn(llm=llm)
+        def count() -> str:
+            """Counts"""
+
+        assert count() == count()
+        assert len(llm.calls[0]) == len(llm.calls[1])
+
+    def test_bot_modifier(self):
+        @ai_fn(
+            llm=FakeLLM(["hi"]),
+            bot_modifier=lambda bot: setattr(bot, "name", "Modified"),
+        )
+        def f() -> str:
+            """Says hi"""
+
+        assert f.get_bot().name == "Modified"
+
+    def test_ai_function_methods(self):
+        class Greeter:
+            greeting = "hi"
+
+            @ai_fn(llm=FakeLLM(["hi there"]), call_function=False)
+            def greet(self, name: str) -> str:
+                """Greets someone"""
+
+        assert Greeter().greet("Ford") == "hi there"
+
+    @pytest.mark.parametrize("call_function", [True, False])
+    def test_call_function(self, call_function):
+        calls = []
+
+        @ai_fn(llm=FakeLLM(["x"]), call_function=call_function)
+        def f() -> str:
+            """Returns x"""
+            calls.append(1)
+
+        f()
+        assert len(calls) == int(call_function)
+
+    def test_source_unavailable(self):
+        namespace = {}
+        exec("def f(x: int) -> int:\n    'Doubles x'", namespace)
+        f = AIFunction(namespace["f"], llm=FakeLLM(["4"]))
+        assert "def f(x: int) -> int:" in f.instructions
+        assert isinstance(f.get_bot(), marvin.Bot)
+
+
+class TestSyncBridge:
+    async def test_sync_call_inside_event_loop(self):
+        @ai_fn(llm=FakeLLM(["4"]))
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        assert double(2) == 4
+
+    def test_sync_function_can_call_ai_functions(self):
+        @ai_fn(llm=FakeLLM(["blue"]))
+        def color(thing: str) -> str:
+            """Returns the color of the thing"""
+
+        llm = FakeLLM(["glue"])
+
+        @ai_fn(llm=llm)
+        def rhyme_with_color(thing: str) -> str:
+            """Returns a word that rhymes with the color of the thing"""
+            return color(thing)
+
+        assert rhyme_with_color("sky") == "glue"
+        assert "blue" in llm.calls[0][-1].content
+
+    def test_concurrent_calls_from_threads(self):
+        @ai_fn(llm=FakeLLM(lambda messages: "ok"))
+        def f(x: int) -> str:
+            """Returns ok"""
+
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            assert list(pool.map(f, range(16))) == ["ok"] * 16
+
+
+class TestMap:
+    def test_map(self):
+        llm = FakeLLM(["[2, 4, 6]"])
+
+        @ai_fn(llm=llm)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        assert double.map([1, 2, 3]) == [2, 4, 6]
+        assert len(llm.calls) == 1
+        message = llm.calls[0][-1].content
+        assert "# Input 1" in message and "x = 3" in message
+
+    async def test_async_map(self):
+        @ai_fn(llm=FakeLLM(["[2, 4]"]), call_function=False)
+        async def double(x: int) -> int:
+            """Doubles x"""
+
+        assert await double.map([1, 2]) == [2, 4]
+
+    def test_map_inputs(self):
+        llm = FakeLLM(['["a1", "b2"]'])
+
+        @ai_fn(llm=llm)
+        def f(x: str, y: int) -> str:
+            """Joins x and y"""
+
+        assert f.map([("a", 1), dict(x="b", y=2)]) == ["a1", "b2"]
+        message = llm.calls[0][-1].content
+        assert "x = a" in message and "y = 2" in message
+
+    def test_batches_are_sized_by_tokens(self):
+        def respond(messages):
+            n = messages[-1].content.count("# Input")
+            return json.dumps(list(range(n)))
+
+        llm = FakeLLM(respond)
+
+        @ai_fn(llm=llm)
+        def f(x: str) -> int:
+            """Returns a number"""
+
+        results = f.map(["word " * 50] * 10, batch_tokens=200)
+        assert len(results) == 10
+        assert len(llm.calls) > 1
+        assert all(m[-1].content.count("# Input") <= 4 for m in llm.calls)
+
+    def test_only_failed_results_are_retried(self):
+        def respond(messages):
+            if "# Input" in messages[-1].content:
+                # the second result is invalid and the third is missing
+                return '[2, "four"]'
+            return "6"
+
+        llm = FakeLLM(respond)
+
+        @ai_fn(llm=llm)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        assert double.map([1, 2, 3]) == [2, 6, 6]
+        # one batch, plus one retry for each failed result
+        assert len(llm.calls) == 3
+
+
+class TestCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return SQLiteCache(path=tmp_path / "ai_fn.sqlite")
+
+    def test_results_are_cached(self, cache):
+        llm = FakeLLM(lambda messages: "4")
+
+        @ai_fn(llm=llm, cache=cache)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        assert double(2) == 4
+        assert double(2) == 4
+        assert len(llm.calls) == 1
+
+    def test_different_inputs_are_not_cached(self, cache):
+        llm = FakeLLM(lambda messages: "4")
+
+        @ai_fn(llm=llm, cache=cache)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        double(2)
+        double(3)
+        assert len(llm.calls) == 2
+
+    def test_editing_the_function_invalidates_results(self, cache):
+        llm = FakeLLM(lambda messages: "4")
+
+        @ai_fn(llm=llm, cache=cache)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        double(2)
+
+        @ai_fn(llm=llm, cache=cache)
+        def double(x: int) -> int:  # noqa: F811
+            """Returns x times two"""
+
+        double(2)
+        assert len(llm.calls) == 2
+
+    def test_results_are_not_cached_by_default(self):
+        llm = FakeLLM(lambda messages: "4")
+
+        @ai_fn(llm=llm)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        double(2)
+        double(2)
+        assert len(llm.calls) == 2
+
+    def test_cache_true_uses_ai_fn_cache(self):
+        @ai_fn(cache=True)
+        def f() -> str:
+            """Returns a"""
+
+        assert f._get_cache() is get_ai_fn_cache()
+
+    def test_map_only_sends_uncached_inputs(self, cache):
+        def respond(messages):
+            n = messages[-1].content.count("# Input")
+            return json.dumps([2] * n)
+
+        llm = FakeLLM(respond)
+
+        @ai_fn(llm=llm, cache=cache)
+        def double(x: int) -> int:
+            """Doubles x"""
+
+        double.map([1, 2])
+        double.map([1, 2, 3])
+        assert len(llm.calls) == 2
+        message = llm.calls[1][-1].content
+        assert "x = 3" in message and "x = 1" not in message
+
+        # results are shared between calls and maps
+        double(1)
+        assert len(llm.calls) == 2
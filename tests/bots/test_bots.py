@@ -1,9 +1,15 @@
+import asyncio
+
 import marvin
+import pendulum
 import pydantic
 import pytest
 from marvin import Bot
+from marvin.bots.history import InMemoryHistory
 from marvin.bots.response_formatters import ResponseFormatter
+from marvin.utilities.tests import FakeLLM
 from marvin.utilities.types import format_type_str
+from openai.error import RateLimitError
 
 
 class TestCreateBots:
@@ -142,3 +148,112 @@ class TestResponseFormat:
             "A JSON object that satisfies the following OpenAPI schema:"
         )
         assert str(OutputFormat.schema_json()) in bot.response_format.format
+
+
+class TestCompiledPrompt:
+    async def test_prompt_is_cached(self):
+        bot = Bot()
+        messages, tokens = await bot._get_prompt()
+        messages_2, tokens_2 = await bot._get_prompt()
+        assert messages[0] is messages_2[0]
+        assert tokens == tokens_2 > 0
+
+    async def test_prompt_matches_uncached_render(self):
+        bot = Bot(response_format=list[str])
+        messages, tokens = await bot._get_prompt()
+        uncached = await bot._get_bot_instructions(response_format=list[str])
+        assert messages[0].content == uncached.content
+        assert tokens == marvin.utilities.strings.count_tokens(uncached.content)
+
+    @pytest.mark.parametrize(
+        "field, value",
+        [
+            ("instructions", "new instructions"),
+            ("personality", "new personality"),
+            ("response_format", "new format"),
+        ],
+    )
+    async def test_assignment_invalidates_prompt(self, field, value):
+        bot = Bot()
+        messages, _ = await bot._get_prompt()
+        setattr(bot, field, value)
+        new_messages, _ = await bot._get_prompt()
+        assert messages[0].content != new_messages[0].content
+        assert value in new_messages[0].content
+
+    async def test_assigning_plugins_invalidates_prompt(self):
+        bot = Bot(plugins=[])
+        messages, tokens = await bot._get_prompt()
+        assert len(messages) == 1
+
+        bot.plugins = [marvin.plugins.mathematics.Calculator()]
+        messages, new_tokens = await bot._get_prompt()
+        assert len(messages) == 2
+        assert new_tokens > tokens
+
+    async def test_date_is_refreshed(self):
+        bot = Bot()
+        try:
+            pendulum.set_test_now(pendulum.datetime(2023, 1, 1))
+            messages, _ = await bot._get_prompt()
+            assert "January 1, 2023" in messages[0].content
+
+            pendulum.set_test_now(pendulum.datetime(2023, 1, 2))
+            messages, _ = await bot._get_prompt()
+            assert "January 2, 2023" in messages[0].content
+        finally:
+            pendulum.set_test_now()
+
+
+class TestSayMany:
+    async def test_responses_are_returned_in_order(self):
+        llm = FakeLLM(lambda messages: messages[-1].content.upper())
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+
+        responses = await bot.say_many(["a", "b", "c"], concurrency=2)
+        assert [r.content for r in responses] == ["A", "B", "C"]
+
+    async def test_inputs_are_independent(self):
+        llm = FakeLLM(lambda messages: str(len(messages)))
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+
+        responses = await bot.say_many(["a", "b"])
+        assert responses[0].content == responses[1].content
+        assert await bot.history.get_messages() == []
+
+    async def test_errors_are_returned_per_input(self):
+        def respond(messages):
+            if messages[-1].content == "bad":
+                raise ValueError("bad input")
+            return "ok"
+
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=FakeLLM(respond))
+
+        responses = await bot.say_many(["good", "bad"])
+        assert responses[0].content == "ok"
+        assert isinstance(responses[1], ValueError)
+
+    async def test_zero_disables_rate_limits(self, monkeypatch):
+        monkeypatch.setattr(marvin.settings, "openai_requests_per_minute", 1)
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=FakeLLM(["ok"]))
+
+        responses = await asyncio.wait_for(
+            bot.say_many(["a", "b", "c"], requests_per_minute=0), timeout=5
+        )
+        assert [r.content for r in responses] == ["ok", "ok", "ok"]
+
+    async def test_rate_limited_requests_are_retried(self, monkeypatch):
+        monkeypatch.setattr(marvin.bots.base, "backoff_delay", lambda attempt: 0)
+        attempts = []
+
+        def respond(messages):
+            attempts.append(messages)
+            if len(attempts) == 1:
+                raise RateLimitError("slow down")
+            return "ok"
+
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=FakeLLM(respond))
+
+        responses = await bot.say_many(["hi"])
+        assert responses[0].content == "ok"
+        assert len(attempts) == 2
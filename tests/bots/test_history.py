@@ -0,0 +1,192 @@
+import asyncio
+
+import marvin
+import pytest
+from marvin import Bot
+from marvin.bots.history import InMemoryHistory, ThreadHistory, message_buffer
+from marvin.infra.llms import get_context_window
+from marvin.models.threads import Message
+from marvin.utilities.async_utils import get_background_loop
+from marvin.utilities.strings import count_tokens
+from marvin.utilities.tests import FakeLLM
+
+
+async def get_stored_messages(thread_id):
+    return await marvin.api.threads.get_messages(thread_id=thread_id, n=None)
+
+
+class TestThreadHistory:
+    @pytest.fixture(autouse=True)
+    async def flush_buffer(self):
+        yield
+        await message_buffer.flush()
+
+    async def test_write_through(self):
+        history = ThreadHistory(write_behind=False)
+        await history.add_message(Message(role="user", content="hi"))
+        assert len(await get_stored_messages(history.thread_id)) == 1
+
+    async def test_write_behind_messages_are_visible_before_flush(self):
+        history = ThreadHistory(write_behind=True)
+        await history.add_message(Message(role="user", content="hi"))
+        await history.add_message(Message(role="ai", content="hello"))
+
+        assert await get_stored_messages(history.thread_id) == []
+        messages = await history.get_messages()
+        assert [m.content for m in messages] == ["hi", "hello"]
+
+    async def test_write_behind_flush(self):
+        history = ThreadHistory(write_behind=True)
+        for i in range(150):
+            await history.add_message(Message(role="user", content=str(i)))
+        await message_buffer.flush()
+
+        stored = await get_stored_messages(history.thread_id)
+        assert [m.content for m in stored] == [str(i) for i in range(150)]
+        # messages are not duplicated once they have been written
+        assert len(await history.get_messages()) == 150
+
+    async def test_write_behind_flushes_in_background(self, monkeypatch):
+        monkeypatch.setattr(message_buffer, "flush_interval", 0)
+        history = ThreadHistory(write_behind=True)
+        await history.add_message(Message(role="user", content="hi"))
+
+        await message_buffer._flush_tasks[asyncio.get_running_loop()]
+        assert len(await get_stored_messages(history.thread_id)) == 1
+
+    async def test_failed_background_flush_is_retried(self, monkeypatch):
+        monkeypatch.setattr(message_buffer, "flush_interval", 0)
+        create_messages = marvin.api.threads.create_messages
+        attempts = []
+
+        async def flaky_create_messages(messages):
+            attempts.append(messages)
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+            await create_messages(messages=messages)
+
+        monkeypatch.setattr(
+            marvin.api.threads, "create_messages", flaky_create_messages
+        )
+        history = ThreadHistory(write_behind=True)
+        await history.add_message(Message(role="user", content="hi"))
+
+        # the task doesn't fail, and keeps going until the write succeeds
+        await message_buffer._flush_tasks[asyncio.get_running_loop()]
+        assert len(attempts) == 2
+        assert len(await get_stored_messages(history.thread_id)) == 1
+
+    async def test_flush_at_exit_waits_for_writes_in_progress(self, monkeypatch):
+        started, written = [], []
+
+        async def slow_create_messages(messages):
+            started.append(messages)
+            await asyncio.sleep(0.2)
+            written.extend(messages)
+
+        monkeypatch.setattr(marvin.api.threads, "create_messages", slow_create_messages)
+        history = ThreadHistory(write_behind=True)
+        await history.add_message(Message(role="user", content="hi"))
+
+        # start a write on the background loop, then exit while it's running
+        write = asyncio.run_coroutine_threadsafe(
+            message_buffer.flush(), get_background_loop()
+        )
+        while not started:
+            await asyncio.sleep(0.01)
+        message_buffer._flush_at_exit()
+
+        assert [m.content for m in written] == ["hi"]
+        # the messages are only written once
+        write.result(timeout=1)
+        assert len(started) == 1
+
+    async def test_get_last_n_messages(self):
+        history = ThreadHistory(write_behind=True)
+        for i in range(3):
+            await history.add_message(Message(role="user", content=str(i)))
+        await message_buffer.flush()
+        for i in range(3, 6):
+            await history.add_message(Message(role="user", content=str(i)))
+
+        messages = await history.get_messages(n=4)
+        assert [m.content for m in messages] == ["2", "3", "4", "5"]
+
+    async def test_bot_with_write_behind_history(self):
+        bot = Bot(
+            plugins=[],
+            history=ThreadHistory(write_behind=True),
+            llm=FakeLLM(["hello"]),
+        )
+        await bot.say("hi")
+        messages = await bot.history.get_messages()
+        assert [m.content for m in messages] == ["hi", "hello"]
+
+
+class TestTokenCounts:
+    async def test_tokens_are_counted_when_messages_are_added(self):
+        history = InMemoryHistory()
+        await history.add_message(Message(role="user", content="hello world"))
+        [message] = await history.get_messages()
+        assert message.tokens == count_tokens("hello world")
+
+    @pytest.mark.parametrize("write_behind", [True, False])
+    async def test_tokens_are_stored(self, write_behind):
+        history = ThreadHistory(write_behind=write_behind)
+        await history.add_message(Message(role="user", content="hello world"))
+        await message_buffer.flush()
+
+        [message] = await get_stored_messages(history.thread_id)
+        assert message.tokens == count_tokens("hello world")
+
+    async def test_max_tokens_uses_stored_counts(self):
+        history = InMemoryHistory()
+        for i in range(3):
+            await history.add_message(Message(role="user", content=str(i), tokens=10))
+
+        messages = await history.get_messages(max_tokens=25)
+        assert [m.content for m in messages] == ["1", "2"]
+
+    async def test_max_messages(self):
+        history = InMemoryHistory(max_messages=2)
+        for i in range(3):
+            await history.add_message(Message(role="user", content=str(i)))
+        assert [m.content for m in await history.get_messages()] == ["1", "2"]
+
+
+class TestHistoryBudget:
+    @pytest.mark.parametrize(
+        "model_name, context_window",
+        [
+            ("gpt-3.5-turbo", 4096),
+            ("gpt-3.5-turbo-16k-0613", 16384),
+            ("gpt-4-0314", 8192),
+            ("gpt-4-32k", 32768),
+            ("unknown-model", 4096),
+        ],
+    )
+    def test_context_windows(self, model_name, context_window):
+        assert get_context_window(model_name) == context_window
+
+    def test_budget_depends_on_model(self):
+        gpt_3 = Bot(llm=FakeLLM(["hi"], model_name="gpt-3.5-turbo"))
+        gpt_4 = Bot(llm=FakeLLM(["hi"], model_name="gpt-4-32k"))
+        completion_tokens = marvin.settings.bot_completion_tokens
+
+        assert gpt_3._get_history_budget(100) == 4096 - 100 - completion_tokens
+        assert gpt_4._get_history_budget(100) == 32768 - 100 - completion_tokens
+
+    async def test_history_is_limited_by_budget(self):
+        history = InMemoryHistory()
+        for i in range(10):
+            await history.add_message(Message(role="user", content=str(i), tokens=1000))
+        llm = FakeLLM(["hi"], model_name="gpt-3.5-turbo")
+        bot = Bot(plugins=[], history=history, llm=llm)
+
+        _, prompt_tokens = await bot._get_prompt()
+        budget = bot._get_history_budget(prompt_tokens + count_tokens("hello"))
+        await bot.say("hello")
+
+        # the history, followed by the new user message
+        sent_history = llm.calls[0][1:-1]
+        assert len(sent_history) == budget // 1000
@@ -0,0 +1,135 @@
+import marvin
+import pydantic
+import pytest
+from marvin import Bot
+from marvin.bots.history import InMemoryHistory
+from marvin.bots.response_formatters import (
+    TYPE_FORMAT_CACHE_SIZE,
+    PydanticFormatter,
+    TypeFormatter,
+    _get_cached_type_format,
+    repair_json,
+    repair_scalar,
+)
+from marvin.utilities.tests import FakeLLM
+
+
+class TestRepairJSON:
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ('{"a": 1}', {"a": 1}),
+            ('```json\n{"a": 1}\n```', {"a": 1}),
+            ("Here you go: [1, 2, 3]. Anything else?", [1, 2, 3]),
+            ('{"a": "}"} and {"b": 2}', {"a": "}"}),
+            (
+                "{'a': True, 'b': None, 'c': (1, 2)}",
+                {"a": True, "b": None, "c": [1, 2]},
+            ),
+            ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}),
+            (
+                "{'a': true, 'b': 'it\\'s \"quoted\"',}",
+                {"a": True, "b": 'it\'s "quoted"'},
+            ),
+        ],
+    )
+    def test_repair(self, text, expected):
+        assert pydantic.parse_raw_as(type(expected), repair_json(text)) == expected
+
+    def test_unrepairable(self):
+        with pytest.raises(ValueError):
+            repair_json("no JSON here")
+
+
+@pytest.mark.parametrize(
+    "text, expected", [('"42"', "42"), ("```\n42\n```", "42"), ("1,000,000", "1000000")]
+)
+def test_repair_scalar(text, expected):
+    assert repair_scalar(text) == expected
+
+
+class TestResponseRepair:
+    @pytest.mark.parametrize(
+        "response_format, response, expected",
+        [
+            (list[int], "```python\n[1, 2, '3',]\n```", [1, 2, 3]),
+            (int, '"1,000"', 1000),
+            (bool, "True.", True),
+            ("a JSON object", "Sure! {'a': None}", {"a": None}),
+        ],
+    )
+    async def test_responses_are_repaired_without_llm(
+        self, response_format, response, expected
+    ):
+        llm = FakeLLM([response])
+        bot = Bot(
+            plugins=[],
+            history=InMemoryHistory(),
+            response_format=response_format,
+            llm=llm,
+        )
+        result = await bot.say("hi")
+
+        assert result.parsed_content == expected
+        assert len(llm.calls) == 1
+
+    async def test_llm_reformats_unrepairable_responses(self):
+        llm = FakeLLM(["The answer is two", "2"])
+        bot = Bot(plugins=[], history=InMemoryHistory(), response_format=int, llm=llm)
+        result = await bot.say("What is 1 + 1?")
+
+        assert result.parsed_content == 2
+        assert len(llm.calls) == 2
+        assert "The answer is two" in llm.calls[1][-1].content
+
+
+class TestDeserializedFormatters:
+    def test_type_formatter(self):
+        formatter = TypeFormatter(list[dict[str, int]])
+        loaded = TypeFormatter(**formatter.dict())
+        assert loaded.get_type() == list[dict[str, int]]
+        assert loaded.parse_response('[{"a": 1}]') == [{"a": 1}]
+
+    def test_pydantic_formatter(self):
+        class Person(pydantic.BaseModel):
+            name: str
+            age: int
+
+        formatter = PydanticFormatter(Person)
+        loaded = PydanticFormatter(**formatter.dict())
+        person = loaded.parse_response('{"name": "Ford", "age": 42}')
+        assert (person.name, person.age) == ("Ford", 42)
+
+
+class TestTypeFormats:
+    def test_type_formats_are_computed_once(self, monkeypatch):
+        _get_cached_type_format.cache_clear()
+        calls = []
+        original_type_to_schema = marvin.utilities.types.type_to_schema
+
+        def type_to_schema(type_):
+            calls.append(type_)
+            return original_type_to_schema(type_)
+
+        monkeypatch.setattr(marvin.utilities.types, "type_to_schema", type_to_schema)
+
+        class Point(pydantic.BaseModel):
+            x: int
+
+        first = TypeFormatter(list[dict[str, float]])
+        second = TypeFormatter(list[dict[str, float]])
+        assert first.format == second.format
+        PydanticFormatter(Point)
+        PydanticFormatter(Point)
+        assert calls == [list[dict[str, float]], Point]
+
+    def test_cached_schemas_are_copied(self):
+        first = TypeFormatter(list[dict[str, float]])
+        first.type_schema["items"]["type"] = "string"
+
+        second = TypeFormatter(list[dict[str, float]])
+        assert second.type_schema["items"]["type"] == "object"
+
+    def test_type_format_cache_is_bounded(self):
+        cache_info = _get_cached_type_format.cache_info()
+        assert cache_info.maxsize == TYPE_FORMAT_CACHE_SIZE
@@ -0,0 +1,158 @@
+import pytest
+from marvin import Bot, plugin
+from marvin.bots.history import InMemoryHistory
+from marvin.bots.streaming import JSONObjectScanner, StreamingJSONParser
+from marvin.infra.llms import OpenAIChat
+from marvin.utilities.tests import FakeLLM
+from pydantic import BaseModel
+
+
+class Point(BaseModel):
+    x: int
+    tags: list[str] = []
+
+
+def chunked(text: str, size: int = 3) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture
+def stream_chunks(monkeypatch):
+    """
+    Replace the LLM stream with one that yields each response in small chunks
+    """
+    responses = []
+
+    async def fake_stream_llm(self, messages):
+        for chunk in chunked(responses.pop(0)):
+            yield chunk
+
+    monkeypatch.setattr(Bot, "_stream_llm", fake_stream_llm)
+    return responses
+
+
+class TestJSONObjectScanner:
+    def test_finds_objects_across_chunks(self):
+        scanner = JSONObjectScanner()
+        spans = []
+        for chunk in chunked('Sure! {"a": {"b": 1}} and {"c": 2}'):
+            spans.extend(scanner.feed(chunk))
+        assert [scanner.text[s:e] for s, e in spans] == ['{"a": {"b": 1}}', '{"c": 2}']
+
+    def test_ignores_braces_in_strings(self):
+        scanner = JSONObjectScanner()
+        spans = scanner.feed('{"a": "}{", "b": "\\"}"}')
+        assert [scanner.text[s:e] for s, e in spans] == ['{"a": "}{", "b": "\\"}"}']
+
+    def test_open_object_start(self):
+        scanner = JSONObjectScanner()
+        scanner.feed('abc {"a": ')
+        assert scanner.open_object_start == 4
+        scanner.feed("1}")
+        assert scanner.open_object_start is None
+
+
+class TestStream:
+    async def test_stream_without_plugins(self, stream_chunks):
+        stream_chunks.append("Hello, world!")
+        bot = Bot(plugins=[], history=InMemoryHistory())
+        tokens = [t async for t in bot.stream("hi")]
+        assert len(tokens) > 1
+        assert "".join(tokens) == "Hello, world!"
+
+        messages = await bot.history.get_messages()
+        assert [m.role for m in messages] == ["user", "ai"]
+        assert messages[-1].content == "Hello, world!"
+
+    async def test_stream_runs_plugin_as_soon_as_payload_closes(self, stream_chunks):
+        @plugin
+        def get_number() -> int:
+            """Returns a special number"""
+            return 42
+
+        stream_chunks.extend(
+            [
+                (
+                    'Let me check. {"action": "run-plugin", "name": "get_number",'
+                    ' "inputs": {}} this text is never generated'
+                ),
+                "The number is 42.",
+            ]
+        )
+        bot = Bot(plugins=[get_number], history=InMemoryHistory())
+        output = "".join([t async for t in bot.stream("what is the number?")])
+
+        assert output == "Let me check. The number is 42."
+        assert "run-plugin" not in output
+
+    async def test_stream_falls_back_to_full_response(self):
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=FakeLLM(["Hello!"]))
+        assert [t async for t in bot.stream("hi")] == ["Hello!"]
+
+
+class TestStreamingJSONParser:
+    def test_partial_values_across_chunks(self):
+        parser = StreamingJSONParser()
+        partials = []
+        for chunk in chunked('Sure: {"a": [1, 2, 3], "b": "hello"}', size=5):
+            parser.feed(chunk)
+            partials.append(parser.partial())
+        assert parser.error is None
+        assert parser.complete
+        assert partials[-1] == {"a": [1, 2, 3], "b": "hello"}
+        assert {"a": [1]} in partials
+
+    def test_wrong_type(self):
+        parser = StreamingJSONParser(expected_type="object")
+        parser.feed("[1, 2")
+        assert parser.error == "Expected a JSON object, got an array"
+
+    def test_long_preamble(self):
+        parser = StreamingJSONParser(expected_type="object", max_preamble=10)
+        parser.feed("Here is a long explanation before the JSON: {}")
+        assert parser.error.startswith("Expected a JSON object, got text")
+
+    def test_long_preamble_without_expected_type(self):
+        # the response could be a JSON string or scalar
+        parser = StreamingJSONParser(max_preamble=10)
+        parser.feed('"Here is a long JSON string", then {"a": 1}')
+        assert parser.error is None
+        assert parser.partial() == {"a": 1}
+
+    def test_mismatched_brackets(self):
+        parser = StreamingJSONParser()
+        parser.feed('{"a": [1}')
+        assert parser.error is not None
+
+
+class TestStreamingValidation:
+    async def test_say_stops_invalid_response_and_retries(self, stream_chunks):
+        stream_chunks.extend(['[{"x": 1}, {"x": 2}]', '{"x": 1}'])
+        bot = Bot(
+            plugins=[],
+            history=InMemoryHistory(),
+            llm=OpenAIChat(api_key="x"),
+            response_format=Point,
+        )
+        response = await bot.say("where is the point?")
+        assert response.parsed_content == Point(x=1)
+        assert stream_chunks == []
+
+    @pytest.mark.parametrize(
+        "response_format, validated",
+        [(Point, True), (list[Point], True), (int, False), ("a JSON string", False)],
+    )
+    def test_only_objects_and_arrays_are_validated(self, response_format, validated):
+        bot = Bot(
+            plugins=[],
+            llm=OpenAIChat(api_key="x"),
+            response_format=response_format,
+        )
+        assert (bot._get_streaming_parser() is not None) == validated
+
+    async def test_stream_parsed(self, stream_chunks):
+        stream_chunks.append('{"x": 1, "tags": ["a", "b"]}')
+        bot = Bot(plugins=[], history=InMemoryHistory(), response_format=Point)
+        partials = [p async for p in bot.stream_parsed("where is the point?")]
+        assert {"x": 1} in partials
+        assert partials[-1] == {"x": 1, "tags": ["a", "b"]}
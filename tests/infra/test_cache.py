@@ -0,0 +1,99 @@
+import time
+
+import pytest
+from marvin import Bot
+from marvin.bots.history import InMemoryHistory
+from marvin.infra.cache import InMemoryCache, SQLiteCache, get_llm_cache
+from marvin.utilities.strings import hash_text
+from marvin.utilities.tests import FakeLLM
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache_factory(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == "memory":
+            return InMemoryCache(**kwargs)
+        return SQLiteCache(path=tmp_path / "cache.sqlite", **kwargs)
+
+    return factory
+
+
+class TestCacheBackends:
+    async def test_get_and_set(self, cache_factory):
+        cache = cache_factory()
+        assert await cache.get("a") is None
+        await cache.set("a", "1")
+        assert await cache.get("a") == "1"
+        assert cache.stats() == dict(hits=1, misses=1)
+
+    async def test_clear(self, cache_factory):
+        cache = cache_factory()
+        await cache.set("a", "1")
+        await cache.clear()
+        assert await cache.get("a") is None
+
+    async def test_ttl(self, cache_factory, monkeypatch):
+        cache = cache_factory(ttl=10)
+        await cache.set("a", "1")
+        assert await cache.get("a") == "1"
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        assert await cache.get("a") is None
+
+    async def test_lru_eviction(self, cache_factory, monkeypatch):
+        # make sure every operation has a distinct timestamp
+        clock = iter(range(1_000_000, 2_000_000))
+        monkeypatch.setattr(time, "time", lambda: next(clock))
+
+        cache = cache_factory(max_size=2)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        # touch "a" so that "b" is the least recently used
+        await cache.get("a")
+        await cache.set("c", "3")
+
+        assert await cache.get("a") == "1"
+        assert await cache.get("b") is None
+        assert await cache.get("c") == "3"
+
+
+class TestLLMCache:
+    @pytest.fixture(autouse=True)
+    async def clear_llm_cache(self):
+        await get_llm_cache().clear()
+        yield
+        await get_llm_cache().clear()
+
+    async def test_deterministic_responses_are_cached(self):
+        llm = FakeLLM(["a", "b"], temperature=0)
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+
+        assert (await bot.say("hi")).content == "a"
+        await bot.reset_thread()
+        assert (await bot.say("hi")).content == "a"
+        assert len(llm.calls) == 1
+
+    async def test_different_messages_are_not_cached(self):
+        llm = FakeLLM(["a", "b"], temperature=0)
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+
+        assert (await bot.say("hi")).content == "a"
+        await bot.reset_thread()
+        assert (await bot.say("hello")).content == "b"
+
+    async def test_nondeterministic_responses_are_not_cached(self):
+        llm = FakeLLM(["a", "b"], temperature=0.5)
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+
+        assert (await bot.say("hi")).content == "a"
+        await bot.reset_thread()
+        assert (await bot.say("hi")).content == "b"
+
+    async def test_prompts_are_not_memoized(self):
+        llm = FakeLLM(["a"], temperature=0)
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+
+        hash_text.cache_clear()
+        await bot.say("hi")
+        assert hash_text.cache_info().currsize == 0
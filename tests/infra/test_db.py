@@ -0,0 +1,31 @@
+import sqlalchemy as sa
+import sqlmodel
+from marvin.infra.db import add_missing_columns
+from marvin.models.threads import Message
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+async def test_add_missing_columns_to_old_database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/old.sqlite")
+    table = Message.__table__
+    try:
+        # a database created before messages stored their token counts
+        async with engine.begin() as conn:
+            await conn.run_sync(sqlmodel.SQLModel.metadata.create_all)
+            await conn.execute(sa.text("ALTER TABLE message DROP COLUMN tokens"))
+
+        async with engine.begin() as conn:
+            await conn.run_sync(add_missing_columns)
+            await conn.execute(
+                table.insert().values(
+                    id="msg_1", thread_id="thd_1", role="user", content="hi", tokens=1
+                )
+            )
+            tokens = (await conn.execute(sa.select(table.c.tokens))).scalar_one()
+        assert tokens == 1
+
+        # nothing is added the second time
+        async with engine.begin() as conn:
+            await conn.run_sync(add_missing_columns)
+    finally:
+        await engine.dispose()
@@ -0,0 +1,106 @@
+import json
+
+import httpx
+import pytest
+from marvin import Bot
+from marvin.bots.history import InMemoryHistory
+from marvin.infra.llms import OpenAIChat, get_http_client
+from marvin.models.threads import Message
+from openai.error import InvalidRequestError, RateLimitError
+
+
+def mock_client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(
+        200, json={"choices": [{"message": {"role": "assistant", "content": content}}]}
+    )
+
+
+def stream(*tokens: str) -> httpx.Response:
+    lines = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": token}}]})
+        for token in tokens
+    ]
+    lines.append("data: [DONE]")
+    return httpx.Response(200, text="\n\n".join(lines) + "\n\n")
+
+
+class TestOpenAIChat:
+    async def test_complete(self):
+        requests = []
+
+        def handler(request: httpx.Request):
+            requests.append(request)
+            return completion("hello")
+
+        llm = OpenAIChat(
+            model_name="test-model",
+            temperature=0.5,
+            api_key="test-key",
+            base_url="http://localhost:1234/v1/",
+            http_client=mock_client(handler),
+        )
+        response = await llm.acomplete(
+            [Message(role="system", content="a"), Message(role="ai", content="b")],
+            stop=["STOP"],
+        )
+
+        assert response == "hello"
+        [request] = requests
+        assert str(request.url) == "http://localhost:1234/v1/chat/completions"
+        assert request.headers["Authorization"] == "Bearer test-key"
+        assert json.loads(request.content) == dict(
+            model="test-model",
+            temperature=0.5,
+            messages=[
+                {"role": "system", "content": "a"},
+                {"role": "assistant", "content": "b"},
+            ],
+            stop=["STOP"],
+        )
+
+    async def test_stream(self):
+        llm = OpenAIChat(http_client=mock_client(lambda r: stream("he", "llo")))
+        tokens = [t async for t in llm.astream([Message(role="user", content="hi")])]
+        assert tokens == ["he", "llo"]
+
+    @pytest.mark.parametrize(
+        "status, error", [(429, RateLimitError), (404, InvalidRequestError)]
+    )
+    async def test_errors(self, status, error):
+        def handler(request):
+            return httpx.Response(status, json={"error": {"message": "oops"}})
+
+        llm = OpenAIChat(http_client=mock_client(handler))
+        with pytest.raises(error, match="oops"):
+            await llm.acomplete([Message(role="user", content="hi")])
+        with pytest.raises(error, match="oops"):
+            async for _ in llm.astream([Message(role="user", content="hi")]):
+                pass
+
+    async def test_bots_share_a_connection_pool(self):
+        assert get_http_client() is get_http_client()
+
+
+class TestBotsWithOpenAIChat:
+    # nondeterministic, so responses aren't cached between tests
+    async def test_say(self):
+        llm = OpenAIChat(
+            temperature=0.5, http_client=mock_client(lambda r: completion("hello"))
+        )
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+        response = await bot.say("hi")
+        assert response.content == "hello"
+
+    async def test_stream(self):
+        llm = OpenAIChat(
+            temperature=0.5, http_client=mock_client(lambda r: stream("he", "llo"))
+        )
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=llm)
+        assert [t async for t in bot.stream("hi")] == ["he", "llo"]
+
+    async def test_default_llm(self):
+        assert isinstance(Bot().llm, OpenAIChat)
@@ -0,0 +1,109 @@
+import pytest
+from marvin.loaders.base import Loader
+from marvin.models.chunkers import (
+    Chunker,
+    CodeChunker,
+    MarkdownChunker,
+    RecursiveChunker,
+    TokenChunker,
+)
+from marvin.models.documents import Document
+from marvin.utilities.strings import count_tokens, split_text
+
+FUNCTION = '''def greet(name):
+    """Say hello."""
+
+    greeting = f"Hello, {name}!"
+
+    print(greeting)
+    return greeting
+'''
+
+MARKDOWN = (
+    "# Intro\n\n"
+    + "Marvin is a lightweight framework for building AI applications. " * 20
+    + "\n\n## Usage\n\nInstall it and call a function:\n\n```python\n"
+    + FUNCTION
+    + "\ngreet('Arthur')\n```\n\n## FAQ\n\n"
+    + "Why is the robot so depressed? Nobody knows for certain. " * 20
+)
+
+
+def assert_covers(text: str, chunks: list[tuple[str, int]]):
+    position = 0
+    for chunk, index in chunks:
+        assert index == position
+        assert text[index : index + len(chunk)] == chunk
+        position += len(chunk)
+    assert position == len(text)
+
+
+class TestChunkers:
+    @pytest.mark.parametrize(
+        "chunker", [RecursiveChunker(), CodeChunker(), MarkdownChunker()]
+    )
+    def test_chunks_cover_text(self, chunker: Chunker):
+        chunks = chunker.split(MARKDOWN)
+        assert len(chunks) > 1
+        assert_covers(MARKDOWN, chunks)
+
+    def test_recursive_chunker_respects_chunk_tokens(self):
+        chunks = RecursiveChunker(chunk_tokens=50).split(MARKDOWN)
+        assert_covers(MARKDOWN, chunks)
+        assert all(count_tokens(chunk) <= 50 for chunk, _ in chunks)
+
+    def test_recursive_chunker_splits_at_paragraphs(self):
+        text = "First paragraph.\n\nSecond paragraph."
+        chunks = RecursiveChunker(chunk_tokens=5).split(text)
+        assert [chunk for chunk, _ in chunks] == [
+            "First paragraph.\n\n",
+            "Second paragraph.",
+        ]
+
+    def test_code_chunker_keeps_functions_whole(self):
+        text = "\n".join([FUNCTION] * 20)
+        chunks = CodeChunker(chunk_tokens=10).split(text)
+        assert_covers(text, chunks)
+        assert [chunk for chunk, _ in chunks] == [FUNCTION + "\n"] * 19 + [FUNCTION]
+
+    def test_code_chunker_keeps_fenced_blocks_whole(self):
+        chunks = CodeChunker(chunk_tokens=20).split(MARKDOWN)
+        assert any(chunk.startswith("```python\n" + FUNCTION) for chunk, _ in chunks)
+
+    def test_code_chunker_splits_huge_blocks(self):
+        text = "def f():\n" + "    x = 1\n" * 200
+        chunks = CodeChunker(chunk_tokens=50, max_chunk_tokens=100).split(text)
+        assert_covers(text, chunks)
+        assert all(count_tokens(chunk) <= 100 for chunk, _ in chunks)
+
+    def test_markdown_chunker_starts_chunks_at_headers(self):
+        chunks = MarkdownChunker(chunk_tokens=100).split(MARKDOWN)
+        assert_covers(MARKDOWN, chunks)
+        for header in ["# Intro", "## Usage", "## FAQ"]:
+            assert any(chunk.startswith(header) for chunk, _ in chunks)
+
+    def test_token_chunker_matches_split_text(self):
+        chunks = TokenChunker(chunk_tokens=50, overlap=0.2).split(MARKDOWN)
+        assert chunks == split_text(
+            MARKDOWN, chunk_size=50, chunk_overlap=0.2, return_index=True
+        )
+
+
+class TestChunkerSelection:
+    async def test_to_excerpts_with_chunker(self):
+        document = Document(text=MARKDOWN)
+        excerpts = await document.to_excerpts(chunker=MarkdownChunker(chunk_tokens=100))
+        chunks = MarkdownChunker(chunk_tokens=100).split(MARKDOWN)
+        assert len(excerpts) == len(chunks)
+        assert [e.order for e in excerpts] == list(range(len(chunks)))
+
+    def test_loader_chunker_round_trip(self):
+        class MyLoader(Loader):
+            async def load(self):
+                return []
+
+        loader = MyLoader(chunker=CodeChunker(chunk_tokens=300))
+        loaded = MyLoader.parse_raw(loader.json())
+        assert isinstance(loaded.chunker, CodeChunker)
+        assert loaded.chunker.chunk_tokens == 300
+        assert isinstance(MyLoader().chunker, TokenChunker)
@@ -44,3 +44,11 @@ class TestDocuments:
             document=document, excerpt_text=excerpt_text
         )
         assert rendered_text == f"{text} - {excerpt_text}"
+
+    async def test_excerpts_include_their_location(self):
+        text = "# Guide\n\n## Install\n\n" + "pip install marvin. " * 40
+        text += "\n\n## Usage\n\n" + "import marvin. " * 40
+        document = Document(text=text, metadata=dict(link="docs/guide.md"))
+        excerpts = await document.to_excerpts(chunk_tokens=50, overlap=0)
+        assert "# Guide\n## Install" in excerpts[1].text
+        assert "# Guide\n## Usage" in excerpts[-1].text
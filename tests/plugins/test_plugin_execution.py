@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+from marvin import Bot, plugin
+from marvin.bots.history import InMemoryHistory
+from marvin.utilities.tests import FakeLLM
+
+
+def payload(name: str, **inputs) -> str:
+    inputs = ", ".join(f'"{k}": {v!r}' for k, v in inputs.items()).replace("'", '"')
+    return f'{{"action": "run-plugin", "name": "{name}", "inputs": {{{inputs}}}}}'
+
+
+@pytest.fixture
+def slow_echo():
+    @plugin
+    async def slow_echo(text: str) -> str:
+        """Echoes the text after a delay"""
+        await asyncio.sleep(0.5)
+        return text
+
+    return slow_echo
+
+
+class TestPluginExecution:
+    async def test_run_single_plugin(self, slow_echo):
+        llm = FakeLLM([payload("slow_echo", text="hi"), "done"])
+        bot = Bot(plugins=[slow_echo], history=InMemoryHistory(), llm=llm)
+        response = await bot.say("echo hi")
+
+        assert response.content == "done"
+        assert llm.calls[1][-2].content == "Plugin output: hi"
+
+    async def test_run_multiple_plugins_concurrently(self, slow_echo):
+        llm = FakeLLM(
+            [
+                "I'll echo both. "
+                + payload("slow_echo", text="a")
+                + "\n"
+                + payload("slow_echo", text="b"),
+                "done",
+            ]
+        )
+        bot = Bot(plugins=[slow_echo], history=InMemoryHistory(), llm=llm)
+
+        start = time.time()
+        response = await bot.say("echo a and b")
+        assert time.time() - start < 0.9
+
+        assert response.content == "done"
+        # both outputs are merged into a single system message
+        plugin_message = llm.calls[1][-2]
+        assert 'slow_echo {"text": "a"}: a' in plugin_message.content
+        assert 'slow_echo {"text": "b"}: b' in plugin_message.content
+
+    async def test_plugin_timeout(self):
+        @plugin
+        async def sleepy() -> str:
+            """Takes a nap"""
+            await asyncio.sleep(10)
+            return "awake"
+
+        sleepy.timeout = 0.1
+
+        llm = FakeLLM([payload("sleepy"), "done"])
+        bot = Bot(plugins=[sleepy], history=InMemoryHistory(), llm=llm)
+        await bot.say("take a nap")
+
+        assert "timed out" in llm.calls[1][-2].content
+
+    async def test_plugin_timeout_covers_whole_run(self):
+        async def nap():
+            await asyncio.sleep(1)
+            return "awake"
+
+        @plugin
+        def sleepy():
+            """Takes two naps"""
+            time.sleep(0.4)
+            return nap()
+
+        sleepy.timeout = 0.5
+
+        llm = FakeLLM([payload("sleepy"), "done"])
+        bot = Bot(plugins=[sleepy], history=InMemoryHistory(), llm=llm)
+        start = time.time()
+        await bot.say("take a nap")
+
+        assert "timed out" in llm.calls[1][-2].content
+        assert time.time() - start < 0.8
+
+    async def test_sync_plugins_run_concurrently(self):
+        @plugin
+        def blocking_echo(text: str) -> str:
+            """Echoes the text after blocking for a while"""
+            time.sleep(0.5)
+            return text
+
+        llm = FakeLLM(
+            [
+                payload("blocking_echo", text="a") + payload("blocking_echo", text="b"),
+                "done",
+            ]
+        )
+        bot = Bot(plugins=[blocking_echo], history=InMemoryHistory(), llm=llm)
+
+        start = time.time()
+        await bot.say("echo a and b")
+        assert time.time() - start < 0.9
+
+    async def test_invalid_payload_is_reported(self, slow_echo):
+        llm = FakeLLM(['{"action": "run-plugin", "name": "slow_echo"}', "done"])
+        bot = Bot(plugins=[slow_echo], history=InMemoryHistory(), llm=llm)
+        await bot.say("echo")
+
+        assert "Error running plugin" in llm.calls[1][-2].content
@@ -0,0 +1,58 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+
+import pytest
+from marvin.utilities.async_utils import get_background_loop, run_sync
+
+var = contextvars.ContextVar("var", default=None)
+
+
+async def get_thread_name():
+    return threading.current_thread().name
+
+
+class TestRunSync:
+    def test_run_sync(self):
+        assert run_sync(asyncio.sleep(0, result=1)) == 1
+
+    def test_runs_on_background_loop(self):
+        assert run_sync(get_thread_name()) == "marvin-event-loop"
+        assert get_background_loop() is get_background_loop()
+
+    def test_raises_errors(self):
+        async def fail():
+            raise ValueError("oops")
+
+        with pytest.raises(ValueError, match="oops"):
+            run_sync(fail())
+
+    async def test_inside_running_loop(self):
+        assert run_sync(asyncio.sleep(0, result=1)) == 1
+
+    def test_copies_context(self):
+        async def get_var():
+            return var.get()
+
+        token = var.set("x")
+        try:
+            assert run_sync(get_var()) == "x"
+        finally:
+            var.reset(token)
+
+    def test_from_many_threads(self):
+        async def f(x):
+            await asyncio.sleep(0.01)
+            return x
+
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda x: run_sync(f(x)), range(16)))
+        assert results == list(range(16))
+
+    def test_cannot_be_called_from_background_loop(self):
+        async def nested():
+            return run_sync(asyncio.sleep(0))
+
+        with pytest.raises(RuntimeError, match="background event loop"):
+            run_sync(nested())
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from marvin.utilities.rate_limits import RateLimiter, TokenBucket, backoff_delay
+
+
+class TestTokenBucket:
+    async def test_acquire_within_capacity_does_not_wait(self):
+        bucket = TokenBucket(per_minute=60)
+        await asyncio.wait_for(bucket.acquire(60), timeout=0.1)
+
+    async def test_acquire_waits_for_refill(self):
+        # 600 per minute = 10 per second
+        bucket = TokenBucket(per_minute=600)
+        await bucket.acquire(600)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await bucket.acquire(1)
+        assert loop.time() - start >= 0.09
+
+    async def test_requests_larger_than_capacity_are_clamped(self):
+        bucket = TokenBucket(per_minute=60)
+        await asyncio.wait_for(bucket.acquire(1000), timeout=0.1)
+
+    def test_per_minute_must_be_positive(self):
+        with pytest.raises(ValueError):
+            TokenBucket(per_minute=0)
+
+
+class TestRateLimiter:
+    async def test_disabled_limits_do_not_wait(self):
+        limiter = RateLimiter()
+        for _ in range(100):
+            await asyncio.wait_for(limiter.acquire(tokens=10_000), timeout=0.1)
+
+    async def test_token_limit(self):
+        limiter = RateLimiter(tokens_per_minute=600)
+        await limiter.acquire(tokens=600)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire(tokens=300), timeout=0.1)
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(20):
+        assert 0 <= backoff_delay(attempt, base_delay=1, max_delay=5) <= 5
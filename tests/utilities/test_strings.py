@@ -1,6 +1,16 @@
+import marvin
 import pytest
 from marvin.models.documents import Document
-from marvin.utilities.strings import LINKS, hash_text
+from marvin.utilities.strings import (
+    LINKS,
+    create_minimap_fn,
+    extract_keywords,
+    extract_keywords_many,
+    hash_text,
+    iter_split_text,
+    split_text,
+    tokenize,
+)
 
 
 class TestHashing:
@@ -38,3 +48,95 @@ class TestEntityExtraction:
             "https://example.com/path#fragment",
             "https://example.com/path?query=value#fragment",
         ]
+
+
+class TestSplitText:
+    @pytest.fixture
+    def text(self):
+        return " ".join(f"word{i} héllo 日本語 🎉" for i in range(200))
+
+    def test_indices_are_character_offsets(self, text):
+        chunks = split_text(text, chunk_size=20, return_index=True)
+        assert len(chunks) > 1
+        for chunk, index in chunks:
+            # chunks may start or end with part of a multi-byte character
+            assert text[index:].startswith(chunk.strip("�"))
+
+    def test_overlap(self):
+        text = "hello" + " hello" * 99
+        chunks = split_text(text, chunk_size=20, chunk_overlap=0.5, return_index=True)
+        assert [index for _, index in chunks[:3]] == [0, 59, 119]
+        assert chunks[0][0][59:] == chunks[1][0][:60]
+
+    def test_small_last_chunk_is_merged(self):
+        text = "hello" + " hello" * 41
+        assert len(tokenize(text)) == 42
+        chunks = split_text(text, chunk_size=20, chunk_overlap=0)
+        assert [len(tokenize(c)) for c in chunks] == [20, 22]
+
+    def test_generator(self, text):
+        chunks = iter_split_text(text, chunk_size=20, return_index=True)
+        assert next(chunks) == split_text(text, chunk_size=20, return_index=True)[0]
+
+
+class TestMinimap:
+    def test_headers_by_position(self):
+        text = "# A\nintro\n## B\nbody\n### C\nmore\n## D\nend"
+        minimap = create_minimap_fn(text)
+        assert minimap(0) == "# A"
+        assert minimap(text.index("body")) == "# A\n## B"
+        assert minimap(text.index("more")) == "# A\n## B\n### C"
+        assert minimap(text.index("end")) == "# A\n## D"
+
+    def test_text_before_first_header(self):
+        minimap = create_minimap_fn("intro\n# A\n")
+        assert minimap(0) == ""
+        assert minimap(6) == "# A"
+
+    def test_code_blocks_are_ignored(self):
+        text = "# A\n```python\n# comment\n```\n~~~\n## not a header\n~~~\nend"
+        minimap = create_minimap_fn(text)
+        assert minimap(text.index("end")) == "# A"
+
+    def test_setext_headers(self):
+        text = "Title\n=====\n\nSection\n-------\nbody\n\n---\nend"
+        minimap = create_minimap_fn(text)
+        assert minimap(text.index("body")) == "# Title\n## Section"
+        assert minimap(text.index("end")) == "# Title\n## Section"
+
+    def test_front_matter_is_ignored(self):
+        text = "---\ntitle: x\n---\n# A\nbody"
+        minimap = create_minimap_fn(text)
+        assert minimap(text.index("title")) == ""
+        assert minimap(text.index("body")) == "# A"
+
+
+class TestKeywords:
+    @pytest.fixture
+    def process_jobs(self, monkeypatch):
+        """
+        Record the texts sent to worker processes
+        """
+        jobs = []
+
+        async def fake_run_async_process(func, texts, n_keywords):
+            jobs.append(texts)
+            return func(texts, n_keywords)
+
+        monkeypatch.setattr(
+            marvin.utilities.async_utils,
+            "run_async_process",
+            fake_run_async_process,
+        )
+        return jobs
+
+    async def test_long_texts_are_batched(self, process_jobs):
+        texts = [f"{topic} " * 100 for topic in ["apple", "banana", "cherry"]]
+        keywords = await extract_keywords_many(texts, batch_size=2)
+        assert [k[0] for k in keywords] == ["apple", "banana", "cherry"]
+        assert [len(job) for job in process_jobs] == [2, 1]
+
+    async def test_short_texts_are_processed_in_process(self, process_jobs):
+        keywords = await extract_keywords_many(["apple pie", "banana " * 100])
+        assert keywords[0] == await extract_keywords("apple pie")
+        assert process_jobs == [["banana " * 100]]
@@ -0,0 +1,60 @@
+import pytest
+from marvin.utilities.tokenizer import (
+    TokenCountCache,
+    count_tokens,
+    count_tokens_many,
+    get_encoding,
+    slice_tokens,
+    token_counts,
+    tokenize,
+)
+
+
+class TestEncodings:
+    def test_encodings_are_cached(self):
+        assert get_encoding("gpt-4") is get_encoding("gpt-4")
+
+    def test_default_model(self, monkeypatch):
+        monkeypatch.setattr("marvin.settings.openai_model_name", "gpt-4")
+        assert get_encoding() is get_encoding("gpt-4")
+
+    def test_default_model_follows_settings(self, monkeypatch):
+        monkeypatch.setattr("marvin.settings.openai_model_name", "gpt-4")
+        assert get_encoding().name == "cl100k_base"
+        monkeypatch.setattr("marvin.settings.openai_model_name", "text-davinci-003")
+        assert get_encoding().name == "p50k_base"
+
+    def test_unknown_models_use_default_encoding(self):
+        assert get_encoding("not-a-model").name == "cl100k_base"
+
+
+class TestCountTokens:
+    def test_counts_are_cached(self):
+        text = "hello " * 100
+        token_counts.clear()
+        assert count_tokens(text) == len(tokenize(text))
+        key = token_counts.key(get_encoding(), text)
+        assert token_counts.get(key) == len(tokenize(text))
+
+    def test_count_tokens_many(self):
+        texts = ["hello", "hello " * 100, "", "hello " * 100]
+        assert count_tokens_many(texts) == [count_tokens(t) for t in texts]
+
+    def test_cache_is_bounded(self):
+        cache = TokenCountCache(max_size=2)
+        for i in range(3):
+            cache.set(("encoding", i), i)
+        assert cache.get(("encoding", 0)) is None
+        assert cache.get(("encoding", 2)) == 2
+
+
+class TestSliceTokens:
+    @pytest.mark.parametrize("n_tokens", [0, 1, 10, 100, 1000])
+    def test_slice_tokens(self, n_tokens):
+        text = "Hello, world!\n\n  # Header\tmore  text 日本語 🎉 123456 " * 200
+        expected = get_encoding().decode(tokenize(text)[:n_tokens])
+        assert slice_tokens(text, n_tokens) == expected
+
+    def test_text_without_spaces(self):
+        text = "a" * 10_000
+        assert slice_tokens(text, 5) == get_encoding().decode(tokenize(text)[:5])
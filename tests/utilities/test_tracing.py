@@ -0,0 +1,131 @@
+import json
+
+import pytest
+from marvin import Bot, plugin
+from marvin.bots.history import InMemoryHistory
+from marvin.config import temporary_settings
+from marvin.utilities.tests import FakeLLM
+from marvin.utilities.tracing import (
+    NULL_SPAN,
+    JSONLinesSink,
+    add_sink,
+    remove_sink,
+    span,
+    trace,
+)
+
+
+@pytest.fixture
+def tracing_enabled():
+    with temporary_settings(tracing_enabled=True):
+        yield
+
+
+@pytest.fixture
+def traces():
+    records = []
+    add_sink(records.append)
+    yield records
+    remove_sink(records.append)
+
+
+def span_names(record: dict) -> list[str]:
+    return [record["name"]] + [
+        name for child in record["children"] for name in span_names(child)
+    ]
+
+
+class TestSpans:
+    def test_spans_are_noops_without_a_trace(self):
+        assert span("test") is NULL_SPAN
+
+    def test_trace_is_noop_when_disabled(self, traces):
+        with trace("test") as root:
+            with span("child") as child:
+                child.set(x=1)
+        assert root is NULL_SPAN
+        assert traces == []
+
+    def test_nested_spans(self, tracing_enabled, traces):
+        with trace("root", a=1) as root:
+            with span("child") as child:
+                child.set(b=2)
+                with span("grandchild"):
+                    pass
+            with span("sibling"):
+                pass
+
+        [record] = traces
+        assert record == root.to_dict()
+        assert record["attributes"] == {"a": 1}
+        assert [c["name"] for c in record["children"]] == ["child", "sibling"]
+        assert record["children"][0]["attributes"] == {"b": 2}
+        assert record["children"][0]["children"][0]["name"] == "grandchild"
+        assert record["duration"] >= record["children"][0]["duration"]
+
+    def test_errors_are_recorded(self, tracing_enabled, traces):
+        with pytest.raises(ValueError):
+            with trace("root"):
+                with span("child"):
+                    raise ValueError("oops")
+
+        assert "oops" in traces[0]["children"][0]["attributes"]["error"]
+
+    def test_json_lines_sink(self, tracing_enabled, tmp_path):
+        sink = JSONLinesSink(tmp_path / "traces.jsonl")
+        add_sink(sink)
+        try:
+            for _ in range(2):
+                with trace("root"):
+                    pass
+        finally:
+            remove_sink(sink)
+
+        lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+        assert [json.loads(line)["name"] for line in lines] == ["root", "root"]
+
+
+class TestBotTracing:
+    async def test_no_trace_when_disabled(self):
+        bot = Bot(plugins=[], history=InMemoryHistory(), llm=FakeLLM(["hi"]))
+        response = await bot.say("hello")
+        assert "trace" not in response.data
+
+    async def test_say_is_traced(self, tracing_enabled, traces):
+        @plugin
+        def get_answer() -> int:
+            """Returns the answer"""
+            return 42
+
+        llm = FakeLLM(
+            ['{"action": "run-plugin", "name": "get_answer", "inputs": {}}', "42"]
+        )
+        bot = Bot(plugins=[get_answer], history=InMemoryHistory(), llm=llm)
+        response = await bot.say("hello")
+
+        record = response.data["trace"]
+        assert traces == [record]
+        assert span_names(record) == [
+            "bot.say",
+            "prompt",
+            "input_transformers",
+            "history.load",
+            "history.write",
+            "llm",
+            "plugin",
+            "llm",
+            "validate",
+            "history.write",
+        ]
+        llm_span = record["children"][4]
+        assert llm_span["attributes"]["prompt_tokens"] > 0
+        assert llm_span["attributes"]["completion_tokens"] > 0
+
+    async def test_tracing_path(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        with temporary_settings(tracing_enabled=True, tracing_path=path):
+            bot = Bot(plugins=[], history=InMemoryHistory(), llm=FakeLLM(["hi"]))
+            await bot.say("hello")
+
+        [line] = path.read_text().splitlines()
+        assert json.loads(line)["name"] == "bot.say"
@@ -1,8 +1,13 @@
+import datetime
+import json
+from typing import Literal, Optional
+
 import marvin
 import pytest
 from marvin.models.documents import Document
 from marvin.utilities.strings import hash_text
-from marvin.utilities.types import MarvinBaseModel
+from marvin.utilities.types import MarvinBaseModel, schema_to_type, type_to_schema
+from pydantic import BaseModel, Field, ValidationError
 
 
 class TestHashing:
@@ -82,3 +87,142 @@ class TestDiscriminatedUnions:
 
         # all objects were properly deserialized
         assert deserialized.list_val == obj.list_val
+
+    def test_subclasses_are_loaded_by_discriminator(self):
+        class Parent(marvin.utilities.types.DiscriminatedUnionType):
+            a: int
+
+        class Child1(Parent):
+            pass
+
+        class Child2(Parent):
+            b: int = 0
+
+        class MyObject(MarvinBaseModel):
+            val: Parent
+            tuple_val: tuple[Parent, ...]
+
+        assert [f[0] for f in MyObject.__discriminated_fields__] == [
+            "val",
+            "tuple_val",
+        ]
+        obj = MyObject(
+            val=dict(a=1, b=2, discriminator="Child2"),
+            tuple_val=(dict(a=1, discriminator="Child1"),),
+        )
+        assert obj.val == Child2(a=1, b=2)
+        assert obj.tuple_val == (Child1(a=1),)
+
+    def test_single_subclass(self):
+        class Parent(marvin.utilities.types.DiscriminatedUnionType):
+            a: int
+
+        class MyObject(MarvinBaseModel):
+            val: Parent
+
+        assert MyObject(**MyObject(val=Parent(a=1)).dict()).val == Parent(a=1)
+
+    def test_forward_refs(self):
+        class MyObject(MarvinBaseModel):
+            val: Optional["ForwardParent"]  # noqa: F821
+
+        class ForwardParent(marvin.utilities.types.DiscriminatedUnionType):
+            a: int
+
+        class ForwardChild(ForwardParent):
+            pass
+
+        MyObject.update_forward_refs(ForwardParent=ForwardParent)
+        obj = MyObject(val=dict(a=1, discriminator="ForwardChild"))
+        assert type(obj.val) is ForwardChild
+
+
+class TestCopyWithUpdates:
+    def test_unchanged_values_are_shared(self):
+        document = Document(text="Hello World", metadata={"link": "a.md"})
+        copy = document.copy_with_updates(type="excerpt")
+        assert copy.type == "excerpt"
+        assert copy.text is document.text
+        assert copy.metadata is document.metadata
+        assert document.type == "original"
+
+    def test_nested_updates(self):
+        document = Document(text="Hello World", metadata={"link": "a.md"})
+        copy = document.copy_with_updates(metadata={"title": "Hello"})
+        assert copy.metadata.title == "Hello"
+        assert copy.metadata.link == "a.md"
+        assert document.metadata.title == "[untitled]"
+
+    def test_updates_are_validated(self):
+        document = Document(text="Hello World")
+        with pytest.raises(ValidationError):
+            document.copy_with_updates(type="not a type")
+        with pytest.raises(ValidationError):
+            document.copy_with_updates(not_a_field=1)
+
+    def test_extra_fields(self):
+        document = Document(text="Hello World", metadata={"foo": "bar"})
+        metadata = document.metadata.copy_with_updates(document_type="excerpt", x=1)
+        assert metadata.dict(include={"foo", "x", "document_type"}) == dict(
+            foo="bar", x=1, document_type="excerpt"
+        )
+
+
+class Person(BaseModel):
+    name: str
+    age: int = Field(0, description="The age")
+
+
+class Team(BaseModel):
+    members: list[Person]
+    leader: Optional[Person]
+    tags: set[str]
+    kind: Literal["a", "b"]
+
+
+class TestSchemaToType:
+    @pytest.mark.parametrize(
+        "type_",
+        [int, str, list[int], dict[str, list[int]], list[dict[str, int]], set[str]],
+    )
+    def test_root_types(self, type_):
+        model = schema_to_type(type_to_schema(type_))
+        assert model.__fields__["__root__"].outer_type_ == type_
+
+    def test_models(self):
+        model = schema_to_type(type_to_schema(Team))
+        team = model.parse_obj(
+            dict(members=[dict(name="Ford")], tags=["x", "x"], kind="a")
+        )
+        assert team.members[0].name == "Ford"
+        assert team.members[0].age == 0
+        assert team.leader is None
+        assert team.tags == {"x"}
+        assert model.schema()["properties"].keys() == Team.schema()["properties"].keys()
+
+        with pytest.raises(ValidationError):
+            model.parse_obj(dict(members=[], tags=[], kind="c"))
+
+    def test_models_are_cached(self):
+        schema = type_to_schema(list[Person])
+        model = schema_to_type(schema)
+        assert schema_to_type(json.loads(json.dumps(schema))) is model
+
+    def test_unsupported_schemas_are_generated(self, tmp_path, monkeypatch):
+        import datamodel_code_generator
+
+        monkeypatch.setattr(marvin.settings, "schema_cache_path", tmp_path)
+        schema = type_to_schema(list[datetime.datetime])
+        model = schema_to_type(schema)
+        assert model.parse_obj(["2023-01-01T00:00:00"]).__root__ == [
+            datetime.datetime(2023, 1, 1)
+        ]
+        assert len(list(tmp_path.glob("*.py"))) == 1
+
+        # generated modules are reused from disk
+        def generate(*args, **kwargs):
+            raise AssertionError("code should not be generated")
+
+        monkeypatch.setattr(datamodel_code_generator, "generate", generate)
+        marvin.utilities.types._SCHEMA_MODELS.clear()
+        assert schema_to_type(schema).parse_obj(["2023-01-01T00:00:00"])